@@ -0,0 +1,420 @@
+"""Replays a corpus of messages through AntiSpam offline and reports throughput, latency and allocations.
+
+The corpus is either plain text (one message per line, authors and channels are made up), JSONL with content,
+author_id, guild_id and channel_id fields, or the message table of a database when --dsn is given. Discord objects,
+HTTP, invite lookups and the Mute cog are replaced by in-memory stand-ins, so nothing leaves the machine. Redis is
+treated as down unless --redis-url is given, which exercises the local fallbacks.
+
+Run from the repository root, so sweeperbot can be imported:
+
+    python -m benchmarks.bench_antispam_replay [--corpus PATH | --dsn DSN] [--limit N] [--through-queue]
+"""
+import argparse
+import asyncio
+import configparser
+import datetime
+import json
+import logging
+import random
+import re
+import time
+import tracemalloc
+from os.path import abspath, dirname, join
+from types import SimpleNamespace
+
+import redis
+import redis.asyncio
+
+from benchmarks.bench_service_matcher import SERVICES
+from sweeperbot.utilities.actions import ActionDispatcher
+from sweeperbot.utilities.antispam import AntiSpam
+from sweeperbot.utilities.antispam_rules import CompiledRule, ServiceRules
+from sweeperbot.utilities.circuit_breaker import CircuitBreaker
+from sweeperbot.utilities.guild_settings import GuildSettings
+
+CORPUS = join(dirname(abspath(__file__)), "data", "chat.txt")
+USER_MENTION = re.compile(r"<@!?([0-9]+)>")
+ROLE_MENTION = re.compile(r"<@&([0-9]+)>")
+# URLs on these hosts answer with a redirect, everything else with a 200
+REDIRECTS = {"bit.ly": "https://discord.gg/redirected", "tinyurl.com": "https://example.com/"}
+
+
+class FakePermissions:
+    manage_messages = False
+
+
+class FakeMember:
+    __slots__ = ("id", "name", "bot", "roles")
+
+    def __init__(self, member_id):
+        self.id = member_id
+        self.name = f"user{member_id}"
+        self.bot = False
+        self.roles = []
+
+    @property
+    def mention(self):
+        return f"<@{self.id}>"
+
+    @property
+    def avatar_url(self):
+        return ""
+
+    def permissions_in(self, channel):
+        return FakePermissions
+
+    def __str__(self):
+        return f"{self.name}#0001"
+
+
+class FakeChannel:
+    def __init__(self, channel_id, guild):
+        self.id = channel_id
+        self.name = f"channel-{channel_id}"
+        self.guild = guild
+        self.category = None
+        self.sent = 0
+
+    @property
+    def mention(self):
+        return f"<#{self.id}>"
+
+    async def send(self, content=None, **kwargs):
+        self.sent += 1
+        return FakeMessage(0, content or "", self.guild.me, self.guild, self)
+
+
+class FakeGuild:
+    def __init__(self, guild_id):
+        self.id = guild_id
+        self.name = f"guild-{guild_id}"
+        self.me = FakeMember(1)
+        self.text_channels = []
+
+    def get_role(self, role_id):
+        return None
+
+    def __str__(self):
+        return self.name
+
+
+class FakeMessage:
+    __slots__ = ("id", "content", "author", "guild", "channel", "created_at", "deleted")
+
+    def __init__(self, message_id, content, author, guild, channel):
+        self.id = message_id
+        self.content = content
+        self.author = author
+        self.guild = guild
+        self.channel = channel
+        self.created_at = datetime.datetime.utcnow()
+        self.deleted = False
+
+    @property
+    def raw_mentions(self):
+        return [int(x) for x in USER_MENTION.findall(self.content)]
+
+    @property
+    def raw_role_mentions(self):
+        return [int(x) for x in ROLE_MENTION.findall(self.content)]
+
+    @property
+    def clean_content(self):
+        return self.content
+
+    @property
+    def jump_url(self):
+        return f"https://discord.com/channels/{self.guild.id}/{self.channel.id}/{self.id}"
+
+    async def delete(self):
+        self.deleted = True
+
+
+class FakeResponse:
+    def __init__(self, url):
+        host = url.split("/")[2] if url.count("/") >= 2 else ""
+        self.headers = {}
+        self.status = 200
+        if host in REDIRECTS:
+            self.status = 301
+            self.headers["Location"] = REDIRECTS[host]
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    """Answers HEAD requests after a fixed latency"""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.requests = 0
+
+    def head(self, url, **kwargs):
+        self.requests += 1
+        response = FakeResponse(url)
+        latency = self.latency
+
+        class Request:
+            async def __aenter__(self):
+                await asyncio.sleep(latency)
+                return response
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return Request()
+
+
+class OfflineRedis:
+    """A Redis that is always down, so every cache and the rate limiter use their local fallbacks"""
+
+    def register_script(self, script):
+        async def run(**kwargs):
+            raise redis.ConnectionError("offline")
+
+        return run
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def get(self, key):
+        pass
+
+    def ttl(self, key):
+        pass
+
+    async def execute(self):
+        raise redis.ConnectionError("offline")
+
+    async def setex(self, key, ttl, value):
+        raise redis.ConnectionError("offline")
+
+
+def make_bot(args):
+    log = logging.getLogger("benchmark")
+    log.setLevel(logging.WARNING)
+    if args.redis_url:
+        client = redis.asyncio.Redis.from_url(args.redis_url, decode_responses=True)
+    else:
+        client = OfflineRedis()
+
+    mutes = []
+
+    class FakeMuteCog:
+        async def mute_member(self, guild, member, mute_time, reason, moderator):
+            mutes.append(member.id)
+            return True, None, None
+
+    async def fetch_invite(code, with_counts=True):
+        await asyncio.sleep(args.http_latency)
+        return SimpleNamespace(guild=SimpleNamespace(id=hash(code) % 10 ** 6, name=code))
+
+    bot = SimpleNamespace(
+        log=log,
+        botconfig=configparser.ConfigParser(),
+        cooldown_settings={
+            "antispam_on_message": SimpleNamespace(
+                message_rate=args.message_rate, cooldown_time=3
+            )
+        },
+        helpers=SimpleNamespace(async_redis=client, redis_breaker=CircuitBreaker()),
+        constants=SimpleNamespace(
+            antispam_quickmsg="quickmsg", antispam_mass_mentions="mass mentions"
+        ),
+        session=FakeSession(args.http_latency),
+        guild_settings={},
+        get_cog=lambda name: FakeMuteCog(),
+        fetch_invite=fetch_invite,
+        mutes=mutes,
+    )
+    bot.actions = ActionDispatcher(bot)
+    return bot
+
+
+def load_corpus(args):
+    """Returns a list of (content, author_id, guild_id, channel_id)"""
+    rng = random.Random(0)
+    if args.dsn:
+        from sqlalchemy import create_engine, select
+
+        from sweeperbot.db import models
+
+        statement = (
+            select(
+                models.Message.message_body,
+                models.User.discord_id,
+                models.Server.discord_id,
+                models.Message.channel_id,
+            )
+            .join(models.User, models.Message.user_id == models.User.id)
+            .join(models.Server, models.Message.server_id == models.Server.id)
+            .order_by(models.Message.id)
+            .limit(args.limit)
+        )
+        with create_engine(args.dsn).connect() as connection:
+            return [tuple(row) for row in connection.execute(statement)]
+
+    with open(args.corpus, encoding="utf-8") as corpus_file:
+        lines = [line.rstrip("\n") for line in corpus_file if line.strip()]
+    if args.corpus.endswith(".jsonl"):
+        rows = [json.loads(line) for line in lines]
+        return [
+            (row["content"], row["author_id"], row["guild_id"], row["channel_id"])
+            for row in rows
+        ][: args.limit]
+    return [
+        (
+            line,
+            rng.randint(1000, 1000 + args.authors),
+            rng.randint(1, args.guilds),
+            rng.randint(1, 5),
+        )
+        for line in lines
+    ][: args.limit]
+
+
+def make_messages(corpus, bot):
+    guilds, channels, members = {}, {}, {}
+    messages = []
+    for message_id, (content, author_id, guild_id, channel_id) in enumerate(corpus, 1):
+        guild = guilds.get(guild_id)
+        if guild is None:
+            guild = guilds[guild_id] = FakeGuild(guild_id)
+            # With a log channel, flagged messages are logged and deleted rather than just logged
+            log_channel = FakeChannel(-guild_id, guild)
+            log_channel.name = "antispam-logs"
+            guild.text_channels.append(log_channel)
+            # Every feature is on, so every check runs
+            bot.guild_settings[guild_id] = GuildSettings(
+                guild_id,
+                antispam_quickmsg=True,
+                antispam_mass_mentions=True,
+                antispam_wordfilter=True,
+                wordfilter_data={"words": ["free nitro", "scam*", "giveaway"]},
+            )
+        channel = channels.get(channel_id)
+        if channel is None:
+            channel = channels[channel_id] = FakeChannel(channel_id, guild)
+            guild.text_channels.append(channel)
+        member = members.get(author_id)
+        if member is None:
+            member = members[author_id] = FakeMember(author_id)
+        messages.append(FakeMessage(message_id, content, member, guild, channel))
+    return messages
+
+
+def percentile(samples, percent):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+async def replay(antispam, messages, through_queue):
+    """Runs every message through AntiSpam, returns the wall time and the per message latencies in ms.
+
+    Through the queue, every message is queued at once so the latencies include the time spent waiting in it."""
+    started = time.perf_counter()
+    if through_queue:
+        queue = antispam.queue
+        queue.total_ms.clear()
+
+        def handled():
+            return sum(queue.stats[key] for key in ("processed", "errors", "dropped", "degraded"))
+
+        expected = handled() + len(messages)
+        workers = queue.start()
+        for message in messages:
+            await queue.put(message)
+        while handled() < expected:
+            await asyncio.sleep(0.001)
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        return time.perf_counter() - started, list(queue.total_ms)
+
+    latencies = []
+    for message in messages:
+        message_started = time.perf_counter()
+        await antispam.antispam_process_message(message)
+        latencies.append((time.perf_counter() - message_started) * 1000)
+    return time.perf_counter() - started, latencies
+
+
+async def run(args):
+    corpus = load_corpus(args)
+
+    async def new_antispam():
+        bot = make_bot(args)
+        antispam = AntiSpam(bot)
+        antispam.set_antispam_services(SERVICES)
+        # Block Discord invites, allow everything else
+        antispam.guild_rules = {
+            guild_id: {1: ServiceRules([CompiledRule(1)])}
+            for guild_id in {row[2] for row in corpus}
+        }
+        messages = make_messages(corpus, bot)
+        # Build the word filters before timing
+        for settings in bot.guild_settings.values():
+            antispam.word_filters.get(settings)
+        await asyncio.gather(*antispam.word_filters._builds.values())
+        return bot, antispam, messages
+
+    # Warm up once so caches and compiled regexes are in the same state as in a running bot
+    bot, antispam, messages = await new_antispam()
+    await replay(antispam, messages, args.through_queue)
+    wall, latencies = await replay(antispam, messages, args.through_queue)
+    deleted = sum(message.deleted for message in messages)
+    print(
+        f"{len(messages)} messages in {wall:.2f}s: {len(messages) / wall:,.0f} msgs/sec"
+        f"{' through the queue' if args.through_queue else ''}"
+    )
+    print(
+        f"latency p50 {percentile(latencies, 50):.3f} ms  p99 {percentile(latencies, 99):.3f} ms  "
+        f"max {max(latencies):.3f} ms"
+    )
+    print(
+        f"{deleted} deleted, {len(bot.mutes)} mutes, {bot.session.requests} HEAD requests"
+    )
+
+    # A separate cold run under tracemalloc, as tracing slows everything down
+    bot, antispam, messages = await new_antispam()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    await replay(antispam, messages, args.through_queue)
+    after = tracemalloc.take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    retained_blocks = sum(stat.count_diff for stat in stats)
+    retained_bytes = sum(stat.size_diff for stat in stats)
+    print(
+        f"allocations: peak {peak / 1024:,.0f} KiB, retained {retained_bytes / 1024:,.0f} KiB in "
+        f"{retained_blocks:,} blocks ({retained_blocks / len(messages):.1f} per message)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default=CORPUS)
+    parser.add_argument("--dsn", help="Replay the message table of this database instead")
+    parser.add_argument("--limit", type=int, default=100000)
+    parser.add_argument("--authors", type=int, default=300)
+    parser.add_argument("--guilds", type=int, default=3)
+    parser.add_argument(
+        "--http-latency", type=float, default=0.0, help="Seconds each HEAD or invite lookup takes"
+    )
+    # The replay runs far faster than real time, so the default rate is high enough that most authors aren't muted
+    parser.add_argument(
+        "--message-rate", type=int, default=1000, help="Quick message limit per 3 seconds"
+    )
+    parser.add_argument("--redis-url", help="Use this Redis instead of treating Redis as down")
+    parser.add_argument("--through-queue", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Compares the old per-service regex loop with ServiceMatcher on a corpus of chat URLs.
+
+Run from the repository root, so sweeperbot can be imported:
+
+    python -m benchmarks.bench_service_matcher [--repeat N] [--corpus PATH]
+"""
+import argparse
+import logging
+import re
+import timeit
+from os.path import abspath, dirname, join
+from types import SimpleNamespace
+
+from sweeperbot.utilities.service_matcher import ServiceMatcher
+
+CORPUS = join(dirname(abspath(__file__)), "data", "urls.txt")
+
+# Stand-ins for the AntiSpamServices rows, in the shape the bot loads them
+SERVICES = [
+    SimpleNamespace(id=index, service=name, regex=regex)
+    for index, (name, regex) in enumerate(
+        [
+            (
+                "Discord",
+                r"(?:https?://)?(?:www\.)?(?:discord(?:app)?\.(?:gg|io|me|li)|discord(?:app)?\.com/invite)/[a-zA-Z0-9-]+",
+            ),
+            ("Twitch", r"(?:https?://)?(?:www\.|clips\.|m\.)?twitch\.tv/[a-zA-Z0-9_/-]+"),
+            ("Mixer", r"(?:https?://)?(?:www\.)?mixer\.com/[a-zA-Z0-9_]+"),
+            ("Patreon", r"(?:https?://)?(?:www\.)?patreon\.com/[a-zA-Z0-9_]+"),
+            ("PayPal", r"(?:https?://)?(?:www\.)?paypal\.(?:me|com)/[a-zA-Z0-9_/]+"),
+            ("YouTube", r"(?:https?://)?(?:www\.|m\.)?(?:youtube\.com/watch\?v=|youtu\.be/)[\w-]{11}"),
+            ("Twitter", r"(?:https?://)?(?:www\.|mobile\.)?twitter\.com/\w+"),
+            ("Steam", r"(?:https?://)?(?:store\.)?steam(?:powered|community)\.com/\S+"),
+            ("Reddit", r"(?:https?://)?(?:www\.|old\.)?reddit\.com/r/\w+"),
+            ("GitHub", r"(?:https?://)?(?:www\.)?github\.com/[\w-]+/[\w.-]+"),
+            ("Shortener", r"(?:https?://)?(?:bit\.ly|tinyurl\.com|goo\.gl|t\.co)/\w+"),
+        ],
+        start=1,
+    )
+]
+
+log = logging.getLogger("benchmark")
+log.setLevel(logging.INFO)
+
+
+def old_match(url):
+    """The loop AntiSpam used before ServiceMatcher, including its debug log calls"""
+    service_id = None
+    service_name = None
+    regex_result = None
+    for service in SERVICES:
+        service_id = service.id
+        service_name = service.service
+        service_regex = service.regex
+        log.debug(
+            f"AntiSpam | service_name: {service_name} | service_regex: {service_regex} | url: {url}"
+        )
+        regex_result = re.search(service_regex, url)
+        log.debug(f"AntiSpam | service_name: {service_name} | regex_result: {regex_result}")
+        if regex_result:
+            break
+    return (service_id, regex_result.group(0)) if regex_result else (None, None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--corpus", default=CORPUS)
+    args = parser.parse_args()
+
+    with open(args.corpus) as corpus_file:
+        urls = [line.strip() for line in corpus_file if line.strip()]
+
+    matcher = ServiceMatcher(SERVICES)
+
+    def new_match(url):
+        service, regex_result = matcher.match(url)
+        log.debug(
+            f"AntiSpam | service_name: {service.service if service else None} | regex_result: {regex_result} | url: {url}"
+        )
+        return (service.id, regex_result) if service else (None, None)
+
+    # Both matchers must agree on the corpus before timing them
+    mismatches = [url for url in urls if old_match(url) != new_match(url)]
+    if mismatches:
+        print(f"{len(mismatches)} URLs matched differently, e.g. {mismatches[0]}")
+
+    print(f"{len(urls)} URLs, {len(SERVICES)} services, best of {args.repeat}")
+    results = {}
+    for name, fn in (("old loop", old_match), ("ServiceMatcher", new_match)):
+        best = min(
+            timeit.repeat(lambda: [fn(url) for url in urls], number=1, repeat=args.repeat)
+        )
+        results[name] = best
+        print(
+            f"{name:<16} {best * 1000:8.2f} ms  {len(urls) / best:12,.0f} urls/sec  {best / len(urls) * 1e6:6.2f} us/url"
+        )
+    print(f"Speedup: {results['old loop'] / results['ServiceMatcher']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Measures AntiSpam URL extraction on a chat corpus with and without the URL_HINT prefilter.
+
+Run from the repository root, so sweeperbot can be imported:
+
+    python -m benchmarks.bench_url_prefilter [--repeat N] [--corpus PATH]
+"""
+import argparse
+import timeit
+from os.path import abspath, dirname, join
+
+from urlextract import URLExtract
+
+from sweeperbot.utilities.antispam import URL_HINT
+
+CORPUS = join(dirname(abspath(__file__)), "data", "chat.txt")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--corpus", default=CORPUS)
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding="utf-8") as corpus_file:
+        messages = [line.rstrip("\n") for line in corpus_file]
+
+    url_extractor = URLExtract()
+
+    def without_prefilter(message):
+        return url_extractor.find_urls(message)
+
+    def with_prefilter(message):
+        if not URL_HINT.search(message):
+            return []
+        return url_extractor.find_urls(message)
+
+    # The prefilter must never hide a URL URLExtract would have found
+    missed = [m for m in messages if without_prefilter(m) != with_prefilter(m)]
+    if missed:
+        print(f"{len(missed)} messages lost URLs, e.g. {missed[0]!r}")
+    with_urls = sum(1 for m in messages if without_prefilter(m))
+    passed = sum(1 for m in messages if URL_HINT.search(m))
+    print(
+        f"{len(messages)} messages, {with_urls} with URLs, {passed} passed the prefilter, best of {args.repeat}"
+    )
+
+    results = {}
+    for name, fn in (("URLExtract only", without_prefilter), ("with prefilter", with_prefilter)):
+        best = min(
+            timeit.repeat(lambda: [fn(m) for m in messages], number=1, repeat=args.repeat)
+        )
+        results[name] = best
+        print(f"{name:<16} {best * 1000:8.2f} ms  {len(messages) / best:12,.0f} msgs/sec")
+    print(f"Speedup: {results['URLExtract only'] / results['with prefilter']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Measures the Aho-Corasick WordFilter against a regex alternation and a per-term loop, on word lists of 10k+ terms.
+
+Run from the repository root, so sweeperbot can be imported:
+
+    python -m benchmarks.bench_word_filter [--repeat N] [--terms N [N ...]] [--corpus PATH]
+"""
+import argparse
+import random
+import re
+import string
+import timeit
+from os.path import abspath, dirname, join
+
+from sweeperbot.utilities.word_filter import WordFilter, normalize
+
+CORPUS = join(dirname(abspath(__file__)), "data", "chat.txt")
+
+
+def make_terms(count, rng, messages):
+    """Random terms of 4-12 letters, plus some words from the corpus so a share of the messages match"""
+    words = sorted(
+        {
+            word
+            for message in messages
+            for word in normalize(message).split()
+            if word.isalpha() and len(word) > 6
+        }
+    )
+    terms = set(rng.sample(words, min(20, len(words))))
+    while len(terms) < count:
+        terms.add("".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 12))))
+    return sorted(terms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--terms", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--corpus", default=CORPUS)
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding="utf-8") as corpus_file:
+        messages = [line.rstrip("\n") for line in corpus_file]
+    rng = random.Random(0)
+    print(f"{len(messages)} messages, best of {args.repeat}")
+
+    for count in args.terms:
+        terms = make_terms(count, rng, messages)
+        build = min(timeit.repeat(lambda: WordFilter(terms), number=1, repeat=args.repeat))
+        word_filter = WordFilter(terms)
+        pattern = re.compile(
+            r"(?<![^\W_])(?:" + "|".join(map(re.escape, terms)) + r")(?![^\W_])"
+        )
+
+        def with_regex(message):
+            match = pattern.search(normalize(message))
+            return match.group(0) if match else None
+
+        def with_loop(message):
+            # Substring checks only, ignoring word boundaries, so this is a lower bound on the cost of a loop
+            text = normalize(message)
+            for term in terms:
+                if term in text:
+                    return term
+            return None
+
+        # Every matcher must flag the same messages
+        flagged = [m for m in messages if word_filter.find(m)]
+        mismatched = [m for m in messages if bool(word_filter.find(m)) != bool(with_regex(m))]
+        if mismatched:
+            print(f"  {len(mismatched)} messages disagree with the regex, e.g. {mismatched[0]!r}")
+
+        print(f"{count:,} terms: built in {build * 1000:.0f} ms, {len(flagged)} messages flagged")
+        matchers = [("Aho-Corasick", word_filter.find), ("regex alternation", with_regex)]
+        # The per-term loop is slow on big lists, so it's only run on a sample
+        matchers.append(("per-term loop", with_loop))
+        for name, fn in matchers:
+            corpus = messages[:300] if fn is with_loop else messages
+            best = min(
+                timeit.repeat(lambda: [fn(m) for m in corpus], number=1, repeat=args.repeat)
+            )
+            print(f"  {name:<18} {len(corpus) / best:12,.0f} msgs/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,11 +13,22 @@ from sentry_sdk.integrations.sqlalchemy import SqlalchemyIntegration
 from sweeperbot._version import __version__
 from sweeperbot.cogs.utils import prompt
 from sweeperbot.constants import Constants, __botname__, __description__
+from sweeperbot.db.instrumentation import query_origin
 from sweeperbot.db.manager import DatabaseManager
+from sweeperbot.utilities.actions import ActionDispatcher
 from sweeperbot.utilities.antispam import AntiSpam
+from sweeperbot.utilities.boot_profiler import BootProfiler
+from sweeperbot.utilities.catch_up import CatchUp
+from sweeperbot.utilities.guild_settings import GuildSettingsCache
 from sweeperbot.utilities.helpers import Helpers
+from sweeperbot.utilities.identity_cache import IdentityCache
+from sweeperbot.utilities.lazy_extensions import LazyExtensions
+from sweeperbot.utilities.message_buffer import MessageBuffer
 from sweeperbot.utilities.role_assignment import RoleAssignment
+from sweeperbot.utilities.scheduler import Scheduler
+from sweeperbot.utilities.startup import StartupPipeline
 from sweeperbot.utilities.tasks import Tasks
+from sweeperbot.utilities.timer_window import TimerWindow
 
 from sweeperbot.cogs.utils import checks
 
@@ -71,6 +82,7 @@ initial_extensions = (
     # Admin commands
     "cogs.admintools.shutdown",
     "cogs.admintools.showdm",
+    "cogs.admintools.metrics",
     # Profile commands
     "cogs.profile.userstats",
     "cogs.profile.avatar",
@@ -123,6 +135,7 @@ class Bot(commands.AutoShardedBot):
         self.log.info("/*********Starting App*********\\")
         self.log.info(f"App Name: {__botname__} | Version: {__version__}")
         self.started_time = datetime.utcnow()
+        self.boot = BootProfiler(self)
         self.botconfig = botconfig
         self.constants = Constants()
         self.owner = None
@@ -131,38 +144,71 @@ class Bot(commands.AutoShardedBot):
         self.cooldown_settings = None
         self.session = aiohttp.ClientSession(loop=self.loop)
         self.log.debug(f"Initialized: Session Loop")
-        self.database = DatabaseManager(self.botconfig)
+        with self.boot.phase("Database Manager"):
+            self.database = DatabaseManager(self.botconfig)
         self.log.debug(f"Initialized: Database Manager")
-        self.helpers = Helpers(self)
+        with self.boot.phase("Helpers"):
+            self.helpers = Helpers(self)
         self.log.debug(f"Initialized: Helpers")
+        with self.boot.phase("Identity Cache"):
+            self.identity_cache = IdentityCache(self)
+        self.log.debug(f"Initialized: Identity Cache")
+        with self.boot.phase("Guild Settings Cache"):
+            self.guild_settings_cache = GuildSettingsCache(self)
+        self.log.debug(f"Initialized: Guild Settings Cache")
         # Load the cooldown settings prior to loading Mod Mail or AntiSpam
-        self.helpers.db_get_cooldown_settings()
+        with self.boot.phase("Cooldown Settings"):
+            self.helpers.db_get_cooldown_settings()
         self.tasks = Tasks(self)
         self.log.debug(f"Initialized: Tasks")
-        self.antispam = AntiSpam(self)
+        self.scheduler = Scheduler(self)
+        self.log.debug(f"Initialized: Scheduler")
+        self.timer_window = TimerWindow(self)
+        self.log.debug(f"Initialized: Timer Window")
+        with self.boot.phase("Catch Up"):
+            self.catch_up = CatchUp(self)
+            self.scheduler.late_handler = self.catch_up.take_late
+        self.log.debug(f"Initialized: Catch Up")
+        self.actions = ActionDispatcher(self)
+        self.log.debug(f"Initialized: Action Dispatcher")
+        with self.boot.phase("AntiSpam"):
+            self.antispam = AntiSpam(self)
         self.log.debug(f"Initialized AntiSpam Feature")
+        self.message_buffer = MessageBuffer(self)
+        self.log.debug(f"Initialized: Message Buffer")
         self.prompt = prompt.Prompt(self)
         self.log.debug(f"Initialized: Prompt")
-        self.assignment = RoleAssignment(self)
+        with self.boot.phase("RoleAssignment"):
+            self.assignment = RoleAssignment(self)
         self.log.debug(f"Initialized: RoleAssignment")
 
         # Sets up the sentry_sdk integration:
-        sentry_sdk.init(
-            dsn=__dsn__,
-            release=__version__,
-            environment=__environment__,
-            integrations=[SqlalchemyIntegration(), RedisIntegration()],
-            before_send=self.sentry_before_send,
-            traces_sample_rate=0.25,  # Sends 25% of transactions for performance sampling
-            _experiments={
-                "auto_enabling_integrations": True
-            },  # Automatically enable all relevant transactions
-        )
+        with self.boot.phase("Sentry SDK"):
+            sentry_sdk.init(
+                dsn=__dsn__,
+                release=__version__,
+                environment=__environment__,
+                integrations=[SqlalchemyIntegration(), RedisIntegration()],
+                before_send=self.sentry_before_send,
+                traces_sample_rate=0.25,  # Sends 25% of transactions for performance sampling
+                _experiments={
+                    "auto_enabling_integrations": True
+                },  # Automatically enable all relevant transactions
+            )
         self.log.debug(f"Initialized: Sentry SDK")
 
+        self.lazy_extensions = LazyExtensions(self)
         for extension in initial_extensions:
             try:
-                self.load_extension(extension)
+                # Lazy extensions only get stubs for their commands and listeners until they're first used
+                if self.lazy_extensions.is_lazy(extension):
+                    with self.boot.phase(extension, "stub"):
+                        stubbed = self.lazy_extensions.stub(extension)
+                    if stubbed:
+                        self.log.info(f"Stubbed lazy extension {extension}")
+                        continue
+                with self.boot.phase(extension, "extension"):
+                    self.load_extension(extension)
                 self.log.info(f"Loaded extension {extension}")
             except Exception as err:
                 self.log.exception(
@@ -170,6 +216,19 @@ class Bot(commands.AutoShardedBot):
                 )
         self.log.info("Done loading all extensions")
 
+        # Run by on_ready. The tasks and mod mail need the guild settings, the rest can load at the same time.
+        self.startup = StartupPipeline(self)
+        self.startup.add("guild_settings", self.guild_settings_cache.load_all)
+        self.startup.add("reminders", self.helpers.load_reminders)
+        self.startup.add("owner_info", self.load_owner_info)
+        self.startup.add("tasks", self.start_tasks, after=["guild_settings"])
+        self.startup.add("modmail", self.load_modmail, after=["guild_settings"])
+
+    def load_extension(self, name):
+        # Loading a lazy extension by hand, e.g. with the load command, replaces its stubs
+        self.lazy_extensions.unstub(name)
+        super().load_extension(name)
+
     # Perform any actions to the event prior to it being sent.
     def sentry_before_send(self, event, hint):
         # Adding in the Bot Name and Bot ID to make identifying which bot the issue is on
@@ -182,6 +241,24 @@ class Bot(commands.AutoShardedBot):
     def get_guild_prefixes(self, msg, *, local_inject=_prefix_callable):
         return local_inject(self, msg)
 
+    def dispatch(self, event_name, *args, **kwargs):
+        # Tag database queries made by listeners with the event. Listener tasks copy the context when they're created.
+        token = query_origin.set(f"event:on_{event_name}")
+        try:
+            super().dispatch(event_name, *args, **kwargs)
+        finally:
+            query_origin.reset(token)
+
+    async def invoke(self, ctx):
+        # Tag database queries made while running a command with the command name
+        if ctx.command is None:
+            return await super().invoke(ctx)
+        token = query_origin.set(f"cmd:{ctx.command.qualified_name}")
+        try:
+            await super().invoke(ctx)
+        finally:
+            query_origin.reset(token)
+
     # little hack to allow only port requests in specified channel
     async def on_message(self, message):
         if self.user == message.author:
@@ -239,38 +316,9 @@ class Bot(commands.AutoShardedBot):
             await ctx.author.send(f"**{error.__class__.__name__}:** {error}.")
 
     async def on_ready(self):
-        # Gets all guild settings:
-        self.helpers.get_all_guild_settings()
-        # Load the cooldowns
-        await self.antispam.set_cooldown_buckets()
-        # Load the reminders
-        await self.helpers.load_reminders()
-        # Starts all tasks
-        await self.tasks.start_tasks()
-        self.log.info(f"Started all Tasks")
-
-        # Load the mod mail
-        try:
-            self.load_extension("utilities.modmail")
-            self.log.info(f"Loaded extension utilities.modmail")
-        except commands.ExtensionAlreadyLoaded:
-            pass
-
-        # Sets bot owner information
-        app_info = await self.application_info()
-        try:
-            if app_info.team:
-                self.owner = app_info.team.members
-                self.owner_ids = {member.id for member in app_info.team.members}
-                self.log.info(f"AppInfo found Team, so setting for team of owners.")
-            else:
-                self.owner = app_info.owner
-                self.owner_id = app_info.owner.id
-                self.log.info(f"AppInfo is missing Team, so setting for single owner.")
-        except Exception as err:
-            self.log.exception(
-                f"Failed to set bot owner information. {sys.exc_info()[0].__name__}: {err}"
-            )
+        # on_ready fires again after every reconnect, the startup pipeline only retries the steps that didn't finish
+        if not await self.startup.run():
+            self.log.info(f"Reconnected, startup already done")
 
         # Sets activity status
         try:
@@ -285,6 +333,33 @@ class Bot(commands.AutoShardedBot):
 
         # All ready
         self.log.info(f"Ready: {self.user} ({self.user.id})")
+        if self.boot.ready():
+            self.boot.log_report()
+
+    async def start_tasks(self):
+        # Starts all tasks
+        await self.tasks.start_tasks()
+        self.log.info(f"Started all Tasks")
+
+    async def load_modmail(self):
+        # Load the mod mail
+        try:
+            self.load_extension("utilities.modmail")
+            self.log.info(f"Loaded extension utilities.modmail")
+        except commands.ExtensionAlreadyLoaded:
+            pass
+
+    async def load_owner_info(self):
+        # Sets bot owner information
+        app_info = await self.application_info()
+        if app_info.team:
+            self.owner = app_info.team.members
+            self.owner_ids = {member.id for member in app_info.team.members}
+            self.log.info(f"AppInfo found Team, so setting for team of owners.")
+        else:
+            self.owner = app_info.owner
+            self.owner_id = app_info.owner.id
+            self.log.info(f"AppInfo is missing Team, so setting for single owner.")
 
     async def on_resumed(self):
         self.log.debug("Resumed Discord session...")
@@ -301,12 +376,25 @@ class Bot(commands.AutoShardedBot):
             await self.tasks.cancel_all_tasks()
         except Exception as err:
             pass
+        # Write any buffered messages before the database goes away
+        try:
+            await self.message_buffer.close()
+        except Exception as err:
+            self.log.exception(
+                f"Failed to flush message buffer. {sys.exc_info()[0].__name__}: {err}"
+            )
         # Close database manager
         if self.database:
             try:
                 self.database.close_engine()
+                await self.database.close_async_engine()
             except Exception as err:
                 pass
+        # Close the async Redis connections
+        try:
+            await self.helpers.async_redis.close()
+        except Exception as err:
+            pass
         # Close the bot
         await super().close()
         # Close the core session keeping bot alive
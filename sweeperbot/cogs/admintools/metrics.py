@@ -0,0 +1,360 @@
+import sys
+
+import discord
+from discord.ext import commands
+
+
+class Metrics(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    def format_stats(self, title, stats):
+        """Formats a dict of counters as a code block"""
+        width = max((len(str(key)) for key in stats), default=0)
+        lines = []
+        for key, value in stats.items():
+            if isinstance(value, float):
+                value = f"{value:,.2f}"
+            elif isinstance(value, int):
+                value = f"{value:,}"
+            lines.append(f"{str(key):<{width}} : {value}")
+        body = "\n".join(lines) or "No data"
+        return f"**{title}**\n```\n{body[:1900]}\n```"
+
+    @commands.group(invoke_without_command=True, hidden=True)
+    @commands.is_owner()
+    async def metrics(self, ctx):
+        """Shows internal performance metrics. Owner Only."""
+        await ctx.send_help(ctx.command)
+
+    @metrics.command(aliases=["messagelog", "msgbuffer"])
+    @commands.is_owner()
+    async def msglog(self, ctx):
+        """Shows the message log buffer counters. Owner Only."""
+        try:
+            self.bot.log.info(
+                f"CMD {ctx.command} called by {ctx.message.author} ({ctx.message.author.id})"
+            )
+            buffer = self.bot.message_buffer
+            stats = {"pending": len(buffer.pending), **buffer.stats}
+            await ctx.send(self.format_stats("Message Log Buffer", stats))
+        except discord.HTTPException as err:
+            self.bot.log.error(
+                f"Discord HTTP Error responding to {ctx.command} request via Msg ID {ctx.message.id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+        except Exception as err:
+            self.bot.log.exception(
+                f"Error responding to {ctx.command} via Msg ID {ctx.message.id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+            await ctx.send(
+                f"Error processing {ctx.command}. Error has already been reported to my developers."
+            )
+
+    @metrics.command(aliases=["ids", "identitycache"])
+    @commands.is_owner()
+    async def identity(self, ctx):
+        """Shows the discord id to database id cache counters. Owner Only."""
+        try:
+            self.bot.log.info(
+                f"CMD {ctx.command} called by {ctx.message.author} ({ctx.message.author.id})"
+            )
+            cache = self.bot.identity_cache
+            stats = {**cache.sizes(), **cache.stats}
+            for prefix in ("user", "server"):
+                lookups = stats[f"{prefix}_hits"] + stats[f"{prefix}_misses"]
+                stats[f"{prefix}_hit_rate"] = (
+                    stats[f"{prefix}_hits"] / lookups * 100 if lookups else 0.0
+                )
+            await ctx.send(self.format_stats("Identity Cache", stats))
+        except discord.HTTPException as err:
+            self.bot.log.error(
+                f"Discord HTTP Error responding to {ctx.command} request via Msg ID {ctx.message.id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+        except Exception as err:
+            self.bot.log.exception(
+                f"Error responding to {ctx.command} via Msg ID {ctx.message.id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+            await ctx.send(
+                f"Error processing {ctx.command}. Error has already been reported to my developers."
+            )
+
+    @metrics.command(aliases=["dbexec", "executor"])
+    @commands.is_owner()
+    async def dbpool(self, ctx):
+        """Shows the database thread pool queue depth and wait times. Owner Only."""
+        try:
+            self.bot.log.info(
+                f"CMD {ctx.command} called by {ctx.message.author} ({ctx.message.author.id})"
+            )
+            stats = self.bot.database.executor.snapshot()
+            await ctx.send(self.format_stats("Database Thread Pool", stats))
+        except discord.HTTPException as err:
+            self.bot.log.error(
+                f"Discord HTTP Error responding to {ctx.command} request via Msg ID {ctx.message.id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+        except Exception as err:
+            self.bot.log.exception(
+                f"Error responding to {ctx.command} via Msg ID {ctx.message.id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+            await ctx.send(
+                f"Error processing {ctx.command}. Error has already been reported to my developers."
+            )
+
+    @metrics.command(aliases=["urlresolver", "redirects"])
+    @commands.is_owner()
+    async def urls(self, ctx):
+        """Shows the AntiSpam URL resolver counters. Owner Only."""
+        try:
+            self.bot.log.info(
+                f"CMD {ctx.command} called by {ctx.message.author} ({ctx.message.author.id})"
+            )
+            stats = self.bot.antispam.url_resolver.snapshot()
+            await ctx.send(self.format_stats("URL Resolver", stats))
+        except discord.HTTPException as err:
+            self.bot.log.error(
+                f"Discord HTTP Error responding to {ctx.command} request via Msg ID {ctx.message.id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+        except Exception as err:
+            self.bot.log.exception(
+                f"Error responding to {ctx.command} via Msg ID {ctx.message.id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+            await ctx.send(
+                f"Error processing {ctx.command}. Error has already been reported to my developers."
+            )
+
+    @metrics.command(aliases=["linkcache", "invitecache"])
+    @commands.is_owner()
+    async def antispamcache(self, ctx):
+        """Shows the AntiSpam URL and invite cache hit rates. Owner Only."""
+        try:
+            self.bot.log.info(
+                f"CMD {ctx.command} called by {ctx.message.author} ({ctx.message.author.id})"
+            )
+            await ctx.send(
+                self.format_stats("URL Cache", self.bot.antispam.url_cache.snapshot())
+                + "\n"
+                + self.format_stats(
+                    "Invite Cache", self.bot.antispam.invite_cache.snapshot()
+                )
+            )
+        except discord.HTTPException as err:
+            self.bot.log.error(
+                f"Discord HTTP Error responding to {ctx.command} request via Msg ID {ctx.message.id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+        except Exception as err:
+            self.bot.log.exception(
+                f"Error responding to {ctx.command} via Msg ID {ctx.message.id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+            await ctx.send(
+                f"Error processing {ctx.command}. Error has already been reported to my developers."
+            )
+
+    @metrics.command(aliases=["quickmsg", "ratelimit"])
+    @commands.is_owner()
+    async def ratelimiter(self, ctx):
+        """Shows the AntiSpam quick message rate limiter counters. Owner Only."""
+        try:
+            self.bot.log.info(
+                f"CMD {ctx.command} called by {ctx.message.author} ({ctx.message.author.id})"
+            )
+            await ctx.send(
+                self.format_stats(
+                    "Rate Limiter", self.bot.antispam.rate_limiter.snapshot()
+                )
+            )
+        except discord.HTTPException as err:
+            self.bot.log.error(
+                f"Discord HTTP Error responding to {ctx.command} request via Msg ID {ctx.message.id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+        except Exception as err:
+            self.bot.log.exception(
+                f"Error responding to {ctx.command} via Msg ID {ctx.message.id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+            await ctx.send(
+                f"Error processing {ctx.command}. Error has already been reported to my developers."
+            )
+
+    @metrics.command(aliases=["raids", "duplicates"])
+    @commands.is_owner()
+    async def raid(self, ctx):
+        """Shows the AntiSpam raid detector counters. Owner Only."""
+        try:
+            self.bot.log.info(
+                f"CMD {ctx.command} called by {ctx.message.author} ({ctx.message.author.id})"
+            )
+            detector = self.bot.antispam.raid_detector
+            stats = {
+                "fingerprints": sum(len(fps) for fps in detector.guilds.values()),
+                **detector.stats,
+            }
+            await ctx.send(self.format_stats("Raid Detector", stats))
+        except discord.HTTPException as err:
+            self.bot.log.error(
+                f"Discord HTTP Error responding to {ctx.command} request via Msg ID {ctx.message.id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+        except Exception as err:
+            self.bot.log.exception(
+                f"Error responding to {ctx.command} via Msg ID {ctx.message.id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+            await ctx.send(
+                f"Error processing {ctx.command}. Error has already been reported to my developers."
+            )
+
+    @metrics.command(aliases=["words", "filter"])
+    @commands.is_owner()
+    async def wordfilter(self, ctx):
+        """Shows the AntiSpam word filter counters. Owner Only."""
+        try:
+            self.bot.log.info(
+                f"CMD {ctx.command} called by {ctx.message.author} ({ctx.message.author.id})"
+            )
+            stats = self.bot.antispam.word_filters.snapshot()
+            await ctx.send(self.format_stats("Word Filter", stats))
+        except discord.HTTPException as err:
+            self.bot.log.error(
+                f"Discord HTTP Error responding to {ctx.command} request via Msg ID {ctx.message.id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+        except Exception as err:
+            self.bot.log.exception(
+                f"Error responding to {ctx.command} via Msg ID {ctx.message.id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+            await ctx.send(
+                f"Error processing {ctx.command}. Error has already been reported to my developers."
+            )
+
+    @metrics.command(aliases=["antispamqueue", "workers"])
+    @commands.is_owner()
+    async def queue(self, ctx):
+        """Shows the AntiSpam queue depth, drops and latency. Owner Only."""
+        try:
+            self.bot.log.info(
+                f"CMD {ctx.command} called by {ctx.message.author} ({ctx.message.author.id})"
+            )
+            await ctx.send(
+                self.format_stats("AntiSpam Queue", self.bot.antispam.queue.snapshot())
+            )
+        except discord.HTTPException as err:
+            self.bot.log.error(
+                f"Discord HTTP Error responding to {ctx.command} request via Msg ID {ctx.message.id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+        except Exception as err:
+            self.bot.log.exception(
+                f"Error responding to {ctx.command} via Msg ID {ctx.message.id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+            await ctx.send(
+                f"Error processing {ctx.command}. Error has already been reported to my developers."
+            )
+
+    @metrics.command(aliases=["timers"])
+    @commands.is_owner()
+    async def scheduler(self, ctx):
+        """Shows the mute and reminder timers waiting on the scheduler, the window they're loaded for and any catch-up. Owner Only."""
+        try:
+            self.bot.log.info(
+                f"CMD {ctx.command} called by {ctx.message.author} ({ctx.message.author.id})"
+            )
+            await ctx.send(
+                self.format_stats("Scheduler", self.bot.scheduler.snapshot())
+                + "\n"
+                + self.format_stats("Timer Window", self.bot.timer_window.snapshot())
+                + "\n"
+                + self.format_stats("Catch Up", self.bot.catch_up.snapshot())
+            )
+        except discord.HTTPException as err:
+            self.bot.log.error(
+                f"Discord HTTP Error responding to {ctx.command} request via Msg ID {ctx.message.id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+        except Exception as err:
+            self.bot.log.exception(
+                f"Error responding to {ctx.command} via Msg ID {ctx.message.id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+            await ctx.send(
+                f"Error processing {ctx.command}. Error has already been reported to my developers."
+            )
+
+    @metrics.command(aliases=["startup"])
+    @commands.is_owner()
+    async def boot(self, ctx, slowest: int = 10):
+        """Shows how long each phase of startup took and the queries it made. Owner Only."""
+        try:
+            self.bot.log.info(
+                f"CMD {ctx.command} called by {ctx.message.author} ({ctx.message.author.id})"
+            )
+            body = "\n".join(self.bot.boot.lines(slowest))
+            await ctx.send(f"**Boot Report**\n```\n{body[:1900]}\n```")
+        except discord.HTTPException as err:
+            self.bot.log.error(
+                f"Discord HTTP Error responding to {ctx.command} request via Msg ID {ctx.message.id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+        except Exception as err:
+            self.bot.log.exception(
+                f"Error responding to {ctx.command} via Msg ID {ctx.message.id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+            await ctx.send(
+                f"Error processing {ctx.command}. Error has already been reported to my developers."
+            )
+
+    @metrics.command(aliases=["lazyextensions", "cogs"])
+    @commands.is_owner()
+    async def lazy(self, ctx):
+        """Shows which lazy extensions have been loaded, what loaded them and what it cost. Owner Only."""
+        try:
+            self.bot.log.info(
+                f"CMD {ctx.command} called by {ctx.message.author} ({ctx.message.author.id})"
+            )
+            await ctx.send(
+                self.format_stats("Lazy Extensions", self.bot.lazy_extensions.snapshot())
+            )
+        except discord.HTTPException as err:
+            self.bot.log.error(
+                f"Discord HTTP Error responding to {ctx.command} request via Msg ID {ctx.message.id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+        except Exception as err:
+            self.bot.log.exception(
+                f"Error responding to {ctx.command} via Msg ID {ctx.message.id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+            await ctx.send(
+                f"Error processing {ctx.command}. Error has already been reported to my developers."
+            )
+
+    @metrics.command(aliases=["query", "sql"])
+    @commands.is_owner()
+    async def queries(self, ctx, count: int = 10, sort_by: str = "total_ms"):
+        """Shows the commands and listeners spending the most time in the database. Owner Only.
+
+        Sort by one of: total_ms, avg_ms, p95_ms, max_ms, calls, slow"""
+        try:
+            self.bot.log.info(
+                f"CMD {ctx.command} called by {ctx.message.author} ({ctx.message.author.id})"
+            )
+            if sort_by not in ("total_ms", "avg_ms", "p95_ms", "max_ms", "calls", "slow"):
+                return await ctx.send(f"Unable to sort by `{sort_by}`.")
+            query_stats = self.bot.database.query_stats
+            top = query_stats.top(count, key=sort_by)
+            lines = [
+                f"{'origin':<32} {'calls':>8} {'total_ms':>11} {'avg':>8} {'p95':>7} {'max':>8} {'slow':>5}"
+            ]
+            for origin, stats in top:
+                lines.append(
+                    f"{origin[:32]:<32} {stats['calls']:>8,} {stats['total_ms']:>11,.0f} {stats['avg_ms']:>8.1f} "
+                    f"{stats['p95_ms']:>7.0f} {stats['max_ms']:>8.1f} {stats['slow']:>5,}"
+                )
+            body = "\n".join(lines) if top else "No data"
+            await ctx.send(
+                f"**Top {count} Database Users by {sort_by}** (slow >= {query_stats.slow_query_ms:g}ms)\n```\n{body[:1850]}\n```"
+            )
+        except discord.HTTPException as err:
+            self.bot.log.error(
+                f"Discord HTTP Error responding to {ctx.command} request via Msg ID {ctx.message.id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+        except Exception as err:
+            self.bot.log.exception(
+                f"Error responding to {ctx.command} via Msg ID {ctx.message.id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+            await ctx.send(
+                f"Error processing {ctx.command}. Error has already been reported to my developers."
+            )
+
+
+def setup(bot):
+    bot.add_cog(Metrics(bot))
@@ -6,6 +6,7 @@ from sqlalchemy import exc
 
 from sweeperbot.cogs.utils.paginator import FieldPages
 from sweeperbot.db import models
+from sweeperbot.utilities.word_filter import terms_from_data
 
 
 class Config(commands.Cog):
@@ -70,11 +71,7 @@ class Config(commands.Cog):
             session.commit()
 
             # Update local cache
-            self.bot.guild_settings[
-                ctx.message.guild.id
-            ] = await self.bot.helpers.get_one_guild_settings(
-                session, ctx.message.guild.id
-            )
+            await self.bot.guild_settings_cache.refresh(ctx.message.guild.id)
 
             return await ctx.send(
                 f"Successfully set the muted role to: {muterole.mention}."
@@ -139,11 +136,7 @@ class Config(commands.Cog):
             session.commit()
 
             # Update local cache
-            self.bot.guild_settings[
-                ctx.message.guild.id
-            ] = await self.bot.helpers.get_one_guild_settings(
-                session, ctx.message.guild.id
-            )
+            await self.bot.guild_settings_cache.refresh(ctx.message.guild.id)
 
             return await ctx.send(
                 f"Successfully set the mod channel to: {channel.mention}."
@@ -225,13 +218,6 @@ class Config(commands.Cog):
             )
             guild_settings.admin_role = role.id
 
-            # Update local cache
-            self.bot.guild_settings[
-                ctx.message.guild.id
-            ] = await self.bot.helpers.get_one_guild_settings(
-                session, ctx.message.guild.id
-            )
-
             # Now that we have the role, let's update the list of admins
             # We're going to start by removing all admins for the server and setting new ones. This is due to the fact
             # that the server may be changing the admin role, and we don't want any old/bad data.
@@ -272,6 +258,10 @@ class Config(commands.Cog):
 
             # Now that the sync/setup is done, let's commit all our changes
             session.commit()
+
+            # Update local cache
+            await self.bot.guild_settings_cache.refresh(ctx.message.guild.id)
+
             # and let the user know we're done
             await ctx.send(f"Config and sync of admin role is complete.")
 
@@ -351,13 +341,6 @@ class Config(commands.Cog):
             )
             guild_settings.mod_role = role.id
 
-            # Update local cache
-            self.bot.guild_settings[
-                ctx.message.guild.id
-            ] = await self.bot.helpers.get_one_guild_settings(
-                session, ctx.message.guild.id
-            )
-
             # Now that we have the role, let's update the list of admins
             # We're going to start by removing all admins for the server and setting new ones. This is due to the fact
             # that the server may be changing the admin role, and we don't want any old/bad data.
@@ -398,6 +381,10 @@ class Config(commands.Cog):
 
             # Now that the sync/setup is done, let's commit all our changes
             session.commit()
+
+            # Update local cache
+            await self.bot.guild_settings_cache.refresh(ctx.message.guild.id)
+
             # and let the user know we're done
             await ctx.send(f"Config and sync of mod role is complete.")
 
@@ -460,11 +447,7 @@ class Config(commands.Cog):
             session.commit()
 
             # Update local cache
-            self.bot.guild_settings[
-                ctx.message.guild.id
-            ] = await self.bot.helpers.get_one_guild_settings(
-                session, ctx.message.guild.id
-            )
+            await self.bot.guild_settings_cache.refresh(ctx.message.guild.id)
 
             return await ctx.send(
                 f"Successfully set the Appeals Server link to: {invite}."
@@ -539,11 +522,7 @@ class Config(commands.Cog):
             session.commit()
 
             # Update local cache
-            self.bot.guild_settings[
-                ctx.message.guild.id
-            ] = await self.bot.helpers.get_one_guild_settings(
-                session, ctx.message.guild.id
-            )
+            await self.bot.guild_settings_cache.refresh(ctx.message.guild.id)
 
             return await ctx.send(
                 f"Successfully set the channel where requests are sent to: {channel.mention}."
@@ -608,11 +587,7 @@ class Config(commands.Cog):
             session.commit()
 
             # Update local cache
-            self.bot.guild_settings[
-                ctx.message.guild.id
-            ] = await self.bot.helpers.get_one_guild_settings(
-                session, ctx.message.guild.id
-            )
+            await self.bot.guild_settings_cache.refresh(ctx.message.guild.id)
 
             return await ctx.send(
                 f"Successfully set the channel users are allowed to use the request command in to: {channel.mention}."
@@ -678,11 +653,7 @@ class Config(commands.Cog):
             session.commit()
 
             # Update local cache
-            self.bot.guild_settings[
-                ctx.message.guild.id
-            ] = await self.bot.helpers.get_one_guild_settings(
-                session, ctx.message.guild.id
-            )
+            await self.bot.guild_settings_cache.refresh(ctx.message.guild.id)
 
             return await ctx.send(
                 f"Successfully set the channel where requests are sent to: {channel.mention}."
@@ -748,11 +719,7 @@ class Config(commands.Cog):
             session.commit()
 
             # Update local cache
-            self.bot.guild_settings[
-                ctx.message.guild.id
-            ] = await self.bot.helpers.get_one_guild_settings(
-                session, ctx.message.guild.id
-            )
+            await self.bot.guild_settings_cache.refresh(ctx.message.guild.id)
 
             return await ctx.send(
                 f"Successfully set the Downvotes feature to: {enabled}."
@@ -818,11 +785,7 @@ class Config(commands.Cog):
             session.commit()
 
             # Update local cache
-            self.bot.guild_settings[
-                ctx.message.guild.id
-            ] = await self.bot.helpers.get_one_guild_settings(
-                session, ctx.message.guild.id
-            )
+            await self.bot.guild_settings_cache.refresh(ctx.message.guild.id)
 
             return await ctx.send(
                 f"Successfully set the Questions feature to: {enabled}."
@@ -888,11 +851,7 @@ class Config(commands.Cog):
             session.commit()
 
             # Update local cache
-            self.bot.guild_settings[
-                ctx.message.guild.id
-            ] = await self.bot.helpers.get_one_guild_settings(
-                session, ctx.message.guild.id
-            )
+            await self.bot.guild_settings_cache.refresh(ctx.message.guild.id)
 
             return await ctx.send(
                 f"Successfully set the request type to: {request_type}."
@@ -928,7 +887,7 @@ class Config(commands.Cog):
     @commands.has_permissions(manage_guild=True)
     @config.group(aliases=["spam"], invoke_without_command=False)
     async def antispam(self, ctx):
-        """Base for the Antispam configuration. See `antispam quickmsg true/false`"""
+        """Base for the Antispam configuration. See `antispam quickmsg true/false` and `antispam massmentions true/false`"""
         pass
 
     @commands.guild_only()
@@ -966,14 +925,236 @@ class Config(commands.Cog):
             session.commit()
 
             # Update local cache
-            self.bot.guild_settings[
-                ctx.message.guild.id
-            ] = await self.bot.helpers.get_one_guild_settings(
+            await self.bot.guild_settings_cache.refresh(ctx.message.guild.id)
+
+            return await ctx.send(
+                f"Successfully set the AntiSpam Quick Message feature to: {enabled}."
+            )
+
+        except discord.HTTPException as err:
+            self.bot.log.error(
+                f"Discord HTTP Error responding to {ctx.command} request via Msg ID {ctx.message.id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+            await ctx.send(
+                f"Error processing {ctx.command}. Error has already been reported to my developers."
+            )
+        except exc.DBAPIError as err:
+            self.bot.log.exception(
+                f"Database error with {ctx.command} command. {sys.exc_info()[0].__name__}: {err}"
+            )
+            await ctx.send(
+                f"Error processing {ctx.command}. Error has already been reported to my developers."
+            )
+            session.rollback()
+        except Exception as err:
+            self.bot.log.exception(
+                f"Error responding to {ctx.command} via Msg ID {ctx.message.id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+            await ctx.send(
+                f"Error processing {ctx.command}. Error has already been reported to my developers."
+            )
+        finally:
+            session.close()
+
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    @antispam.command(aliases=["massmention", "mentions"])
+    async def massmentions(self, ctx, *, enabled: bool):
+        """Sets whether the mass mention antispam feature is enabled or not. Users who mention too many users or roles, in one message or over a short time, are muted.
+
+        Example:
+
+        config antispam massmentions true
+        config antispam massmentions false
+
+        Requires Permission: Manage Guild
+
+        Parameters
+        -----------
+        ctx: context
+            The context message involved.
+        enabled: bool
+            Whether to enable the feature.
+        """
+
+        session = self.bot.helpers.get_db_session()
+        try:
+            self.bot.log.info(
+                f"CMD {ctx.command} called by {ctx.message.author} ({ctx.message.author.id})"
+            )
+
+            # Get the guild settings
+            settings = await self.bot.helpers.get_one_guild_settings(
                 session, ctx.message.guild.id
             )
+            settings.antispam_mass_mentions = enabled
+            session.commit()
+
+            # Update local cache
+            await self.bot.guild_settings_cache.refresh(ctx.message.guild.id)
 
             return await ctx.send(
-                f"Successfully set the AntiSpam Quick Message feature to: {enabled}."
+                f"Successfully set the AntiSpam Mass Mentions feature to: {enabled}."
+            )
+
+        except discord.HTTPException as err:
+            self.bot.log.error(
+                f"Discord HTTP Error responding to {ctx.command} request via Msg ID {ctx.message.id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+            await ctx.send(
+                f"Error processing {ctx.command}. Error has already been reported to my developers."
+            )
+        except exc.DBAPIError as err:
+            self.bot.log.exception(
+                f"Database error with {ctx.command} command. {sys.exc_info()[0].__name__}: {err}"
+            )
+            await ctx.send(
+                f"Error processing {ctx.command}. Error has already been reported to my developers."
+            )
+            session.rollback()
+        except Exception as err:
+            self.bot.log.exception(
+                f"Error responding to {ctx.command} via Msg ID {ctx.message.id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+            await ctx.send(
+                f"Error processing {ctx.command}. Error has already been reported to my developers."
+            )
+        finally:
+            session.close()
+
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    @antispam.command(aliases=["wordfilter", "filter"])
+    async def antispam_wordfilter(self, ctx, *, enabled: bool):
+        """Sets whether the word filter antispam feature is enabled or not. Messages containing a filtered word are deleted. See `antispam words`.
+
+        Example:
+
+        config antispam wordfilter true
+        config antispam wordfilter false
+
+        Requires Permission: Manage Guild
+
+        Parameters
+        -----------
+        ctx: context
+            The context message involved.
+        enabled: bool
+            Whether to enable the feature.
+        """
+
+        session = self.bot.helpers.get_db_session()
+        try:
+            self.bot.log.info(
+                f"CMD {ctx.command} called by {ctx.message.author} ({ctx.message.author.id})"
+            )
+
+            # Get the guild settings
+            settings = await self.bot.helpers.get_one_guild_settings(
+                session, ctx.message.guild.id
+            )
+            settings.antispam_wordfilter = enabled
+            session.commit()
+
+            # Update local cache
+            await self.bot.guild_settings_cache.refresh(ctx.message.guild.id)
+
+            return await ctx.send(
+                f"Successfully set the AntiSpam Word Filter feature to: {enabled}."
+            )
+
+        except discord.HTTPException as err:
+            self.bot.log.error(
+                f"Discord HTTP Error responding to {ctx.command} request via Msg ID {ctx.message.id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+            await ctx.send(
+                f"Error processing {ctx.command}. Error has already been reported to my developers."
+            )
+        except exc.DBAPIError as err:
+            self.bot.log.exception(
+                f"Database error with {ctx.command} command. {sys.exc_info()[0].__name__}: {err}"
+            )
+            await ctx.send(
+                f"Error processing {ctx.command}. Error has already been reported to my developers."
+            )
+            session.rollback()
+        except Exception as err:
+            self.bot.log.exception(
+                f"Error responding to {ctx.command} via Msg ID {ctx.message.id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+            await ctx.send(
+                f"Error processing {ctx.command}. Error has already been reported to my developers."
+            )
+        finally:
+            session.close()
+
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    @antispam.command(aliases=["word", "filterwords"])
+    async def words(self, ctx, action: str, *, words: str = None):
+        """Adds, removes or lists the words of the word filter. Separate multiple words with commas.
+
+        Words only match whole words, unless they start or end with a * e.g. `spam*` also matches `spammer`. Case, zero-width characters and common leetspeak are ignored.
+
+        Example:
+
+        config antispam words add badword, spam*
+        config antispam words remove badword
+        config antispam words list
+
+        Requires Permission: Manage Guild
+
+        Parameters
+        -----------
+        ctx: context
+            The context message involved.
+        action: str
+            One of add, remove, or list.
+        words: str
+            The comma separated words to add or remove.
+        """
+
+        session = self.bot.helpers.get_db_session()
+        try:
+            self.bot.log.info(
+                f"CMD {ctx.command} called by {ctx.message.author} ({ctx.message.author.id})"
+            )
+            action = action.lower()
+            if action not in ("add", "remove", "list"):
+                return await ctx.send(
+                    f"Please choose one of `add`, `remove`, or `list`. Example: `config antispam words add badword`"
+                )
+            new_words = [
+                word.strip().lower() for word in (words or "").split(",") if word.strip()
+            ]
+            if action != "list" and not new_words:
+                return await ctx.send(f"Please provide the words to {action}.")
+
+            # Get the guild settings
+            settings = await self.bot.helpers.get_one_guild_settings(
+                session, ctx.message.guild.id
+            )
+            current = terms_from_data(settings.wordfilter_data)
+            if action == "list":
+                if not current:
+                    return await ctx.send(f"The word filter is empty.")
+                word_list = ", ".join(f"`{word}`" for word in sorted(current))
+                return await ctx.send(
+                    f"The word filter has {len(current)} words: {word_list}"[:2000]
+                )
+            if action == "add":
+                updated = current + [word for word in new_words if word not in current]
+            else:
+                updated = [word for word in current if word not in new_words]
+            # Assign a new object so SQLAlchemy sees the JSON column changed
+            settings.wordfilter_data = {"words": updated}
+            session.commit()
+
+            # Update local cache, the guild's word filter is rebuilt from it in the background
+            await self.bot.guild_settings_cache.refresh(ctx.message.guild.id)
+
+            return await ctx.send(
+                f"Successfully updated the word filter, it now has {len(updated)} words."
             )
 
         except discord.HTTPException as err:
@@ -1035,13 +1216,7 @@ class Config(commands.Cog):
             session.commit()
 
             # Update local cache
-            self.bot.guild_settings[
-                ctx.message.guild.id
-            ] = await self.bot.helpers.get_one_guild_settings(
-                session, ctx.message.guild.id
-            )
-            # Reinitialize all the cooldowns and their buckets
-            await self.bot.antispam.set_cooldown_buckets()
+            await self.bot.guild_settings_cache.refresh(ctx.message.guild.id)
 
             return await ctx.send(
                 f"Successfully set the AntiSpam On Message # of Messages rate to: {rate}."
@@ -1108,13 +1283,7 @@ class Config(commands.Cog):
             session.commit()
 
             # Update local cache
-            self.bot.guild_settings[
-                ctx.message.guild.id
-            ] = await self.bot.helpers.get_one_guild_settings(
-                session, ctx.message.guild.id
-            )
-            # Reinitialize all the cooldowns and their buckets
-            await self.bot.antispam.set_cooldown_buckets()
+            await self.bot.guild_settings_cache.refresh(ctx.message.guild.id)
 
             return await ctx.send(
                 f"Successfully set the AntiSpam timer to: {rate} seconds."
@@ -1181,11 +1350,7 @@ class Config(commands.Cog):
             session.commit()
 
             # Update local cache
-            self.bot.guild_settings[
-                ctx.message.guild.id
-            ] = await self.bot.helpers.get_one_guild_settings(
-                session, ctx.message.guild.id
-            )
+            await self.bot.guild_settings_cache.refresh(ctx.message.guild.id)
 
             return await ctx.send(
                 f"Successfully set the AntiSpam Mute Time to: {mute_length}."
@@ -1216,6 +1381,58 @@ class Config(commands.Cog):
         finally:
             session.close()
 
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    @antispam.command(aliases=["rules", "refresh"])
+    async def reload(self, ctx):
+        """Reloads the AntiSpam rules for this server from the database, so changes apply immediately.
+
+        Example:
+
+        config antispam reload
+
+        Requires Permission: Manage Guild
+
+        Parameters
+        -----------
+        ctx: context
+            The context message involved.
+        """
+
+        try:
+            self.bot.log.info(
+                f"CMD {ctx.command} called by {ctx.message.author} ({ctx.message.author.id})"
+            )
+
+            await self.bot.antispam.refresh_rules(ctx.message.guild.id)
+            service_rules = self.bot.antispam.guild_rules.get(ctx.message.guild.id, {})
+
+            return await ctx.send(
+                f"Successfully reloaded the AntiSpam rules for {len(service_rules)} service(s)."
+            )
+
+        except discord.HTTPException as err:
+            self.bot.log.error(
+                f"Discord HTTP Error responding to {ctx.command} request via Msg ID {ctx.message.id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+            await ctx.send(
+                f"Error processing {ctx.command}. Error has already been reported to my developers."
+            )
+        except exc.DBAPIError as err:
+            self.bot.log.exception(
+                f"Database error with {ctx.command} command. {sys.exc_info()[0].__name__}: {err}"
+            )
+            await ctx.send(
+                f"Error processing {ctx.command}. Error has already been reported to my developers."
+            )
+        except Exception as err:
+            self.bot.log.exception(
+                f"Error responding to {ctx.command} via Msg ID {ctx.message.id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+            await ctx.send(
+                f"Error processing {ctx.command}. Error has already been reported to my developers."
+            )
+
     # On Join Welcome Message Configuration
     @commands.guild_only()
     @commands.has_permissions(manage_guild=True)
@@ -1259,11 +1476,7 @@ class Config(commands.Cog):
             session.commit()
 
             # Update local cache
-            self.bot.guild_settings[
-                ctx.message.guild.id
-            ] = await self.bot.helpers.get_one_guild_settings(
-                session, ctx.message.guild.id
-            )
+            await self.bot.guild_settings_cache.refresh(ctx.message.guild.id)
 
             return await ctx.send(
                 f"Successfully set the On Join Welcome Message to:\n{text}"
@@ -1329,11 +1542,7 @@ class Config(commands.Cog):
             session.commit()
 
             # Update local cache
-            self.bot.guild_settings[
-                ctx.message.guild.id
-            ] = await self.bot.helpers.get_one_guild_settings(
-                session, ctx.message.guild.id
-            )
+            await self.bot.guild_settings_cache.refresh(ctx.message.guild.id)
 
             return await ctx.send(
                 f"Successfully set the On Join Welcome Message feature to: {enabled}."
@@ -1415,11 +1624,7 @@ class Config(commands.Cog):
             session.commit()
 
             # Update local cache
-            self.bot.guild_settings[
-                ctx.message.guild.id
-            ] = await self.bot.helpers.get_one_guild_settings(
-                session, ctx.message.guild.id
-            )
+            await self.bot.guild_settings_cache.refresh(ctx.message.guild.id)
 
             return await ctx.send(
                 f"Successfully set the On Join Role to: '{role.name}'"
@@ -1485,11 +1690,7 @@ class Config(commands.Cog):
             session.commit()
 
             # Update local cache
-            self.bot.guild_settings[
-                ctx.message.guild.id
-            ] = await self.bot.helpers.get_one_guild_settings(
-                session, ctx.message.guild.id
-            )
+            await self.bot.guild_settings_cache.refresh(ctx.message.guild.id)
 
             return await ctx.send(
                 f"Successfully set the On Join Role feature to: {enabled}."
@@ -1574,11 +1775,7 @@ class Config(commands.Cog):
                 guild_settings.activity_status = current
                 session.commit()
                 # Update local cache
-                self.bot.guild_settings[
-                    ctx.message.guild.id
-                ] = await self.bot.helpers.get_one_guild_settings(
-                    session, ctx.message.guild.id
-                )
+                await self.bot.guild_settings_cache.refresh(ctx.message.guild.id)
 
                 # Send update to user
                 return await ctx.send(f"Added '{status_text}' to status text rotation.")
@@ -1657,11 +1854,7 @@ class Config(commands.Cog):
                 guild_settings.activity_status = current
                 session.commit()
                 # Update local cache
-                self.bot.guild_settings[
-                    ctx.message.guild.id
-                ] = await self.bot.helpers.get_one_guild_settings(
-                    session, ctx.message.guild.id
-                )
+                await self.bot.guild_settings_cache.refresh(ctx.message.guild.id)
 
                 # Send update to user
                 return await ctx.send(
@@ -1732,11 +1925,7 @@ class Config(commands.Cog):
             session.commit()
 
             # Update local cache
-            self.bot.guild_settings[
-                ctx.message.guild.id
-            ] = await self.bot.helpers.get_one_guild_settings(
-                session, ctx.message.guild.id
-            )
+            await self.bot.guild_settings_cache.refresh(ctx.message.guild.id)
 
             return await ctx.send(
                 f"Successfully set the Activity Status to: {enabled}."
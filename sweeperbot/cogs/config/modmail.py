@@ -58,11 +58,7 @@ class Config(commands.Cog):
             session.commit()
 
             # Update local cache
-            self.bot.guild_settings[
-                ctx.message.guild.id
-            ] = await self.bot.helpers.get_one_guild_settings(
-                session, ctx.message.guild.id
-            )
+            await self.bot.guild_settings_cache.refresh(ctx.message.guild.id)
 
             return await ctx.send(
                 f"Successfully set the mod mail server to: {mm_guild.name} ({mm_guild.id})."
@@ -130,11 +126,7 @@ class Config(commands.Cog):
             session.commit()
 
             # Update local cache
-            self.bot.guild_settings[
-                ctx.message.guild.id
-            ] = await self.bot.helpers.get_one_guild_settings(
-                session, ctx.message.guild.id
-            )
+            await self.bot.guild_settings_cache.refresh(ctx.message.guild.id)
 
             return await ctx.send(
                 f"Successfully set the mod mail unanswered category to: {mm_category.name} ({mm_category.id})."
@@ -202,11 +194,7 @@ class Config(commands.Cog):
             session.commit()
 
             # Update local cache
-            self.bot.guild_settings[
-                ctx.message.guild.id
-            ] = await self.bot.helpers.get_one_guild_settings(
-                session, ctx.message.guild.id
-            )
+            await self.bot.guild_settings_cache.refresh(ctx.message.guild.id)
 
             return await ctx.send(
                 f"Successfully set the mod mail In Progress category to: {mm_category.name} ({mm_category.id})."
@@ -84,11 +84,7 @@ class Prefix(commands.Cog):
                 guild_settings.bot_prefix = current_prefixes
                 session.commit()
                 # Update local cache
-                self.bot.guild_settings[
-                    ctx.message.guild.id
-                ] = await self.bot.helpers.get_one_guild_settings(
-                    session, ctx.message.guild.id
-                )
+                await self.bot.guild_settings_cache.refresh(ctx.message.guild.id)
 
                 # Get current prefixes
                 embed = self.get_current_prefixes(ctx)
@@ -158,11 +154,7 @@ class Prefix(commands.Cog):
                 guild_settings.bot_prefix = current_prefixes
                 session.commit()
                 # Update local cache
-                self.bot.guild_settings[
-                    ctx.message.guild.id
-                ] = await self.bot.helpers.get_one_guild_settings(
-                    session, ctx.message.guild.id
-                )
+                await self.bot.guild_settings_cache.refresh(ctx.message.guild.id)
 
                 # Get current prefixes
                 embed = self.get_current_prefixes(ctx)
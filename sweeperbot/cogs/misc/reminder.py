@@ -142,17 +142,20 @@ class Reminder(commands.Cog):
             session.add(db_remind)
             session.commit()
 
-            # Add timer to send the reminder
-            timer = Timer.temporary(
-                guild.id,
-                remind_user.id,
-                creator_user.id,
-                remind_text,
-                event=self._remind,
-                expires=remind_time,
-                created=datetime.datetime.now(datetime.timezone.utc),
-            )
-            timer.start(self.bot.loop)
+            # Reminders expiring later are loaded by the timer window once they're due
+            if self.bot.timer_window.covers("reminders", remind_time):
+                # Add timer to send the reminder
+                timer = Timer.temporary(
+                    guild.id,
+                    remind_user.id,
+                    creator_user.id,
+                    remind_text,
+                    event=self._remind,
+                    expires=remind_time,
+                    created=datetime.datetime.now(datetime.timezone.utc),
+                    key=("reminder", db_remind.id),
+                )
+                timer.start(self.bot.scheduler)
 
             # Tell user reminder is created
             # TO DO - Make this look a little nicer.
@@ -233,30 +233,18 @@ class Request(commands.Cog):
                         )).delete(delay=15)
                     # Now let's log it to the database
                     try:
-                        # Check if there is a user in the database already
-                        db_user = (
-                            session.query(models.User)
-                            .filter(models.User.discord_id == ctx.message.author.id)
-                            .first()
+                        # Get the DB ID for the user
+                        db_user_id = await self.bot.helpers.db_get_user_id(
+                            ctx.message.author.id
                         )
-                        # If no DB record for the user then create one
-                        if not db_user:
-                            db_user = models.User(discord_id=ctx.message.author.id)
-                            session.add(db_user)
-                        # Check if there is a guild in the database already
-                        db_guild = (
-                            session.query(models.Server)
-                            .filter(models.Server.discord_id == msg.guild.id)
-                            .first()
+                        # Get the DB ID for the guild
+                        db_guild_id = await self.bot.helpers.db_get_guild_id(
+                            msg.guild.id
                         )
-                        if not db_guild:
-                            db_guild = await self.bot.helpers.db_add_new_guild(
-                                session, msg.guild.id
-                            )
 
                         new_record = models.Requests(
-                            user=db_user,
-                            server=db_guild,
+                            user_id=db_user_id,
+                            server_id=db_guild_id,
                             message_id=msg.id,
                             text=request_body,
                         )
@@ -18,40 +18,66 @@ class Mute(commands.Cog):
         self.bot = bot
         self.current_mutes = {}
 
-        session = self.bot.helpers.get_db_session()
-        mutes = (
+        # Only mutes expiring within the timer window are loaded, see TimerWindow
+        self.bot.timer_window.register("mutes", self.db_get_mutes, self.arm_mute)
+
+    @staticmethod
+    def db_get_mutes(session, after, until):
+        """Gets the mutes expiring in (after, until], with only the columns their timers need"""
+        return (
             session.query(
                 func.coalesce(models.Mute.updated, models.Mute.created).label(
                     "created"
                 ),
                 models.Mute.id,
-                models.User,
-                models.Server,
+                models.Server.discord_id.label("guild_id"),
+                models.User.discord_id.label("user_id"),
                 models.Mute.expires,
                 models.Mute.old_roles,
             )
             .join(models.Server, models.Server.id == models.Mute.server_id)
             .join(models.User, models.User.id == models.Mute.user_id)
-            .filter(models.Mute.expires > datetime.datetime.now(datetime.timezone.utc))
+            .filter(models.Mute.expires > after)
+            .filter(models.Mute.expires <= until)
             .all()
         )
 
-        for mute in mutes:
-            # Add timer to remove mute
-            timer = Timer.temporary(
-                mute.Server.discord_id,
-                mute.User.discord_id,
-                mute.old_roles,
-                event=self._unmute,
-                expires=mute.expires,
-                created=mute.created,
-            )
-            timer.start(self.bot.loop)
-            if mute.Server.discord_id not in self.current_mutes:
-                self.current_mutes[mute.Server.discord_id] = {}
-            self.current_mutes[mute.Server.discord_id][mute.User.discord_id] = timer
+    @staticmethod
+    def db_get_active_mute(session, guild_id, member_id):
+        """Gets the latest unexpired mute for a member, whether or not it's within the timer window"""
+        return (
+            session.query(models.Mute.id, models.Mute.expires, models.Mute.old_roles)
+            .join(models.Server, models.Server.id == models.Mute.server_id)
+            .join(models.User, models.User.id == models.Mute.user_id)
+            .filter(models.Server.discord_id == guild_id)
+            .filter(models.User.discord_id == member_id)
+            .filter(models.Mute.expires > datetime.datetime.now(datetime.timezone.utc))
+            .order_by(models.Mute.expires.desc())
+            .first()
+        )
+
+    def arm_mute(self, mute):
+        self.start_timer(
+            mute.guild_id, mute.user_id, mute.old_roles, mute.expires, mute.created, mute.id
+        )
 
-        session.close()
+    def start_timer(self, guild_id, member_id, old_roles, expires, created, mute_id):
+        # Add timer to remove mute
+        timer = Timer.temporary(
+            guild_id,
+            member_id,
+            old_roles,
+            event=self._unmute,
+            async_event=self.unmute,
+            expires=expires,
+            created=created,
+            key=("mute", mute_id),
+        )
+        timer.start(self.bot.scheduler)
+        if guild_id not in self.current_mutes:
+            self.current_mutes[guild_id] = {}
+        self.current_mutes[guild_id][member_id] = timer
+        return timer
 
     @commands.command(aliases=["m"])
     @has_guild_permissions(manage_messages=True)
@@ -117,7 +143,6 @@ class Mute(commands.Cog):
         mute_length_human = time.human_timedelta(mute_time)
 
         settings = self.bot.guild_settings.get(ctx.message.guild.id)
-        has_modmail_server = settings.modmail_server_id
         muted_role_id = settings.muted_role
         mod_channel = discord.utils.get(
             ctx.message.guild.text_channels, id=settings.mod_channel
@@ -135,52 +160,21 @@ class Mute(commands.Cog):
                     f"Couldn't delete command message for {ctx.command}: {err}"
                 )
 
-        log_channel = discord.utils.get(
-            ctx.message.guild.text_channels, name="bot-logs"
-        )
-        if not log_channel:
-            # If there is no normal logs channel, try the sweeper (legacy) logs channel
-            log_channel = discord.utils.get(
-                ctx.message.guild.text_channels, name="sweeper-logs"
+        if not self.get_log_channel(ctx.message.guild):
+            return await ctx.send(
+                f"No log channel setup. Please create a channel called #bot-logs"
             )
-            if not log_channel:
-                return await ctx.send(
-                    f"No log channel setup. Please create a channel called #bot-logs"
-                )
 
         muted_role = ctx.message.guild.get_role(muted_role_id)
         if not muted_role:
             return await ctx.send("Mute role is not yet configured. Unable to proceed.")
 
-        footer_text = (
-            self.bot.constants.footer_with_modmail.format(guild=ctx.message.guild)
-            if has_modmail_server
-            else self.bot.constants.footer_no_modmail.format(guild=ctx.message.guild)
-        )
-
         sweeper_emoji = self.bot.get_emoji(
             self.bot.constants.reactions["animated_sweeperbot"]
         )
 
-        session = self.bot.helpers.get_db_session()
         try:
-            old_mute_len = None
-            old_mute_dt = None
             if not isinstance(member, discord.User):
-                if muted_role in member.roles:
-                    if (
-                        ctx.message.guild.id in self.current_mutes
-                        and member.id in self.current_mutes[ctx.message.guild.id]
-                    ):
-                        old_mute_len = self.current_mutes[ctx.message.guild.id][
-                            member.id
-                        ].human_delta
-                        old_mute_dt = self.current_mutes[ctx.message.guild.id][
-                            member.id
-                        ].expires
-                        self.current_mutes[ctx.message.guild.id][member.id].stop()
-                        del self.current_mutes[ctx.message.guild.id][member.id]
-
                 if (
                     member is ctx.message.guild.owner
                     or member.bot
@@ -194,8 +188,84 @@ class Mute(commands.Cog):
                     )
 
             actionMsg = await ctx.send("Initiating action. Please wait.")
+            informed_user, inform_error, old_mute_len = await self.mute_member(
+                ctx.message.guild, member, mute_time, reason, ctx.message.author
+            )
+            if informed_user:
+                if mod_channel and actionMsg.channel.id == mod_channel.id:
+                    await actionMsg.edit(
+                        content=f"Mute successful for {member.mention}. **Time:** *{mute_length_human}*. {sweeper_emoji}"
+                    )
+                    if old_mute_len:
+                        await ctx.send(
+                            f"**Note**: This user was previously muted until {old_mute_len}."
+                        )
+                else:
+                    await actionMsg.edit(
+                        content=f"That action was successful. {sweeper_emoji}"
+                    )
+            elif mod_channel:
+                await mod_channel.send(
+                    f"Mute successful for {member.mention}. **Time:** *{mute_length_human}*. {sweeper_emoji}\n"
+                    f"However, user couldn't be informed: {inform_error}"
+                )
+
+        except Exception as e:
+            set_sentry_scope(ctx)
+            if mod_channel:
+                await mod_channel.send(
+                    f"There was an error while creating mute for {member.mention}\n"
+                    f"**Error**: {e}"
+                )
+            self.bot.log.exception(
+                f"There was an error while creating mute for {member} ({member.id})"
+            )
+
+    @staticmethod
+    def get_log_channel(guild):
+        log_channel = discord.utils.get(guild.text_channels, name="bot-logs")
+        if not log_channel:
+            # If there is no normal logs channel, try the sweeper (legacy) logs channel
+            log_channel = discord.utils.get(guild.text_channels, name="sweeper-logs")
+        return log_channel
+
+    async def mute_member(self, guild, member, mute_time, reason, moderator):
+        """Mutes a member, or a user who isn't in the guild in case they return, until mute_time.
+
+        This is the mute itself without a command context, so it's used by both the mute command and the bot's own
+        actions. Returns (informed_user, inform_error, old_mute_len) where old_mute_len is how long was left on a mute
+        it replaced, if any."""
+        settings = self.bot.guild_settings.get(guild.id)
+        muted_role = guild.get_role(settings.muted_role) if settings else None
+        if not muted_role:
+            raise ValueError(f"Mute role is not yet configured in guild {guild.id}")
+        mute_length_human = time.human_timedelta(mute_time)
+        footer_text = (
+            self.bot.constants.footer_with_modmail.format(guild=guild)
+            if settings.modmail_server_id
+            else self.bot.constants.footer_no_modmail.format(guild=guild)
+        )
+
+        session = self.bot.helpers.get_db_session()
+        try:
+            old_mute_len = None
+            old_mute_dt = None
+            if not isinstance(member, discord.User):
+                if muted_role in member.roles:
+                    timer = self.current_mutes.get(guild.id, {}).pop(member.id, None)
+                    if timer:
+                        old_mute_dt = timer.expires
+                        timer.stop()
+                    else:
+                        # Mutes expiring past the timer window aren't in memory
+                        active_mute = self.db_get_active_mute(session, guild.id, member.id)
+                        if active_mute:
+                            old_mute_dt = active_mute.expires
+                    if old_mute_dt:
+                        old_mute_len = time.human_timedelta(old_mute_dt)
+
             self.bot.log.info(
-                f"Initiating mute for user: {member} ({member.id}) in guild {ctx.message.guild} ({ctx.message.guild.id})"
+                f"Initiating mute for user: {member} ({member.id}) in guild {guild} ({guild.id})"
             )
 
             old_roles = []
@@ -211,13 +281,13 @@ class Mute(commands.Cog):
                 # Remove all non-managed roles
                 await member.remove_roles(
                     *old_roles_snow,
-                    reason=f"Muted by request of {ctx.message.author} ({ctx.message.author.id})",
+                    reason=f"Muted by request of {moderator} ({moderator.id})",
                     atomic=True,
                 )
                 # Assign mute role
                 await member.add_roles(
                     muted_role,
-                    reason=f"Muted by request of {ctx.message.author} ({ctx.message.author.id})",
+                    reason=f"Muted by request of {moderator} ({moderator.id})",
                     atomic=True,
                 )
                 # If in voice, kick
@@ -225,21 +295,22 @@ class Mute(commands.Cog):
                     if member.voice and member.voice.channel:
                         await member.move_to(
                             channel=None,
-                            reason=f"Muted by request of {ctx.message.author.mention}",
+                            reason=f"Muted by request of {moderator.mention}",
                         )
                 except discord.errors.Forbidden:
-                    await ctx.send(
-                        f"Missing permissions to drop user from voice channel."
+                    self.bot.log.warning(
+                        f"Missing permissions to drop {member} ({member.id}) from voice channel in guild {guild} ({guild.id})"
                     )
 
             self.bot.log.info(
-                f"Muted user: {member} ({member.id}) in guild {ctx.message.guild} ({ctx.message.guild.id}) for {mute_length_human}"
+                f"Muted user: {member} ({member.id}) in guild {guild} ({guild.id}) for {mute_length_human}"
             )
             informed_user = False
+            inform_error = None
             try:
                 # Format the message
                 text = self.bot.constants.infraction_header.format(
-                    action_type="mute", guild=ctx.message.guild
+                    action_type="mute", guild=guild
                 )
 
                 # Reduces the text to 1,800 characters to leave enough buffer for header and footer text
@@ -248,27 +319,11 @@ class Mute(commands.Cog):
                 text += footer_text
                 await member.send(text)
                 self.bot.log.info(
-                    f"Informed user of their mute: {member} ({member.id}) in guild {ctx.message.guild}"
+                    f"Informed user of their mute: {member} ({member.id}) in guild {guild}"
                 )
                 informed_user = True
-                if mod_channel and actionMsg.channel.id == mod_channel.id:
-                    await actionMsg.edit(
-                        content=f"Mute successful for {member.mention}. **Time:** *{mute_length_human}*. {sweeper_emoji}"
-                    )
-                    if old_mute_len:
-                        await ctx.send(
-                            f"**Note**: This user was previously muted until {old_mute_len}."
-                        )
-                else:
-                    await actionMsg.edit(
-                        content=f"That action was successful. {sweeper_emoji}"
-                    )
             except Exception as e:
-                if mod_channel:
-                    await mod_channel.send(
-                        f"Mute successful for {member.mention}. **Time:** *{mute_length_human}*. {sweeper_emoji}\n"
-                        f"However, user couldn't be informed: {e}"
-                    )
+                inform_error = e
                 if not (type(e) == discord.errors.Forbidden and e.code == 50007):
                     self.bot.log.exception(
                         f"There was an error while informing {member} ({member.id}) about their mute"
@@ -280,24 +335,24 @@ class Mute(commands.Cog):
                 reason += "| **Msg Delivered: No**"
 
             # Log action
-            await log.user_action(
-                self.bot,
-                log_channel.name,
-                member,
-                "Mute",
-                f"**Length:** {mute_length_human}\n" f"**Reason:** {reason}",
-                ctx.message.author,
-                ctx.message.guild,
-            )
+            log_channel = self.get_log_channel(guild)
+            if log_channel:
+                await log.user_action(
+                    self.bot,
+                    log_channel.name,
+                    member,
+                    "Mute",
+                    f"**Length:** {mute_length_human}\n" f"**Reason:** {reason}",
+                    moderator,
+                    guild,
+                )
 
             # Get the DB profile for the guild
-            db_guild = await self.bot.helpers.db_get_guild(
-                session, ctx.message.guild.id
-            )
+            db_guild = await self.bot.helpers.db_get_guild(session, guild.id)
             # Get the DB profile for the user
             db_user = await self.bot.helpers.db_get_user(session, member.id)
             # Get mod's DB profile
-            db_mod = await self.bot.helpers.db_get_user(session, ctx.message.author.id)
+            db_mod = await self.bot.helpers.db_get_user(session, moderator.id)
             db_action = models.Action(mod=db_mod, server=db_guild)
 
             db_mute = None
@@ -329,30 +384,18 @@ class Mute(commands.Cog):
             session.add(db_mute)
             session.commit()
 
-            # Add timer to remove mute
-            timer = Timer.temporary(
-                ctx.message.guild.id,
-                member.id,
-                old_roles,
-                event=self._unmute,
-                expires=mute_time,
-                created=datetime.datetime.now(datetime.timezone.utc),
-            )
-            timer.start(self.bot.loop)
-            if ctx.message.guild.id not in self.current_mutes:
-                self.current_mutes[ctx.message.guild.id] = {}
-            self.current_mutes[ctx.message.guild.id][member.id] = timer
-
-        except Exception as e:
-            set_sentry_scope(ctx)
-            if mod_channel:
-                await mod_channel.send(
-                    f"There was an error while creating mute for {member.mention}\n"
-                    f"**Error**: {e}"
+            # Mutes expiring later are loaded by the timer window once they're due
+            if self.bot.timer_window.covers("mutes", mute_time):
+                self.start_timer(
+                    guild.id,
+                    member.id,
+                    old_roles,
+                    mute_time,
+                    datetime.datetime.now(datetime.timezone.utc),
+                    db_mute.id,
                 )
-            self.bot.log.exception(
-                f"There was an error while creating mute for {member} ({member.id})"
-            )
+
+            return informed_user, inform_error, old_mute_len
         finally:
             session.close()
 
@@ -410,6 +453,14 @@ class Mute(commands.Cog):
                 and member.id in self.current_mutes[member.guild.id]
             ):
                 old_mute_dt = self.current_mutes[member.guild.id][member.id].expires
+            else:
+                # Mutes expiring past the timer window aren't in memory
+                active_mute = self.db_get_active_mute(
+                    session, member.guild.id, member.id
+                )
+                if active_mute:
+                    old_mute_dt = active_mute.expires
+            if old_mute_dt:
                 query = (
                     session.query(models.Mute.old_roles)
                     .filter(models.Mute.expires == old_mute_dt)
@@ -418,7 +469,9 @@ class Mute(commands.Cog):
                 if query:
                     old_roles = query.old_roles
 
-            if self._unmute(member.guild.id, member.id, old_roles, ctx.message.author):
+            if await self.unmute(
+                member.guild.id, member.id, old_roles, ctx.message.author
+            ):
                 if ctx.message.channel.id == mod_channel.id:
                     await ctx.send(f"Successfully unmuted {member.mention}.")
                 else:
@@ -478,13 +531,8 @@ class Mute(commands.Cog):
         finally:
             session.close()
 
-    def _unmute(
-        self,
-        guild_id: int,
-        member_id: int,
-        old_roles: typing.List[int],
-        author: typing.Optional[discord.Member] = None,
-    ):
+    def _end_mute(self, guild_id: int, member_id: int):
+        """Stops the mute's timer and returns the member, raising ValueError if the bot can't find them anymore"""
         if guild_id in self.current_mutes and member_id in self.current_mutes[guild_id]:
             self.current_mutes[guild_id][member_id].stop()
             del self.current_mutes[guild_id][member_id]
@@ -501,11 +549,43 @@ class Mute(commands.Cog):
         except ValueError:
             self.bot.log.warning(f"Can't execute unmute")
             raise
+        return member
+
+    def _unmute(
+        self,
+        guild_id: int,
+        member_id: int,
+        old_roles: typing.List[int],
+        author: typing.Optional[discord.Member] = None,
+    ):
+        """Timer event for an expiring mute, runs unmute in a task. The member is looked up first so a ValueError
+        still reaches the Scheduler"""
+        self._end_mute(guild_id, member_id)
+        self.bot.loop.create_task(self.unmute(guild_id, member_id, old_roles, author))
+
+    async def unmute(
+        self,
+        guild_id: int,
+        member_id: int,
+        old_roles: typing.List[int],
+        author: typing.Optional[discord.Member] = None,
+    ):
+        """Removes the muted role, gives the member their old roles back and tells them.
+
+        Returns False if the mute was already removed or the member couldn't be told, and raises ValueError if the
+        guild or member is gone. Discord API errors while changing roles are raised too."""
+        member = self._end_mute(guild_id, member_id)
 
         settings = self.bot.guild_settings.get(member.guild.id)
         has_modmail_server = settings.modmail_server_id
         muted_role_id = settings.muted_role
         muted_role = member.guild.get_role(muted_role_id)
+        if muted_role not in member.roles:
+            # e.g. a mute that expired while offline and was removed by hand
+            self.bot.log.info(
+                f"Mute for {member} ({member.id}) in guild {member.guild} was already removed"
+            )
+            return False
 
         footer_text = (
             self.bot.constants.footer_with_modmail.format(guild=member.guild)
@@ -530,34 +610,26 @@ class Mute(commands.Cog):
             current_roles.remove(muted_role)
             for role in current_roles:
                 old_disc_roles.append(role)
-            # now we create the task to set their roles to the old+managed roles thus removing the muted role
-            self.bot.loop.create_task(
-                member.edit(
-                    roles=old_disc_roles,
-                    reason=f"Adding roles back and removing muted role after unmute",
-                )
+            # now we set their roles to the old+managed roles thus removing the muted role
+            await member.edit(
+                roles=old_disc_roles,
+                reason=f"Adding roles back and removing muted role after unmute",
             )
         else:
-            self.bot.loop.create_task(
-                member.remove_roles(
-                    muted_role, reason="Removing muted role after unmute"
-                )
+            await member.remove_roles(
+                muted_role, reason="Removing muted role after unmute"
             )
 
         # Log action
-        self.bot.loop.create_task(
-            log.user_action(self.bot, "bot-logs", member, "Unmute")
-        )
+        await log.user_action(self.bot, "bot-logs", member, "Unmute")
         self.bot.log.info(
             f"Removed mute for {member} ({member.id}) in guild {member.guild}"
         )
 
         try:
-            self.bot.loop.create_task(
-                member.send(
-                    f"You have been unmuted on {member.guild}. You may now send messages."
-                    f"{footer_text}"
-                )
+            await member.send(
+                f"You have been unmuted on {member.guild}. You may now send messages."
+                f"{footer_text}"
             )
             self.bot.log.info(
                 f"Informed user of their unmute: {member} ({member.id}) in guild {member.guild}"
@@ -573,21 +645,28 @@ class Mute(commands.Cog):
 
     @commands.Cog.listener()
     async def on_member_join(self, member):
-        if (
-            member.guild.id not in self.current_mutes
-            or member.id not in self.current_mutes[member.guild.id]
-        ):
-            return
-
-        # Member has a muting timer
-        timer = self.current_mutes[member.guild.id][member.id]
-        if not timer:
+        timer = self.current_mutes.get(member.guild.id, {}).get(member.id)
+        if timer is not None and not timer:
+            # Member's muting timer has expired
             del self.current_mutes[member.guild.id][member.id]
             return
 
-        # Member has an active muting timer
-
         settings = self.bot.guild_settings.get(member.guild.id)
+        if timer:
+            expires = timer.expires
+        else:
+            if not settings or not settings.muted_role:
+                return
+            # Mutes expiring past the timer window aren't in memory
+            active_mute = await self.bot.helpers.run_db(
+                self.db_get_active_mute, member.guild.id, member.id
+            )
+            if not active_mute:
+                return
+            expires = active_mute.expires
+
+        # Member has an active mute
+        mute_length_human = time.human_timedelta(expires)
         has_modmail_server = settings.modmail_server_id
         muted_role_id = settings.muted_role
         muted_role = member.guild.get_role(muted_role_id)
@@ -606,11 +685,11 @@ class Mute(commands.Cog):
         )
 
         self.bot.log.info(
-            f"Remuted rejoined user: {member} ({member.id}) in guild {member.guild} for {timer.human_delta}"
+            f"Remuted rejoined user: {member} ({member.id}) in guild {member.guild} for {mute_length_human}"
         )
         try:
             await member.send(
-                f"You are still muted on **{member.guild}** for **{timer.human_delta}**."
+                f"You are still muted on **{member.guild}** for **{mute_length_human}**."
                 f"{footer_text}"
             )
             self.bot.log.info(
@@ -628,7 +707,7 @@ class Mute(commands.Cog):
             "bot-logs",
             member,
             "Mute",
-            f"**Length:** {timer.human_delta}\n" f"**Reason:** Remuted after rejoin",
+            f"**Length:** {mute_length_human}\n" f"**Reason:** Remuted after rejoin",
         )
 
 
@@ -1,20 +1,31 @@
-import asyncio
 import datetime
-from typing import Callable
+from typing import Awaitable, Callable
 
 from . import time
 
 
 class Timer:
-    __slots__ = ("args", "event", "id", "created_at", "expires", "_timer")
+    __slots__ = (
+        "args",
+        "event",
+        "async_event",
+        "id",
+        "created_at",
+        "expires",
+        "_scheduler",
+    )
 
     def __init__(self, *, record):
-        self.id = id(self)
+        # Timers for a database row are keyed by it, so starting one for the same row again replaces it
+        self.id = record.get("key") or id(self)
 
         self.event = record["event"]
+        # Optional coroutine function doing the same as event, for callers that need to wait for the work to finish
+        self.async_event = record.get("async_event")
         self.created_at = record["created"]
         self.expires = record["expires"]
         self.args = record["args"]
+        self._scheduler = None
 
     @classmethod
     def temporary(
@@ -23,8 +34,17 @@ class Timer:
         expires: datetime.datetime,
         created: datetime.datetime,
         event: Callable[..., None],
+        async_event: Callable[..., Awaitable] = None,
+        key=None,
     ):
-        pseudo = {"created": created, "expires": expires, "event": event, "args": args}
+        pseudo = {
+            "created": created,
+            "expires": expires,
+            "event": event,
+            "async_event": async_event,
+            "args": args,
+            "key": key,
+        }
         return cls(record=pseudo)
 
     def __eq__(self, other):
@@ -48,17 +68,11 @@ class Timer:
     def __repr__(self):
         return f"<Timer {self.id} created={self.created_at} expires={self.expires} event={self.event}>"
 
-    def start(self, loop: asyncio.BaseEventLoop):
-        # we don't call self.event directly, because call_later has a max waiting time of 1 day
-        # (see https://docs.python.org/3/library/asyncio-eventloop.html#asyncio.loop.time)
-        # So we check if the timer needs to be rescheduled.
-        delta = self.expires - datetime.datetime.now(datetime.timezone.utc)
-        if delta.total_seconds() <= 0:
-            self.event(*self.args)
-        else:
-            # loop.call_later((self.expires - datetime.utcnow()).total_seconds(), self.event, *self.args)
-            self._timer = loop.call_later(delta.total_seconds(), self.start, loop)
+    def start(self, scheduler):
+        """Schedules the event to run on the bot's Scheduler when the timer expires"""
+        self._scheduler = scheduler
+        scheduler.schedule(self)
 
     def stop(self):
-        if not self._timer.cancelled():
-            self._timer.cancel()
+        if self._scheduler:
+            self._scheduler.cancel(self)
@@ -609,5 +609,6 @@ class Constants:
 
         # Static Messages
         self.antispam_quickmsg = "Please do not spam our server. This includes sending too many messages too quickly. Please make sure you don't split your thoughts across multiple messages and keep it to one or two messages, and don't copy and paste or send the same message in multiple channels."
+        self.antispam_mass_mentions = "Please do not mass mention members or roles on our server. Only mention the people you are talking to, and use the proper channels to reach the moderators."
         # Production Channels
         self.prod_bot_media_spam = 503_382_909_387_014_154
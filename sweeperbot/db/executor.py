@@ -0,0 +1,94 @@
+"""This module runs blocking database work on a dedicated, bounded thread pool"""
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class DatabaseExecutor:
+    """A ThreadPoolExecutor reserved for database calls.
+
+    At most max_workers calls run at once and at most max_queue more wait for a worker. Callers beyond that wait on
+    the event loop side, so a slow database can't build an unbounded backlog. Queue depth and the time calls spend
+    waiting for a worker are tracked so the pool can be sized against the connection pool."""
+
+    def __init__(self, max_workers=16, max_queue=1000):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="db"
+        )
+        self._slots = None
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.stats = {
+            "calls": 0,
+            "errors": 0,
+            "slot_waits": 0,
+            "max_queue_depth": 0,
+            "wait_ms_total": 0.0,
+            "wait_ms_max": 0.0,
+            "run_ms_total": 0.0,
+            "run_ms_max": 0.0,
+        }
+
+    def _record(self, key, value):
+        self.stats[f"{key}_ms_total"] += value
+        if value > self.stats[f"{key}_ms_max"]:
+            self.stats[f"{key}_ms_max"] = value
+
+    async def run(self, fn, *args, **kwargs):
+        """Runs fn(*args, **kwargs) on the database thread pool and returns its result"""
+        # Created lazily so it binds to the running loop
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers + self.max_queue)
+        if self._slots.locked():
+            self.stats["slot_waits"] += 1
+
+        async with self._slots:
+            submitted = time.perf_counter()
+            with self._lock:
+                self.queued += 1
+                if self.queued > self.stats["max_queue_depth"]:
+                    self.stats["max_queue_depth"] = self.queued
+
+            def call():
+                started = time.perf_counter()
+                with self._lock:
+                    self.queued -= 1
+                    self.active += 1
+                    self._record("wait", (started - submitted) * 1000)
+                try:
+                    return fn(*args, **kwargs)
+                except Exception:
+                    with self._lock:
+                        self.stats["errors"] += 1
+                    raise
+                finally:
+                    with self._lock:
+                        self.active -= 1
+                        self.stats["calls"] += 1
+                        self._record("run", (time.perf_counter() - started) * 1000)
+
+            # Carry the caller's context vars (e.g. the query origin) over to the worker thread
+            context = contextvars.copy_context()
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(self._executor, context.run, call)
+
+    def snapshot(self):
+        """Returns the current gauges and counters, including average wait and run times"""
+        with self._lock:
+            calls = self.stats["calls"]
+            return {
+                "workers": self.max_workers,
+                "queue_depth": self.queued,
+                "active": self.active,
+                **self.stats,
+                "wait_ms_avg": self.stats["wait_ms_total"] / calls if calls else 0.0,
+                "run_ms_avg": self.stats["run_ms_total"] / calls if calls else 0.0,
+            }
+
+    def shutdown(self, wait=False):
+        self._executor.shutdown(wait=wait)
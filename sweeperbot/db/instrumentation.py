@@ -0,0 +1,167 @@
+"""This module records how long queries take, keyed by the command or listener that issued them"""
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+
+# What issued the current query, e.g. "cmd:mute" or "event:on_message". Set by the bot per command / listener.
+query_origin = contextvars.ContextVar("query_origin", default="unknown")
+
+# Upper bounds, in milliseconds, of the latency histogram buckets. The last bucket catches everything above.
+BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Only these statements can be explained without side effects
+EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+# Max number of statements remembered for explain_interval, the least recently explained are forgotten first
+MAX_EXPLAINED = 1000
+
+
+class OriginStats:
+    __slots__ = ("calls", "total_ms", "max_ms", "slow", "buckets", "slowest")
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.slow = 0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.slowest = None
+
+    def percentile(self, pct):
+        """Approximates a percentile from the histogram by returning the upper bound of its bucket"""
+        if not self.calls:
+            return 0.0
+        target = self.calls * pct / 100
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= target:
+                return float(BUCKETS_MS[index]) if index < len(BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+
+class QueryStats:
+    """Hooks into SQLAlchemy engine events to time every statement.
+
+    Latency is recorded in a histogram per origin. Statements slower than slow_query_ms are logged along with their
+    EXPLAIN plan, at most once per explain_interval seconds for the same statement."""
+
+    def __init__(self, slow_query_ms=250, explain=True, explain_interval=300, log=None):
+        self.slow_query_ms = slow_query_ms
+        self.explain = explain
+        self.explain_interval = explain_interval
+        self.log = log or logging.getLogger("root")
+        self._lock = threading.Lock()
+        self._origins = {}
+        self._last_explained = OrderedDict()
+
+    def attach(self, engine):
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _before_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    def _after_cursor_execute(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):
+        elapsed_ms = (time.perf_counter() - conn.info["query_start_time"].pop()) * 1000
+        origin = query_origin.get()
+        is_slow = elapsed_ms >= self.slow_query_ms
+        with self._lock:
+            stats = self._origins.get(origin)
+            if stats is None:
+                stats = self._origins[origin] = OriginStats()
+            stats.calls += 1
+            stats.total_ms += elapsed_ms
+            stats.buckets[bisect.bisect_left(BUCKETS_MS, elapsed_ms)] += 1
+            if elapsed_ms > stats.max_ms:
+                stats.max_ms = elapsed_ms
+                stats.slowest = statement
+            if is_slow:
+                stats.slow += 1
+
+        if is_slow:
+            plan = None
+            if not executemany and self._should_explain(statement):
+                plan = self._explain(cursor, statement, parameters)
+            self.log.warning(
+                f"Slow query ({elapsed_ms:0.1f}ms) from {origin}: {statement[:1000]}"
+                + (f"\nPlan:\n{plan}" if plan else "")
+            )
+
+    def _should_explain(self, statement):
+        if not self.explain or not statement.lstrip().upper().startswith(EXPLAINABLE):
+            return False
+        now = time.monotonic()
+        with self._lock:
+            last = self._last_explained.get(statement)
+            if last is not None and now - last < self.explain_interval:
+                return False
+            self._last_explained[statement] = now
+            self._last_explained.move_to_end(statement)
+            while len(self._last_explained) > MAX_EXPLAINED:
+                self._last_explained.popitem(last=False)
+        return True
+
+    def _explain(self, cursor, statement, parameters):
+        """Runs EXPLAIN (without ANALYZE, so nothing is executed) on the same connection.
+
+        It runs inside a savepoint, as on PostgreSQL a failed statement would otherwise abort the caller's
+        transaction and fail its next statement."""
+        try:
+            explain_cursor = cursor.connection.cursor()
+            try:
+                explain_cursor.execute("SAVEPOINT query_stats_explain")
+                try:
+                    explain_cursor.execute(f"EXPLAIN {statement}", parameters)
+                    plan = "\n".join(str(row[0]) for row in explain_cursor.fetchall())
+                except Exception:
+                    explain_cursor.execute("ROLLBACK TO SAVEPOINT query_stats_explain")
+                    raise
+                explain_cursor.execute("RELEASE SAVEPOINT query_stats_explain")
+                return plan
+            finally:
+                explain_cursor.close()
+        except Exception as err:
+            self.log.debug(f"Unable to EXPLAIN slow query. {err.__class__.__name__}: {err}")
+            return None
+
+    def top(self, count=10, key="total_ms"):
+        """Returns the top origins as (origin, summary dict) sorted by key, highest first"""
+        with self._lock:
+            summaries = [
+                (
+                    origin,
+                    {
+                        "calls": stats.calls,
+                        "total_ms": stats.total_ms,
+                        "avg_ms": stats.total_ms / stats.calls if stats.calls else 0.0,
+                        "p95_ms": stats.percentile(95),
+                        "max_ms": stats.max_ms,
+                        "slow": stats.slow,
+                        "slowest": stats.slowest,
+                    },
+                )
+                for origin, stats in self._origins.items()
+            ]
+        summaries.sort(key=lambda item: item[1][key], reverse=True)
+        return summaries[:count]
+
+    def totals(self, origin):
+        """Returns (calls, total_ms) for one origin"""
+        with self._lock:
+            stats = self._origins.get(origin)
+            return (stats.calls, stats.total_ms) if stats else (0, 0.0)
+
+    def reset(self):
+        with self._lock:
+            self._origins.clear()
+            self._last_explained.clear()
@@ -1,10 +1,70 @@
 """This module handles the management of the database"""
 import configparser
+from contextlib import asynccontextmanager
 
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
 from sweeperbot.db import models
+from sweeperbot.db.executor import DatabaseExecutor
+from sweeperbot.db.instrumentation import QueryStats
+
+try:
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+except ImportError:
+    AsyncSession = None
+    create_async_engine = None
+
+
+class ExecutorSession:
+    """Wraps a synchronous Session so it can be used with the same awaitable API as an AsyncSession.
+
+    Every call that talks to the database runs on the DatabaseExecutor, so code written against this API keeps the
+    event loop free even when the async engine is disabled."""
+
+    def __init__(self, session, executor):
+        self.sync_session = session
+        self.executor = executor
+
+    async def _run(self, fn, *args, **kwargs):
+        return await self.executor.run(fn, *args, **kwargs)
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    async def execute(self, statement, params=None):
+        return await self._run(self.sync_session.execute, statement, params)
+
+    async def scalar(self, statement, params=None):
+        return await self._run(self.sync_session.scalar, statement, params)
+
+    async def get(self, entity, ident):
+        return await self._run(self.sync_session.get, entity, ident)
+
+    async def delete(self, instance):
+        return await self._run(self.sync_session.delete, instance)
+
+    async def flush(self):
+        return await self._run(self.sync_session.flush)
+
+    async def refresh(self, instance):
+        return await self._run(self.sync_session.refresh, instance)
+
+    async def commit(self):
+        return await self._run(self.sync_session.commit)
+
+    async def rollback(self):
+        return await self._run(self.sync_session.rollback)
+
+    async def close(self):
+        return await self._run(self.sync_session.close)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        """Runs fn(session, *args, **kwargs) with the underlying synchronous session"""
+        return await self._run(fn, self.sync_session, *args, **kwargs)
 
 
 class DatabaseManager:
@@ -12,21 +72,41 @@ class DatabaseManager:
         self.botconfig = botconfig
         self.ENGINE = {}
         self.sessionmaker_dict = {}
+        self.ASYNC_ENGINE = {}
+        self.async_sessionmaker_dict = {}
 
-    def make_sessionmaker(self, db_config="Database"):
+        # Set the number of threads dedicated to blocking database work
+        try:
+            executor_workers = int(self.botconfig.get("Database", "EXECUTOR_WORKERS"))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            executor_workers = 16
+        # Set how many calls may wait for a free thread before callers are held back
+        try:
+            executor_queue = int(self.botconfig.get("Database", "EXECUTOR_QUEUE"))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            executor_queue = 1000
+        self.executor = DatabaseExecutor(executor_workers, executor_queue)
+
+        # Set how slow, in milliseconds, a query has to be before it's logged
+        try:
+            slow_query_ms = float(self.botconfig.get("Database", "SLOW_QUERY_MS"))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            slow_query_ms = 250
+        # Set whether slow queries are logged along with their EXPLAIN plan
+        try:
+            explain_slow_queries = self.botconfig.getboolean(
+                "Database", "EXPLAIN_SLOW_QUERIES"
+            )
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            explain_slow_queries = True
+        self.query_stats = QueryStats(slow_query_ms, explain_slow_queries)
+
+    def get_connection_settings(self, db_config="Database"):
         uname = self.botconfig.get(db_config, "USERNAME")
         pword = self.botconfig.get(db_config, "PASSWORD")
         host = self.botconfig.get(db_config, "HOST")
         port = self.botconfig.get(db_config, "PORT")
         database = self.botconfig.get(db_config, "DATABASE")
-        create_metadata_tables = False
-        # Set whether to create missing database tables
-        try:
-            create_metadata_tables = self.botconfig.getboolean(
-                db_config, "CREATE_TABLES"
-            )
-        except configparser.NoOptionError:
-            create_metadata_tables = False
 
         # Set max pool size
         try:
@@ -39,19 +119,37 @@ class DatabaseManager:
         except configparser.NoOptionError:
             max_overflow = 150
 
+        return {
+            "address": f"{uname}:{pword}@{host}:{port}/{database}",
+            "pool_size": pool_size,
+            "max_overflow": max_overflow,
+        }
+
+    def make_sessionmaker(self, db_config="Database"):
+        settings = self.get_connection_settings(db_config)
+        create_metadata_tables = False
+        # Set whether to create missing database tables
+        try:
+            create_metadata_tables = self.botconfig.getboolean(
+                db_config, "CREATE_TABLES"
+            )
+        except configparser.NoOptionError:
+            create_metadata_tables = False
+
         # If the Database isn't in the Engine, create it
         if db_config not in self.ENGINE:
             # Create the Engine
             self.ENGINE[db_config] = create_engine(
-                f"postgresql://{uname}:{pword}@{host}:{port}/{database}",
-                pool_size=pool_size,
-                max_overflow=max_overflow,
+                f"postgresql://{settings['address']}",
+                pool_size=settings["pool_size"],
+                max_overflow=settings["max_overflow"],
                 pool_timeout=60,
                 echo_pool=True,
                 pool_pre_ping=True,
                 # echo=True,
                 # isolation_level="AUTOCOMMIT",
             )
+            self.query_stats.attach(self.ENGINE[db_config])
 
         # If the database session isn't in the sessionmaker dict, create one
         if db_config not in self.sessionmaker_dict:
@@ -75,9 +173,78 @@ class DatabaseManager:
 
         return session
 
+    def async_enabled(self, db_config="Database"):
+        """Whether the asyncio engine (asyncpg) is configured and available for the database"""
+        if create_async_engine is None:
+            return False
+        try:
+            return self.botconfig.getboolean(db_config, "ASYNC")
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            return False
+
+    def make_async_sessionmaker(self, db_config="Database"):
+        settings = self.get_connection_settings(db_config)
+
+        # If the Database isn't in the Async Engine, create it
+        if db_config not in self.ASYNC_ENGINE:
+            self.ASYNC_ENGINE[db_config] = create_async_engine(
+                f"postgresql+asyncpg://{settings['address']}",
+                pool_size=settings["pool_size"],
+                max_overflow=settings["max_overflow"],
+                pool_timeout=60,
+                pool_pre_ping=True,
+            )
+            # Engine events are only emitted by the sync engine the async one wraps
+            self.query_stats.attach(self.ASYNC_ENGINE[db_config].sync_engine)
+
+        if db_config not in self.async_sessionmaker_dict:
+            self.async_sessionmaker_dict[db_config] = sessionmaker(
+                bind=self.ASYNC_ENGINE[db_config],
+                class_=AsyncSession,
+                expire_on_commit=False,
+            )
+
+    def get_async_session(self, db_config="Database"):
+        """Get an AsyncSession, creating the async engine if needed"""
+        if db_config not in self.async_sessionmaker_dict:
+            self.make_async_sessionmaker(db_config)
+
+        return self.async_sessionmaker_dict[db_config]()
+
+    @asynccontextmanager
+    async def session(self, db_config="Database"):
+        """Async context manager providing a session that is committed on success, rolled back on error, and closed.
+
+        Uses an AsyncSession when ASYNC is enabled for the database, otherwise the synchronous session wrapped in an
+        ExecutorSession so callers can use the same awaitable API either way:
+
+            async with bot.database.session() as session:
+                result = await session.execute(select(models.User.id))
+        """
+        if self.async_enabled(db_config):
+            session = self.get_async_session(db_config)
+        else:
+            session = ExecutorSession(self.get_session(db_config), self.executor)
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
+
     def close_engine(self, db_config="Database"):
         try:
-            for db_engine in self.ENGINE:
+            self.executor.shutdown()
+            for db_engine in self.ENGINE.values():
                 db_engine.dispose()
         except Exception as err:
             print(f"Error disposing of Engine for DB: {db_config}. Error: {err}")
+
+    async def close_async_engine(self, db_config="Database"):
+        try:
+            for db_engine in self.ASYNC_ENGINE.values():
+                await db_engine.dispose()
+        except Exception as err:
+            print(f"Error disposing of Async Engine for DB: {db_config}. Error: {err}")
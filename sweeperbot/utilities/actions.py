@@ -0,0 +1,101 @@
+import asyncio
+
+from sweeperbot.cogs.utils import log
+
+# A pending action absorbs any new trigger for the same user that is no more severe than it
+SEVERITY = {"mute": 1, "kick": 2, "ban": 3}
+
+
+class ActionDispatcher:
+    """Runs the punitive actions the bot takes on its own: mutes, kicks and bans.
+
+    Each (guild, user) has at most one action in flight. A trigger for a user who already has an action in flight
+    gets that action's future instead of starting another one, so a burst of spam from one user results in a single
+    mute. A more severe action, e.g. a ban during a mute, waits for the pending one and then replaces it."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        # (guild_id, user_id): (action, future)
+        self.in_flight = {}
+        self.stats = {"dispatched": 0, "coalesced": 0, "escalated": 0, "failed": 0}
+
+    def pending(self, guild_id, user_id):
+        """Returns the name of the action in flight for the user, or None"""
+        in_flight = self.in_flight.get((guild_id, user_id))
+        return in_flight[0] if in_flight else None
+
+    def mute(self, guild, member, expires, reason, moderator=None):
+        """Mutes the member until expires. Returns a future of the Mute cog's mute_member result"""
+
+        async def action():
+            mute_cog = self.bot.get_cog("Mute")
+            if not mute_cog:
+                raise RuntimeError("The Mute cog isn't loaded")
+            return await mute_cog.mute_member(
+                guild, member, expires, reason, moderator or guild.me
+            )
+
+        return self._dispatch("mute", guild.id, member.id, action)
+
+    def kick(self, guild, member, reason, moderator=None):
+        """Kicks the member. Returns a future that's done once they're kicked and it's logged"""
+
+        async def action():
+            await guild.kick(member, reason=reason)
+            await log.user_action(
+                self.bot,
+                "bot-logs",
+                member,
+                "Kick",
+                f"**Reason:** {reason}",
+                moderator or guild.me,
+                guild,
+            )
+
+        return self._dispatch("kick", guild.id, member.id, action)
+
+    def ban(self, guild, user, reason, moderator=None, delete_message_days=1):
+        """Bans the user. Returns a future that's done once they're banned and it's logged"""
+
+        async def action():
+            await guild.ban(user, reason=reason, delete_message_days=delete_message_days)
+            await log.user_action(
+                self.bot,
+                "bot-logs",
+                user,
+                "Ban",
+                f"**Reason:** {reason}",
+                moderator or guild.me,
+                guild,
+            )
+
+        return self._dispatch("ban", guild.id, user.id, action)
+
+    def _dispatch(self, name, guild_id, user_id, action):
+        key = (guild_id, user_id)
+        in_flight = self.in_flight.get(key)
+        if in_flight and SEVERITY[in_flight[0]] >= SEVERITY[name]:
+            self.stats["coalesced"] += 1
+            return in_flight[1]
+        if in_flight:
+            self.stats["escalated"] += 1
+        self.stats["dispatched"] += 1
+        future = asyncio.ensure_future(
+            self._run(key, action, in_flight[1] if in_flight else None)
+        )
+        self.in_flight[key] = (name, future)
+        return future
+
+    async def _run(self, key, action, previous):
+        try:
+            if previous:
+                # Let the less severe action finish first, whether it works or not
+                await asyncio.wait([previous])
+            return await action()
+        except Exception:
+            self.stats["failed"] += 1
+            raise
+        finally:
+            in_flight = self.in_flight.get(key)
+            if in_flight and in_flight[1] is asyncio.current_task():
+                del self.in_flight[key]
@@ -1,100 +1,148 @@
+import configparser
 import datetime
+import json
 import re
 import sys
 
 import discord
 import parsedatetime as pdt
 import pytz
-import requests
 from discord.ext import commands
 from sentry_sdk import configure_scope
-from sqlalchemy import asc
-from sqlalchemy.exc import DBAPIError
 from urlextract import URLExtract
+from urlextract.cachefile import CacheFileError
 
-from sweeperbot.db import models
+from sweeperbot.utilities.antispam_queue import AntiSpamQueue
+from sweeperbot.utilities.antispam_rules import load_guild_rules
+from sweeperbot.utilities.mention_budget import MentionBudget, count_mentions
+from sweeperbot.utilities.raid_detector import RaidDetector
+from sweeperbot.utilities.rate_limiter import SlidingWindowLimiter
+from sweeperbot.utilities.service_matcher import ServiceMatcher
+from sweeperbot.utilities.tiered_cache import TieredCache
+from sweeperbot.utilities.url_resolver import URLResolver
+from sweeperbot.utilities.word_filter import WordFilters
 
 utc = pytz.UTC
 
+# A message can only contain a URL that URLExtract would find if it has a scheme, a dot followed by a letter (the
+# start of a TLD), or an IPv4 address. Most messages have none of them, so they skip the costly URLExtract scan.
+URL_HINT = re.compile(r"://|\.[^\W\d_]|\d\.\d+\.\d+\.\d")
+
+
+class InviteGuild:
+    """The parts of an invite's guild AntiSpam needs, when the invite was looked up from the cache"""
+
+    __slots__ = ("id", "name")
+
+    def __init__(self, id, name):
+        self.id = id
+        self.name = name
+
+    def __str__(self):
+        return str(self.name)
+
 
 class AntiSpam(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
-        # Set the cooldown for on_message - too many too quickly and they get muted
-        # 1. Initialize the global cooldown settings
+        # Set the rate limit for on_message - too many too quickly and they get muted
+        # 1. Initialize the global rate limit settings, used when a guild doesn't have its own
         global_cd_settings = self.bot.cooldown_settings.get("antispam_on_message")
-        message_rate = global_cd_settings.message_rate
-        cooldown_time = global_cd_settings.cooldown_time
-        self.global_cd_on_message = commands.CooldownMapping.from_cooldown(
-            message_rate, cooldown_time, commands.BucketType.user
-        )
+        self.global_message_rate = float(global_cd_settings.message_rate)
+        self.global_message_time = float(global_cd_settings.cooldown_time)
         self.bot.log.debug(
-            f"AntiSpam:on_message Global Cooldown set to {self.global_cd_on_message._cooldown.rate} msgs per {self.global_cd_on_message._cooldown.per} sec"
+            f"AntiSpam:on_message Global Rate Limit set to {self.global_message_rate} msgs per {self.global_message_time} sec"
         )
+        # 2. The sliding window rate limiter, shared with every other shard/process through Redis
+        self.rate_limiter = SlidingWindowLimiter(self.bot)
+        # Detects the same message being sent by many different users, e.g. a raid
+        self.raid_detector = RaidDetector(self.bot)
+        # Tracks how many users and roles each user has mentioned recently
+        self.mention_budget = MentionBudget(self.bot)
+        # Each guild's word filter, compiled from its wordfilter_data
+        self.word_filters = WordFilters(self.bot)
 
-        # Initializes the URL Extractor then updates the list of TLDs
-        self.url_extractor = URLExtract()
-        self.url_extractor.update()
+        # Initializes the URL Extractor from the TLD list cached on disk, or the list bundled with urlextract if there
+        # is no cache yet. The list is refreshed in the background once the bot is ready, see Tasks.refresh_tld_list
+        try:
+            self.tld_cache_dir = self.bot.botconfig.get("TLDCache", "CACHE_DIR") or None
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.tld_cache_dir = None
+        try:
+            self.tld_max_age = int(self.bot.botconfig.get("TLDCache", "MAX_AGE_DAYS"))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.tld_max_age = 7
+        try:
+            self.url_extractor = URLExtract(cache_dir=self.tld_cache_dir)
+        except CacheFileError as err:
+            self.bot.log.warning(
+                f"AntiSpam: Unable to use TLD cache dir '{self.tld_cache_dir}', using the default. {err}"
+            )
+            self.url_extractor = URLExtract()
+        # Set up the caches of where URLs redirect to and which guild invite codes belong to
+        try:
+            cache_size = int(self.bot.botconfig.get("AntiSpamCache", "MAX_SIZE"))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            cache_size = 50000
+        try:
+            url_ttl = int(self.bot.botconfig.get("AntiSpamCache", "URL_TTL"))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            url_ttl = 86400
+        try:
+            invite_ttl = int(self.bot.botconfig.get("AntiSpamCache", "INVITE_TTL"))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            invite_ttl = 3600
+        try:
+            negative_ttl = int(self.bot.botconfig.get("AntiSpamCache", "NEGATIVE_TTL"))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            negative_ttl = 300
+        self.url_cache = TieredCache(
+            self.bot, "antispam:url", cache_size, url_ttl, negative_ttl
+        )
+        self.invite_cache = TieredCache(
+            self.bot, "antispam:invite", cache_size, invite_ttl, negative_ttl
+        )
+        # Follows redirects of the URLs found in messages
+        self.url_resolver = URLResolver(self.bot, self.url_cache)
         # Load the Anti Spam Services and their Regex's
         self.antispam_services = []
-        self.antispam_pending_mutes = {}
+        self.service_matcher = ServiceMatcher(log=self.bot.log)
+        # The AntiSpam rules of each guild, compiled per service: {guild_id: {service_id: ServiceRules}}
+        self.guild_rules = {}
+        # Parses the guilds' antispam_mute_time settings
+        self.calendar = pdt.Calendar(version=pdt.VERSION_CONTEXT_STYLE)
+        # Messages wait here to be processed by the AntiSpam workers
+        self.queue = AntiSpamQueue(self.bot, self.antispam_process_message)
         self.bot.log.info(f"Loaded AntiSpam")
 
-    def get_all_urls_from_string(self, input_string):
-        return self.url_extractor.find_urls(input_string)
+    def set_antispam_services(self, services):
+        """Sets the enabled services and recompiles their regexes into the service matcher"""
+        self.antispam_services = services
+        self.service_matcher.build(services)
 
-    async def set_cooldown_buckets(self):
-        # Initialize the cooldown dict holding all cooldowns
-        self.cooldowns = {}
-        session = self.bot.helpers.get_db_session()
-        try:
-            for guild in self.bot.guilds:
-                # Get guild settings
-                settings = await self.bot.helpers.get_one_guild_settings(
-                    session, guild.id
-                )
+    async def load_rules(self):
+        """Loads and compiles the AntiSpam rules of every guild"""
+        self.guild_rules = await self.bot.helpers.run_db(load_guild_rules)
 
-                cd_on_message_rate = settings.cd_on_message_rate
-                cd_on_message_time = settings.cd_on_message_time
+    async def refresh_rules(self, guild_id):
+        """Reloads the AntiSpam rules of one guild, e.g. after they've been changed"""
+        guild_rules = await self.bot.helpers.run_db(load_guild_rules, [guild_id])
+        self.guild_rules[guild_id] = guild_rules[guild_id]
 
-                # Initialize the dict for the guild
-                self.cooldowns[guild.id] = {}
+    def get_all_urls_from_string(self, input_string):
+        if not URL_HINT.search(input_string):
+            return []
+        return self.url_extractor.find_urls(input_string)
 
-                # If the guild has custom cooldown setting:
-                if cd_on_message_rate and cd_on_message_time:
-                    # Create the cooldown mapping
-                    cd_on_message = commands.CooldownMapping.from_cooldown(
-                        cd_on_message_rate, cd_on_message_time, commands.BucketType.user
-                    )
-                    # Set the cooldowns
-                    self.cooldowns[guild.id].update({"cd_on_message": cd_on_message})
-                    self.bot.log.debug(
-                        f"AntiSpam:on_message Using Custom Cooldown, set to {cd_on_message._cooldown.rate} msgs per {cd_on_message._cooldown.per} sec for {guild} ({guild.id})"
-                    )
-                # If no custom setting, use global
-                else:
-                    # Set the cooldowns
-                    self.cooldowns[guild.id].update(
-                        {"cd_on_message": self.global_cd_on_message}
-                    )
-                    self.bot.log.debug(
-                        f"AntiSpam:on_message Using Global Cooldown, set to {self.global_cd_on_message._cooldown.rate} msgs per {self.global_cd_on_message._cooldown.per} sec for {guild} ({guild.id})"
-                    )
-        except DBAPIError as err:
-            self.bot.log.exception(
-                f"Database Error in AntiSpam Module setting all cooldowns. {sys.exc_info()[0].__name__}: {err}"
-            )
-            session.rollback()
-        except Exception as err:
-            self.bot.log.exception(
-                f"Generic Error in AntiSpam Module setting all cooldowns. {sys.exc_info()[0].__name__}: {err}"
-            )
-        finally:
-            # Close this database session
-            session.close()
+    def get_message_limit(self, settings):
+        """Returns the (messages, seconds) on_message rate limit of a guild, or the global one if it has none"""
+        if settings and settings.cd_on_message_rate and settings.cd_on_message_time:
+            return float(settings.cd_on_message_rate), float(settings.cd_on_message_time)
+        return self.global_message_rate, self.global_message_time
 
-    async def antispam_process_message(self, message):
+    async def antispam_process_message(self, message, cheap_only=False):
+        """Runs the AntiSpam checks on a message. With cheap_only, the URL checks that need HTTP lookups are skipped"""
         try:
             # Check if server has a bypass role
             bypass_role = None
@@ -111,91 +159,63 @@ class AntiSpam(commands.Cog):
                     f"AntiSpam: The user {message.author} ({message.author.id}) is exempt from AntiSpam processing"
                 )
 
+            # Check if the message is part of a raid, the same text sent by many different users
+            if self.raid_detector.enabled and message.content:
+                raid = self.raid_detector.record(
+                    message.guild.id, message.author.id, message.content
+                )
+                if raid:
+                    await self.antispam_raid_message(message, settings, raid)
+                    if self.raid_detector.delete:
+                        return
+
             # Check if user is on cooldown/rate limited, issue temp mute
             if settings and settings.antispam_quickmsg:
-                # 1. First we need to check if there is the guild specific cooldown mapping
-                try:
-                    cd_on_message = self.cooldowns.get(message.guild.id)[
-                        "cd_on_message"
-                    ]
-                # If no cooldown mapping, use the global one
-                # this will cover cases where quickmsg setting is enabled but no custom setting
-                except Exception as err:
-                    cd_on_message = self.global_cd_on_message
-                # 2. Get the bucket
-                bucket = cd_on_message.get_bucket(message)
-                retry_after = bucket.update_rate_limit()
+                rate, per = self.get_message_limit(settings)
+                retry_after = await self.rate_limiter.hit(
+                    message.guild.id, message.author.id, message.id, rate, per
+                )
                 if retry_after:
-                    # Add the user to the Pending Mute dict so we don't try and execute multiple times
-                    # Check if the guild key exists, if not, create it
-                    if message.guild.id not in self.antispam_pending_mutes:
-                        self.antispam_pending_mutes[message.guild.id] = []
-                    # Check if user is in pending mutes for the guild
-                    if (
-                        message.author.id
-                        not in self.antispam_pending_mutes[message.guild.id]
-                    ):
-                        self.antispam_pending_mutes[message.guild.id].append(
-                            message.author.id
-                        )
-                        # Delete the message, help the mods clean up
-                        await message.delete()
-                    else:
-                        self.bot.log.debug(
-                            f"AntiSpam: User {message.author} ({message.author.id}) already pending a mute. Ignoring"
-                        )
-                        # Delete the message, help the mods clean up
-                        await message.delete()
-                        return
-                    # Since there is not a pending mute, continue
-                    # Log on cooldown
                     self.bot.log.debug(
                         f"AntiSpam: User {message.author} ({message.author.id}) is on cooldown/rate limited, and unable to send messages. They will be muted. Expires: {retry_after:0.2f} seconds"
                     )
-                    # Mute user for spam
-                    # Get mute command
-                    mute_cmd = self.bot.get_command("mute")
-                    # Create a bot message so that it logs under the bot and creates proper context
-                    bot_msg = await message.channel.send(
-                        f"Please do not spam or send too many messages too quickly."
-                    )
-                    ctx = await self.bot.get_context(bot_msg)
-                    # Create the datetime object
-                    calendar = pdt.Calendar(version=pdt.VERSION_CONTEXT_STYLE)
-                    now = datetime.datetime.now(datetime.timezone.utc)
-                    # Choose the mute length. If custom setting, use that, otherwise default
-                    if settings and settings.antispam_mute_time:
-                        mute_length = settings.antispam_mute_time
-                    else:
-                        mute_length = "1h"
-                    mute_time_dt, status = calendar.parseDT(mute_length, sourceTime=now)
-                    # Run the mute command
-                    await mute_cmd(
-                        ctx,
-                        user_id=message.author.id,
-                        mute_time=mute_time_dt.replace(tzinfo=utc),
+                    return await self.antispam_mute(
+                        message,
+                        settings,
                         reason=self.bot.constants.antispam_quickmsg,
+                        warning="Please do not spam or send too many messages too quickly.",
+                        alert="The following user was automatically muted for spam",
                     )
-                    # Removes the pending mute
-                    self.antispam_pending_mutes[message.guild.id].remove(
-                        message.author.id
-                    )
-                    # Check if a mod channel is set and alert there.
-                    if settings and settings.mod_channel:
-                        mod_channel = discord.utils.get(
-                            message.guild.text_channels, id=settings.mod_channel,
-                        )
-                        if mod_channel:
-                            try:
-                                await mod_channel.send(
-                                    f"""The following user was automatically muted for spam:\n\n**Msg Author:** {message.author.mention} ({message.author.id})\n**Last Message ({message.id}):** {message.jump_url}\n**Content:**\n> {message.content[:1700]}"""
-                                )
-                            # If there is an error, just ignore, nothing we can do
-                            except Exception as err:
-                                pass
-                    return
                 # User not rate limited, continue
 
+            # Check if the user is mentioning too many users or roles, issue temp mute
+            if settings and settings.antispam_mass_mentions:
+                mentions = count_mentions(message)
+                if self.mention_budget.spend(
+                    message.guild.id, message.author.id, mentions
+                ):
+                    self.bot.log.debug(
+                        f"AntiSpam: User {message.author} ({message.author.id}) went over the mention limit with {mentions} mentions in Msg ID: {message.id}. They will be muted."
+                    )
+                    return await self.antispam_mute(
+                        message,
+                        settings,
+                        reason=self.bot.constants.antispam_mass_mentions,
+                        warning="Please do not mass mention users or roles.",
+                        alert="The following user was automatically muted for mass mentions",
+                    )
+
+            # Check the message against the guild's word filter
+            if settings and settings.antispam_wordfilter and message.content:
+                term = self.word_filters.find(settings, message.content)
+                if term:
+                    return await self.antispam_flag_message(
+                        message, settings, "Word Filter", term
+                    )
+
+            if cheap_only:
+                return
+
             # Get the URLs in the message so we can process each one
             urls = self.get_all_urls_from_string(message.content)
             if not urls:
@@ -203,86 +223,42 @@ class AntiSpam(commands.Cog):
                     f"AntiSpam: Skipping - No URL's found in Msg ID: {message.id}"
                 )
                 return
+            orig_urls = []
             for orig_url in urls:
                 # Fix if the start of the URL isn't exactly 'http' but like 'b1http'
                 orig_url = re.sub(r"^.*?http", "http", orig_url)
-                # If the orig_url doesn't start with 'http://' then add it, otherwise we get MissingSchema error
-                orig_url_clean = (
+                # If the orig_url doesn't start with 'http://' then add it so it can be requested
+                orig_urls.append(
                     "http://" + orig_url
                     if not orig_url.startswith("http")
                     else orig_url
                 )
-                url = None
+            # Check for Redirection. Want to only process the last URL in case someone hides behind redirection.
+            # All the URLs are resolved concurrently, and give up after a deadline to prevent long url hang
+            resolved_urls = await self.url_resolver.resolve_all(orig_urls)
+            for orig_url, url in zip(orig_urls, resolved_urls):
                 try:
-                    # Check for Redirection. Want to only process the last URL in case someone hides behind redirection.
-                    # Allow redirects obv, and set a timeout to prevent long url hang
-                    try:
-                        res = requests.head(
-                            orig_url_clean, allow_redirects=True, timeout=10.000
-                        )
-                        url = res.url
-                    except requests.exceptions.ReadTimeout:
-                        # If there is a ReadTimeout error trying to load the URL, just use it as-is
-                        self.bot.log.debug(
-                            f"AntiSpam: ReadTimeout error processing redirects for url '{orig_url_clean}' - using original"
-                        )
-                        url = orig_url_clean
-                    except requests.exceptions.TooManyRedirects:
-                        # If there is a TooManyRedirects error trying to load the URL, just use it as-is
-                        self.bot.log.debug(
-                            f"AntiSpam: TooManyRedirects error processing redirects for url '{orig_url_clean}' - using original"
-                        )
-                        url = orig_url_clean
-                    # Now we need to run the URL through each service regex to see what matches
-                    service_id = None
-                    service_name = None
-                    service_regex = None
-                    regex_result = None
-                    for service in self.antispam_services:
-                        service_id = service.id
-                        service_name = service.service
-                        service_regex = service.regex
-                        self.bot.log.debug(
-                            f"AntiSpam | service_name: {service_name} | service_regex: {service_regex} | url: {url}"
-                        )
-                        regex_result = re.search(service_regex, url)
-                        self.bot.log.debug(
-                            f"AntiSpam | service_name: {service_name} | regex_result: {regex_result}"
-                        )
-                        if regex_result:
-                            # If we get a match for the URL to the service, we need to break out and process the service
-                            break
+                    # Now we need to run the URL through the service regexes to see what matches, in one pass
+                    service, regex_result = self.service_matcher.match(url)
+                    self.bot.log.debug(
+                        f"AntiSpam | service_name: {service.service if service else None} | regex_result: {regex_result} | url: {url}"
+                    )
 
                     # If there is a match, now we need to process it to see if it should be allowed or not
-                    if regex_result:
+                    if service:
+                        service_name = service.service
                         result_allowed, spam_guild = await self.antispam_process_rules(
-                            service_id, service_name, message, regex_result.group(0)
+                            service.id, service_name, message, regex_result
                         )
                         # If the result/message/service is allowed for this url, then continue looping through in case
                         # there is something else not allowed
                         if result_allowed:
                             continue
                         elif result_allowed is False:
-                            # 1. Log it
-                            debug_mode = await self.log_antispam(
-                                message, service_name, regex_result.group(0), spam_guild
+                            # 1. Log it, and delete it unless in debug mode
+                            await self.antispam_flag_message(
+                                message, settings, service_name, regex_result, spam_guild
                             )
-                            # If debug mode is false aka disabled then we delete the message.
-                            if debug_mode is False:
-                                try:
-                                    await message.delete()
-                                except discord.errors.NotFound:
-                                    # Message is not found, likely already deleted, nothing we need to worry about
-                                    pass
-                                except discord.Forbidden:
-                                    mod_channel = discord.utils.get(
-                                        message.guild.text_channels,
-                                        id=settings.mod_channel,
-                                    )
-                                    if mod_channel:
-                                        await mod_channel.send(
-                                            f"""The following message is flagged by the AntiSpam rules, however I was unable to automatically remove it.\n\n**Msg Author:** {message.author.mention} ({message.author.id})\n**Flag Reason:** {service_name}\n**Link:** {message.jump_url}"""
-                                        )
                             # 2. Return so we don't double dip
                             return
                     else:
@@ -292,10 +268,6 @@ class AntiSpam(commands.Cog):
                             f"AntiSpam | No Regex match found for: {url if url else orig_url}"
                         )
 
-                except requests.exceptions.ConnectTimeout as err:
-                    self.bot.log.warning(
-                        f"URL Timeout for {orig_url} | {sys.exc_info()[0].__name__}: {err}"
-                    )
                 except Exception as err:
                     with configure_scope() as scope:
                         scope.set_extra(
@@ -320,6 +292,106 @@ class AntiSpam(commands.Cog):
                 f"Error processing AntiSpam Message. {sys.exc_info()[0].__name__}: {err}"
             )
 
+    async def antispam_mute(self, message, settings, reason, warning, alert):
+        """Deletes the message and temp mutes its author, unless they're already pending a mute"""
+        # Delete the message, help the mods clean up. A mod may have beaten us to it, which shouldn't stop the mute
+        try:
+            await message.delete()
+        except discord.HTTPException as err:
+            self.bot.log.debug(
+                f"AntiSpam: Unable to delete Msg ID {message.id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+        # Check if the user already has a mute in flight, the dispatcher would coalesce it anyway but this way the
+        # warning and alert are only sent once
+        if self.bot.actions.pending(message.guild.id, message.author.id):
+            return self.bot.log.debug(
+                f"AntiSpam: User {message.author} ({message.author.id}) already pending a mute. Ignoring"
+            )
+        # Choose the mute length. If custom setting, use that, otherwise default
+        if settings and settings.antispam_mute_time:
+            mute_length = settings.antispam_mute_time
+        else:
+            mute_length = "1h"
+        now = datetime.datetime.now(datetime.timezone.utc)
+        mute_time_dt, status = self.calendar.parseDT(mute_length, sourceTime=now)
+        # Mute user for spam
+        mute = self.bot.actions.mute(
+            message.guild,
+            message.author,
+            mute_time_dt.replace(tzinfo=utc),
+            reason,
+            message.guild.me,
+        )
+        # Let the user know why while the mute runs. The mute is awaited even if that fails, e.g. in a locked channel
+        try:
+            await message.channel.send(warning)
+        except discord.HTTPException as err:
+            self.bot.log.debug(
+                f"AntiSpam: Unable to send mute warning in {message.channel} ({message.channel.id}). {sys.exc_info()[0].__name__}: {err}"
+            )
+        await mute
+        # Check if a mod channel is set and alert there.
+        if settings and settings.mod_channel:
+            mod_channel = discord.utils.get(
+                message.guild.text_channels, id=settings.mod_channel,
+            )
+            if mod_channel:
+                try:
+                    await mod_channel.send(
+                        f"""{alert}:\n\n**Msg Author:** {message.author.mention} ({message.author.id})\n**Last Message ({message.id}):** {message.jump_url}\n**Content:**\n> {message.content[:1700]}"""
+                    )
+                # If there is an error, just ignore, nothing we can do
+                except Exception as err:
+                    pass
+
+    async def antispam_flag_message(
+        self, message, settings, service_name, match, spam_guild=None
+    ):
+        """Logs a message that broke the AntiSpam rules and deletes it, unless the guild has AntiSpam in debug mode"""
+        debug_mode = await self.log_antispam(message, service_name, match, spam_guild)
+        # If debug mode is false aka disabled then we delete the message.
+        if debug_mode is False:
+            try:
+                await message.delete()
+            except discord.errors.NotFound:
+                # Message is not found, likely already deleted, nothing we need to worry about
+                pass
+            except discord.Forbidden:
+                mod_channel = discord.utils.get(
+                    message.guild.text_channels, id=settings.mod_channel,
+                )
+                if mod_channel:
+                    await mod_channel.send(
+                        f"""The following message is flagged by the AntiSpam rules, however I was unable to automatically remove it.\n\n**Msg Author:** {message.author.mention} ({message.author.id})\n**Flag Reason:** {service_name}\n**Link:** {message.jump_url}"""
+                    )
+
+    async def antispam_raid_message(self, message, settings, raid):
+        """Handles a message that's part of a raid, alerting the mods once per raid"""
+        self.bot.log.debug(
+            f"AntiSpam: Msg ID {message.id} by {message.author} ({message.author.id}) is part of a raid in {message.guild} ({message.guild.id})"
+        )
+        if self.raid_detector.delete:
+            try:
+                await message.delete()
+            except (discord.Forbidden, discord.NotFound):
+                pass
+        if raid.alerted:
+            return
+        raid.alerted = True
+        # Check if a mod channel is set and alert there.
+        if settings and settings.mod_channel:
+            mod_channel = discord.utils.get(
+                message.guild.text_channels, id=settings.mod_channel,
+            )
+            if mod_channel:
+                try:
+                    await mod_channel.send(
+                        f"""Possible raid: the same message was sent by {len(raid.authors)} different users within {self.raid_detector.window:g} seconds. {'Copies are being deleted' if self.raid_detector.delete else 'Copies are not being deleted'}.\n\n**Latest Msg Author:** {message.author.mention} ({message.author.id})\n**Link:** {message.jump_url}\n**Content:**\n> {message.content[:1500]}"""
+                    )
+                # If there is an error, just ignore, nothing we can do
+                except Exception as err:
+                    pass
+
     # Holds all the logic for processing the rules
     async def antispam_process_rules(
         self, service_id, service_name, message, regex_match
@@ -336,180 +408,66 @@ class AntiSpam(commands.Cog):
                 # be the discord invite code, then tells the Discord API to fetch by invite code instead of URL
                 # due to the Discord.py not being able to handle some of the new Discord URLs
                 invite_code = regex_match.split("/")[-1]
-                invite = await self.bot.fetch_invite(invite_code, with_counts=True)
-                if invite:
-                    spam_guild = invite.guild
-                    if spam_guild:
-                        self.bot.log.debug(
-                            f"AntiSpam | spam_guild: {spam_guild} ({spam_guild.id})"
-                        )
-                else:
-                    # So we found a Discord invite code, but it didn't return a valid guild, meaning bad invite code.
-                    # Return out so we don't punish the user for something invalid
-                    self.bot.log.debug(f"AntiSpam: Invite not found: {regex_match}")
+                # Check the cache first as the same invites get posted over and over
+                found, cached_guild = await self.invite_cache.get(invite_code)
+                if found and cached_guild is None:
+                    # Recently looked up and not found. Return out so we don't punish the user for something invalid
+                    self.bot.log.debug(
+                        f"AntiSpam: Invite not found (cached): {regex_match}"
+                    )
                     return allowed, spam_guild
+                elif found:
+                    # Invites that aren't to a guild, e.g. to a group DM, are cached as null
+                    cached_guild = json.loads(cached_guild)
+                    spam_guild = InviteGuild(*cached_guild) if cached_guild else None
+                else:
+                    invite = await self.bot.fetch_invite(invite_code, with_counts=True)
+                    if not invite:
+                        # So we found a Discord invite code, but it didn't return a valid guild, meaning bad invite code.
+                        # Return out so we don't punish the user for something invalid
+                        await self.invite_cache.set_negative(invite_code)
+                        self.bot.log.debug(f"AntiSpam: Invite not found: {regex_match}")
+                        return allowed, spam_guild
+                    spam_guild = invite.guild
+                    await self.invite_cache.set(
+                        invite_code,
+                        json.dumps(
+                            [spam_guild.id, spam_guild.name] if spam_guild else None
+                        ),
+                    )
+                if spam_guild:
+                    self.bot.log.debug(
+                        f"AntiSpam | spam_guild: {spam_guild} ({spam_guild.id})"
+                    )
             except discord.errors.NotFound:
                 # So we found a Discord invite code, but it didn't return a valid guild, in this case the code wasn't
                 # found on discord's service, meaning the code expired.
+                await self.invite_cache.set_negative(invite_code)
                 # Return out so we don't punish the user for something invalid
                 self.bot.log.debug(
                     f"AntiSpam: Not Found Error: Invite not found: {regex_match}"
                 )
                 return allowed, spam_guild
 
-        session = self.bot.helpers.get_db_session()
         try:
-            # Get the DB profile for the guild
-            db_guild = await self.bot.helpers.db_get_guild(session, message.guild.id)
-            # First we want to get the rules that the server has related to this service
-            # Ordered by ascending order as we go broad to narrowed rule specificity
-            antispam_service_rules = (
-                session.query(models.AntiSpamServerSettings)
-                .filter(
-                    models.AntiSpamServerSettings.server == db_guild,
-                    models.AntiSpamServerSettings.service_id == service_id,
+            # The guild's rules for the service are compiled in memory, see antispam_rules.py
+            service_rules = self.guild_rules.get(message.guild.id, {}).get(service_id)
+            if service_rules:
+                allowed = service_rules.evaluate(
+                    message.channel.id,
+                    message.author.id,
+                    regex_match,
+                    spam_guild.id if spam_guild else None,
                 )
-                .order_by(asc(models.AntiSpamServerSettings.rule_id))
-                .all()
-            )
-            # Now we need to check what rules they have for this service, and process each one individually
-            # and come up to a conclusion on how the rule should be enforced after all rules are tallied
-            for rule in antispam_service_rules:
-                # Set the variables for each rule
-                server_id = rule.server_id
-                service_id = rule.service_id
-                rule_id = rule.rule_id
-                service_match_text = rule.service_match_text
-                service_match_ids = rule.service_match_ids
-                channel_ids = rule.channel_ids
-                user_ids = rule.user_ids
-                service_value = rule.service_value
-                # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-                self.bot.log.debug(
-                    f"AntiSpam | Rule: {rule_id} | Svc: {service_name} | MsgID: {message.id} | Current Status Allowed: {allowed}"
-                )
-                # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-                # Now let's go through each rule per Order of Operations
-                # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-                # Rule 1 is Block All
-                if rule_id == 1:
-                    allowed = False
-                    self.bot.log.debug(
-                        f"AntiSpam | Rule: {rule_id} | Svc: {service_name} | SvcMatch: {regex_match} | MsgID: {message.id} | Allowed: {allowed} | Block all"
-                    )
-                # Rule 2 is Allow All
-                elif rule_id == 2:
-                    allowed = True
-                    self.bot.log.debug(
-                        f"AntiSpam | Rule: {rule_id} | Svc: {service_name} | SvcMatch: {regex_match} | MsgID: {message.id} | Allowed: {allowed} | Allow all"
-                    )
-                # Rule 3 is Block only in specific list of channels, otherwise passthrough
-                elif rule_id == 3:
-                    if channel_ids and message.channel.id in channel_ids:
-                        allowed = False
-                        self.bot.log.debug(
-                            f"AntiSpam | Rule: {rule_id} | Svc: {service_name} | SvcMatch: {regex_match} | MsgID: {message.id} | Allowed: {allowed} | In blocked list"
-                        )
-                # Rule 4 is Allow only in specific list of channels, blocked otherwise
-                elif rule_id == 4:
-                    if channel_ids and message.channel.id in channel_ids:
-                        allowed = True
-                        self.bot.log.debug(
-                            f"AntiSpam | Rule: {rule_id} | Svc: {service_name} | SvcMatch: {regex_match} | MsgID: {message.id} | Allowed: {allowed} | In allowed list"
-                        )
-                    elif channel_ids and message.channel.id not in channel_ids:
-                        allowed = False
-                        self.bot.log.debug(
-                            f"AntiSpam | Rule: {rule_id} | Svc: {service_name} | SvcMatch: {regex_match} | MsgID: {message.id} | Allowed: {allowed} | Not in allowed list"
-                        )
-                    elif channel_ids is None:
-                        # We're having a default allowed here in case they have an empty list of channels
-                        allowed = True
-                        self.bot.log.debug(
-                            f"AntiSpam | Rule: {rule_id} | Svc: {service_name} | SvcMatch: {regex_match} | MsgID: {message.id} | Allowed: {allowed} | Channel list null, default allow"
-                        )
-                elif rule_id == 5:
-                    # Rule 5 is allow the specific link only in specific list of channels, blocked otherwise
-                    if (
-                        (service_match_text and regex_match in service_match_text)
-                        or (
-                            (spam_guild and service_match_ids)
-                            and spam_guild.id in service_match_ids
-                        )
-                    ) and (channel_ids and message.channel.id in channel_ids):
-                        allowed = True
-                        self.bot.log.debug(
-                            f"AntiSpam | Rule: {rule_id} | Svc: {service_name} | SvcMatch: {regex_match} | MsgID: {message.id} | ChanID: {message.channel.id} | Allowed: {allowed} | service_match_text: {service_match_text} | channel_ids: {channel_ids} | In allow list"
-                        )
-                    else:
-                        # otherwise we'll block it assuming it's not in the allowed list
-                        allowed = False
-                        self.bot.log.debug(
-                            f"AntiSpam | Rule: {rule_id} | Svc: {service_name} | SvcMatch: {regex_match} | MsgID: {message.id} | ChanID: {message.channel.id} | Allowed: {allowed} | service_match_text: {service_match_text} | channel_ids: {channel_ids} | Default block"
-                        )
-                elif rule_id == 6:
-                    # Rule 6 is block the specific link only in specific list of channels, otherwise passthrough
-                    if (
-                        (service_match_text and regex_match in service_match_text)
-                        or (
-                            (spam_guild and service_match_ids)
-                            and spam_guild.id in service_match_ids
-                        )
-                    ) and (channel_ids and message.channel.id in channel_ids):
-                        allowed = False
-                        self.bot.log.debug(
-                            f"AntiSpam | Rule: {rule_id} | Svc: {service_name} | SvcMatch: {regex_match} | MsgID: {message.id} | ChanID: {message.channel.id} | Allowed: {allowed} | service_match_text: {service_match_text} | channel_ids: {channel_ids} | In block list"
-                        )
-                # Allow specific link of service everywhere
-                elif rule_id == 7:
-                    if (
-                        (service_match_text and regex_match in service_match_text)
-                        or (service_match_ids and regex_match in service_match_ids)
-                        or (
-                            (spam_guild and service_match_ids)
-                            and spam_guild.id in service_match_ids
-                        )
-                    ):
-                        if user_ids:
-                            # If only certain users are allowed to post it, then further check that
-                            if message.author.id in user_ids:
-                                allowed = True
-                                self.bot.log.debug(
-                                    f"AntiSpam | Rule: {rule_id} | Svc: {service_name} | SvcMatch: {regex_match} | MsgID: {message.id} | Allowed: {allowed} | service_match_text: {service_match_text} | service_match_ids: {service_match_ids} | spam_guild: {spam_guild.id if spam_guild else None}"
-                                )
-                        else:
-                            allowed = True
-                            self.bot.log.debug(
-                                f"AntiSpam | Rule: {rule_id} | Svc: {service_name} | SvcMatch: {regex_match} | MsgID: {message.id} | Allowed: {allowed} | service_match_text: {service_match_text} | service_match_ids: {service_match_ids} | spam_guild: {spam_guild.id if spam_guild else None}"
-                            )
-                # Block specific link of service everywhere
-                elif rule_id == 8:
-                    if (service_match_text and regex_match in service_match_text) or (
-                        (spam_guild and service_match_ids)
-                        and spam_guild.id in service_match_ids
-                    ):
-                        allowed = False
-                        self.bot.log.debug(
-                            f"AntiSpam | Rule: {rule_id} | Svc: {service_name} | SvcMatch: {regex_match} | MsgID: {message.id} | Allowed: {allowed} | service_match_text: {service_match_text} | service_match_ids: {service_match_ids} | spam_guild: {spam_guild.id if spam_guild else None}"
-                        )
-
-                self.bot.log.debug(f"AntiSpam | Current Status Allowed: {allowed}")
-
-        # TO DO - Add a lot of exception handling around this code
-        except DBAPIError as err:
-            self.bot.log.exception(
-                f"Database Error in AntiSpam Module. {sys.exc_info()[0].__name__}: {err}"
+            self.bot.log.debug(
+                f"AntiSpam | Svc: {service_name} | SvcMatch: {regex_match} | MsgID: {message.id} | ChanID: {message.channel.id} | Rules: {len(service_rules.match_rules) if service_rules else 0} | Allowed: {allowed} | spam_guild: {spam_guild.id if spam_guild else None}"
             )
-            session.rollback()
         except Exception as err:
             self.bot.log.exception(
                 f"Generic Error in AntiSpam Module. {sys.exc_info()[0].__name__}: {err}"
             )
-        finally:
-            # Close this database session
-            session.close()
-            # Return whether the message is allowed or not
-            return allowed, spam_guild
+        # Return whether the message is allowed or not
+        return allowed, spam_guild
 
     async def log_antispam(self, message, service_name, regex_result, spam_guild=None):
         debug_mode = True
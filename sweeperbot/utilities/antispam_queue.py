@@ -0,0 +1,157 @@
+import asyncio
+import configparser
+import sys
+import time
+from collections import OrderedDict, deque
+
+from sweeperbot.db.instrumentation import query_origin
+
+OVERFLOW_POLICIES = ("drop_oldest", "degrade")
+
+
+class AntiSpamQueue:
+    """Runs AntiSpam on messages with a pool of workers, instead of inside the on_message listener.
+
+    Each guild has its own queue and workers take one message from each guild with messages waiting in turn, so a
+    raid in one guild can't starve the others. At most MAX_SIZE messages wait in total. When full, the OVERFLOW
+    policy either drops the oldest message of the busiest guild, or degrades to running only the cheap checks (rate
+    limits, mentions, raids, word filter) on the new message right away, skipping URL and invite lookups."""
+
+    def __init__(self, bot, process):
+        self.bot = bot
+        # The coroutine function ran for each message, called as process(message, cheap_only=False)
+        self.process = process
+        try:
+            self.worker_count = int(self.bot.botconfig.get("AntiSpamQueue", "WORKERS"))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.worker_count = 8
+        try:
+            self.max_size = int(self.bot.botconfig.get("AntiSpamQueue", "MAX_SIZE"))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.max_size = 5000
+        try:
+            self.overflow = self.bot.botconfig.get("AntiSpamQueue", "OVERFLOW").lower()
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.overflow = "drop_oldest"
+        if self.overflow not in OVERFLOW_POLICIES:
+            self.bot.log.warning(
+                f"AntiSpamQueue: Unknown OVERFLOW policy '{self.overflow}', using drop_oldest"
+            )
+            self.overflow = "drop_oldest"
+
+        # guild_id: deque of (enqueued at, message)
+        self.guilds = {}
+        # Guilds with messages waiting, in the order workers will take from them
+        self.ready = OrderedDict()
+        self.size = 0
+        self.workers = []
+        self._wakeup = asyncio.Event()
+        # Recent wait and total (wait + processing) times in ms, for the percentiles
+        self.wait_ms = deque(maxlen=1000)
+        self.total_ms = deque(maxlen=1000)
+        self.stats = {
+            "enqueued": 0,
+            "processed": 0,
+            "errors": 0,
+            "dropped": 0,
+            "degraded": 0,
+            "max_depth": 0,
+        }
+
+    def start(self):
+        """Starts the workers, unless they're already running"""
+        self.workers = [worker for worker in self.workers if not worker.done()]
+        for _ in range(self.worker_count - len(self.workers)):
+            self.workers.append(asyncio.create_task(self.worker()))
+        return self.workers
+
+    async def put(self, message):
+        """Queues a message for AntiSpam, or handles it per the overflow policy if the queue is full"""
+        if self.size >= self.max_size:
+            if self.overflow == "degrade":
+                self.stats["degraded"] += 1
+                return await self.process(message, cheap_only=True)
+            self._drop_oldest()
+
+        guild_id = message.guild.id
+        pending = self.guilds.get(guild_id)
+        if pending is None:
+            pending = self.guilds[guild_id] = deque()
+        pending.append((time.perf_counter(), message))
+        self.ready[guild_id] = None
+        self.size += 1
+        self.stats["enqueued"] += 1
+        if self.size > self.stats["max_depth"]:
+            self.stats["max_depth"] = self.size
+        self._wakeup.set()
+
+    def _drop_oldest(self):
+        # The busiest guild is most likely the one being raided, so it loses its oldest message
+        guild_id = max(self.ready, key=lambda guild_id: len(self.guilds[guild_id]))
+        self._take(guild_id)
+        self.stats["dropped"] += 1
+
+    def _take(self, guild_id):
+        pending = self.guilds[guild_id]
+        item = pending.popleft()
+        self.size -= 1
+        if not pending:
+            del self.guilds[guild_id]
+            del self.ready[guild_id]
+        return item
+
+    def get_nowait(self):
+        """Takes the next message, rotating between guilds. Returns (enqueued at, message) or None if empty"""
+        if not self.ready:
+            return None
+        guild_id = next(iter(self.ready))
+        item = self._take(guild_id)
+        # Send the guild to the back of the line if it still has messages waiting
+        if guild_id in self.ready:
+            self.ready.move_to_end(guild_id)
+        return item
+
+    async def worker(self):
+        query_origin.set("task:antispam_worker")
+        while True:
+            item = self.get_nowait()
+            if item is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            enqueued_at, message = item
+            started = time.perf_counter()
+            try:
+                await self.process(message)
+                self.stats["processed"] += 1
+            except Exception as err:
+                self.stats["errors"] += 1
+                self.bot.log.exception(
+                    f"AntiSpamQueue: Error processing Msg ID {message.id}. {sys.exc_info()[0].__name__}: {err}"
+                )
+            finished = time.perf_counter()
+            self.wait_ms.append((started - enqueued_at) * 1000)
+            self.total_ms.append((finished - enqueued_at) * 1000)
+
+    @staticmethod
+    def percentile(samples, percent):
+        if not samples:
+            return 0.0
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+    def snapshot(self):
+        """Returns the counters plus the current depth and latency percentiles, for the metrics command"""
+        busiest = max(self.guilds.items(), key=lambda item: len(item[1]), default=None)
+        return {
+            "depth": self.size,
+            "guilds_waiting": len(self.ready),
+            "busiest_guild": f"{busiest[0]} ({len(busiest[1])})" if busiest else None,
+            "workers": sum(1 for worker in self.workers if not worker.done()),
+            "overflow": self.overflow,
+            **self.stats,
+            "wait_p50_ms": round(self.percentile(self.wait_ms, 50), 2),
+            "wait_p99_ms": round(self.percentile(self.wait_ms, 99), 2),
+            "total_p50_ms": round(self.percentile(self.total_ms, 50), 2),
+            "total_p99_ms": round(self.percentile(self.total_ms, 99), 2),
+        }
@@ -0,0 +1,144 @@
+from sqlalchemy import select
+
+from sweeperbot.db import models
+
+# Rules 1-4 only depend on the channel, rules 5-8 also depend on what the URL matched and who posted it
+CHANNEL_RULES = (1, 2, 3, 4)
+MATCH_RULES = (5, 6, 7, 8)
+
+
+class CompiledRule:
+    """One AntiSpamServerSettings row with its lists turned into frozensets"""
+
+    __slots__ = ("rule_id", "match_text", "match_ids", "channel_ids", "user_ids")
+
+    def __init__(
+        self,
+        rule_id,
+        service_match_text=None,
+        service_match_ids=None,
+        channel_ids=None,
+        user_ids=None,
+        **kwargs,
+    ):
+        self.rule_id = rule_id
+        self.match_text = frozenset(service_match_text or ())
+        self.match_ids = frozenset(service_match_ids or ())
+        # Rule 4 treats a missing channel list differently from an empty one, so None is kept
+        self.channel_ids = frozenset(channel_ids) if channel_ids is not None else None
+        self.user_ids = frozenset(user_ids or ())
+
+    def in_channels(self, channel_id):
+        return self.channel_ids is not None and channel_id in self.channel_ids
+
+
+class ServiceRules:
+    """The rules a guild has for one service, compiled into a decision structure.
+
+    As rules are applied in rule_id order, the channel only rules 1-4 always come first, so their outcome is
+    precomputed for every channel they mention plus a default for every other channel. Only rules 5-8 are evaluated
+    per message, using set lookups."""
+
+    __slots__ = ("default_outcome", "channel_outcomes", "match_rules")
+
+    def __init__(self, rules):
+        rules = sorted(rules, key=lambda rule: rule.rule_id)
+        channel_rules = [rule for rule in rules if rule.rule_id in CHANNEL_RULES]
+        self.match_rules = tuple(rule for rule in rules if rule.rule_id in MATCH_RULES)
+
+        channels = set()
+        for rule in channel_rules:
+            channels.update(rule.channel_ids or ())
+        self.default_outcome = self._channel_outcome(channel_rules, None)
+        self.channel_outcomes = {
+            channel_id: self._channel_outcome(channel_rules, channel_id)
+            for channel_id in channels
+        }
+
+    @staticmethod
+    def _channel_outcome(channel_rules, channel_id):
+        allowed = True
+        for rule in channel_rules:
+            # Rule 1 is Block All
+            if rule.rule_id == 1:
+                allowed = False
+            # Rule 2 is Allow All
+            elif rule.rule_id == 2:
+                allowed = True
+            # Rule 3 is Block only in specific list of channels, otherwise passthrough
+            elif rule.rule_id == 3:
+                if rule.channel_ids and channel_id in rule.channel_ids:
+                    allowed = False
+            # Rule 4 is Allow only in specific list of channels, blocked otherwise
+            elif rule.rule_id == 4:
+                if rule.channel_ids:
+                    allowed = channel_id in rule.channel_ids
+                elif rule.channel_ids is None:
+                    # Default allowed in case they have an empty list of channels
+                    allowed = True
+        return allowed
+
+    def evaluate(self, channel_id, author_id, regex_match, spam_guild_id=None):
+        """Returns whether the match is allowed to be posted in the channel by the author"""
+        allowed = self.channel_outcomes.get(channel_id, self.default_outcome)
+        for rule in self.match_rules:
+            matches = regex_match in rule.match_text or (
+                spam_guild_id is not None and spam_guild_id in rule.match_ids
+            )
+            # Rule 5 is allow the specific link only in specific list of channels, blocked otherwise
+            if rule.rule_id == 5:
+                allowed = matches and rule.in_channels(channel_id)
+            # Rule 6 is block the specific link only in specific list of channels, otherwise passthrough
+            elif rule.rule_id == 6:
+                if matches and rule.in_channels(channel_id):
+                    allowed = False
+            # Rule 7 is allow specific link of service everywhere, optionally only for certain users
+            elif rule.rule_id == 7:
+                if matches or regex_match in rule.match_ids:
+                    if not rule.user_ids or author_id in rule.user_ids:
+                        allowed = True
+            # Rule 8 is block specific link of service everywhere
+            elif rule.rule_id == 8:
+                if matches:
+                    allowed = False
+        return allowed
+
+
+def load_guild_rules(session, guild_ids=None):
+    """Loads the AntiSpam rules of every guild, or only those in guild_ids, with one query.
+
+    Returns {guild discord_id: {service_id: ServiceRules}}"""
+    columns = models.AntiSpamServerSettings.__table__.c
+    statement = (
+        select(
+            models.Server.discord_id,
+            columns.service_id,
+            columns.rule_id,
+            columns.service_match_text,
+            columns.service_match_ids,
+            columns.channel_ids,
+            columns.user_ids,
+        )
+        .join(models.Server, columns.server_id == models.Server.id)
+        .order_by(columns.rule_id, columns.id)
+    )
+    if guild_ids is not None:
+        statement = statement.where(models.Server.discord_id.in_(guild_ids))
+
+    grouped = {}
+    for row in session.execute(statement):
+        row = row._mapping
+        grouped.setdefault(row["discord_id"], {}).setdefault(
+            row["service_id"], []
+        ).append(CompiledRule(**row))
+
+    guild_rules = {
+        guild_id: {
+            service_id: ServiceRules(rules) for service_id, rules in services.items()
+        }
+        for guild_id, services in grouped.items()
+    }
+    # Guilds that were asked for but have no rules get an empty rule set
+    for guild_id in guild_ids or ():
+        guild_rules.setdefault(guild_id, {})
+    return guild_rules
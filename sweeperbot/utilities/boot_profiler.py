@@ -0,0 +1,131 @@
+import json
+import sys
+import time
+from contextlib import contextmanager
+
+from sweeperbot.db.instrumentation import query_origin
+
+# Modules of the bot itself, anything else first imported during a phase is a dependency it pulled in
+OWN_PACKAGES = ("sweeperbot", "cogs", "utilities")
+
+
+def imported_since(modules_before):
+    """Returns (number of modules imported, sorted top level packages outside the bot) since modules_before"""
+    new_modules = set(sys.modules) - modules_before
+    packages = {
+        module.split(".")[0]
+        for module in new_modules
+        if not module.startswith(OWN_PACKAGES) and not module.startswith("_")
+    }
+    return len(new_modules), sorted(packages)
+
+
+class BootProfiler:
+    """Times each phase of startup and counts the database queries it makes.
+
+    Phases are grouped as "init" (Bot.__init__), "extension" (each load_extension) and "ready" (on_ready). While a
+    phase runs, queries are tagged with the origin "boot:<group>:<name>" so they're counted against it even if other
+    phases run at the same time. The modules each phase imports are counted too, with the third party packages it was
+    the first to import, so heavy imports can be traced to the extension that pulls them in. The report is logged once
+    the first on_ready finishes and is shown by the owner only metrics boot command."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.started = time.perf_counter()
+        self.ready_ms = None
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name, group="init"):
+        """Times the code run inside the with block, which may await"""
+        origin = f"boot:{group}:{name}"
+        calls, query_ms = self._query_totals(origin)
+        record = {
+            "group": group,
+            "name": name,
+            "ms": 0.0,
+            "queries": 0,
+            "query_ms": 0.0,
+            "modules": 0,
+            "imported": [],
+            "ok": True,
+        }
+        modules_before = set(sys.modules)
+        token = query_origin.set(origin)
+        started = time.perf_counter()
+        try:
+            yield record
+        except BaseException:
+            record["ok"] = False
+            raise
+        finally:
+            record["ms"] = (time.perf_counter() - started) * 1000
+            query_origin.reset(token)
+            end_calls, end_query_ms = self._query_totals(origin)
+            record["queries"] = end_calls - calls
+            record["query_ms"] = end_query_ms - query_ms
+            record["modules"], record["imported"] = imported_since(modules_before)
+            # Only the first startup is kept, not the on_ready after every reconnect
+            if self.ready_ms is None:
+                self.phases.append(record)
+
+    def _query_totals(self, origin):
+        # The database manager is one of the first things timed, so it may not exist yet
+        if not self.bot.database:
+            return 0, 0.0
+        return self.bot.database.query_stats.totals(origin)
+
+    def ready(self):
+        """Records that on_ready has finished. Returns True the first time, when the report should be logged"""
+        if self.ready_ms is not None:
+            return False
+        self.ready_ms = (time.perf_counter() - self.started) * 1000
+        return True
+
+    def report(self):
+        """Returns the boot report as a dict"""
+        groups = {}
+        for record in self.phases:
+            totals = groups.setdefault(
+                record["group"], {"phases": 0, "ms": 0.0, "queries": 0, "failed": 0}
+            )
+            totals["phases"] += 1
+            totals["ms"] += record["ms"]
+            totals["queries"] += record["queries"]
+            totals["failed"] += not record["ok"]
+        return {"ready_ms": self.ready_ms, "groups": groups, "phases": self.phases}
+
+    def log_report(self):
+        report = self.report()
+        self.bot.log.info(
+            f"Boot report: ready in {report['ready_ms'] or 0:0.0f}ms. "
+            + ", ".join(
+                f"{group} {totals['ms']:0.0f}ms/{totals['queries']} queries"
+                for group, totals in report["groups"].items()
+            )
+        )
+        self.bot.log.info(f"Boot report: {json.dumps(report, default=str)}")
+
+    def lines(self, slowest=10):
+        """Formats the report as text lines: the group totals, the on_ready phases, then the slowest other phases"""
+        report = self.report()
+        lines = [f"ready in {report['ready_ms'] or 0:,.0f}ms"]
+        for group, totals in report["groups"].items():
+            lines.append(
+                f"{group:<10} {totals['phases']:>3} phases {totals['ms']:>9,.1f}ms "
+                f"{totals['queries']:>5} queries {totals['failed']} failed"
+            )
+        lines.append("")
+        ready = [record for record in self.phases if record["group"] == "ready"]
+        others = sorted(
+            (record for record in self.phases if record["group"] != "ready"),
+            key=lambda record: record["ms"],
+            reverse=True,
+        )[:slowest]
+        for record in ready + others:
+            lines.append(
+                f"{record['group'][:3]} {record['name'][:32]:<32} {record['ms']:>9,.1f}ms "
+                f"{record['queries']:>4}q {record['query_ms']:>8,.1f}ms {record['modules']:>4}m"
+                + ("" if record["ok"] else " FAILED")
+            )
+        return lines
@@ -0,0 +1,253 @@
+import asyncio
+import collections
+import configparser
+import datetime
+import sys
+import time
+
+import discord
+import redis
+
+from sweeperbot.db.instrumentation import query_origin
+
+# UNIX time up to which every mute and reminder has been run
+HEARTBEAT_KEY = "timers:caught_up_to"
+
+
+class CatchUp:
+    """Runs the mutes and reminders that expired while the bot was offline, without bursting into rate limits.
+
+    The time up to which every timer has run is saved in Redis as a heartbeat. On startup the TimerWindow loads
+    rows from there (at most MAX_LOOKBACK seconds back) instead of from now, and the Scheduler hands timers more than
+    LATE_AFTER seconds overdue here instead of running them all at once.
+
+    Late timers are grouped per guild, as a timer's first argument is its guild ID. Each guild has one worker running
+    its timers in order, at most CONCURRENCY guilds are worked on at once, and timers across all guilds start at no
+    more than RATE per second. A timer's async_event is awaited when it has one, so those limits hold for the work it
+    does rather than just for starting it, and its failures are counted. Guilds with at least REPORT_MIN late timers
+    get a progress message in their mod channel."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        try:
+            self.late_after = float(self.bot.botconfig.get("CatchUp", "LATE_AFTER"))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.late_after = 60.0
+        try:
+            self.max_lookback = float(
+                self.bot.botconfig.get("CatchUp", "MAX_LOOKBACK")
+            )
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.max_lookback = 7 * 24 * 60 * 60.0
+        try:
+            self.concurrency = int(self.bot.botconfig.get("CatchUp", "CONCURRENCY"))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.concurrency = 4
+        try:
+            self.rate = float(self.bot.botconfig.get("CatchUp", "RATE"))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.rate = 5.0
+        try:
+            self.report_min = int(self.bot.botconfig.get("CatchUp", "REPORT_MIN"))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.report_min = 10
+        try:
+            self.progress_every = int(
+                self.bot.botconfig.get("CatchUp", "PROGRESS_EVERY")
+            )
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.progress_every = 50
+        try:
+            self.heartbeat_interval = float(
+                self.bot.botconfig.get("CatchUp", "HEARTBEAT_INTERVAL")
+            )
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.heartbeat_interval = 60.0
+
+        # guild_id: deque of late timers, earliest first
+        self.pending = {}
+        # guild_id: worker task
+        self.workers = {}
+        # guild_id: counts and the progress message for the current catch-up
+        self.progress = {}
+        self._slots = None
+        self._next_slot = 0.0
+        self._first_loads = set()
+        self.task = None
+        self.stats = {
+            "late": 0,
+            "dispatched": 0,
+            "skipped": 0,
+            "failed": 0,
+            "heartbeat_errors": 0,
+        }
+        self.offline_since = self.read_heartbeat()
+
+    def read_heartbeat(self):
+        """Returns the time up to which timers had run before the bot restarted, or None if it isn't known"""
+        try:
+            value = self.bot.helpers.redis.get(HEARTBEAT_KEY)
+        except redis.RedisError as err:
+            self.stats["heartbeat_errors"] += 1
+            self.bot.log.warning(
+                f"CatchUp: Unable to read the timer heartbeat, timers that expired while offline won't run. {err}"
+            )
+            return None
+        if not value:
+            return None
+        since = max(float(value), time.time() - self.max_lookback)
+        return datetime.datetime.fromtimestamp(since, datetime.timezone.utc)
+
+    def since(self, kind, now):
+        """Returns where the first load of a kind of timer should start, so the ones that expired offline are included"""
+        if kind in self._first_loads or not self.offline_since:
+            return now
+        self._first_loads.add(kind)
+        return min(self.offline_since, now)
+
+    def caught_up_to(self, now):
+        """Returns the UNIX time up to which every loaded timer has run"""
+        caught_up_to = now
+        next_due = self.bot.scheduler.next_due()
+        if next_due is not None:
+            caught_up_to = min(caught_up_to, next_due)
+        for queue in self.pending.values():
+            if queue:
+                caught_up_to = min(caught_up_to, queue[0].expires.timestamp())
+        return caught_up_to
+
+    def heartbeat(self):
+        # Until every kind of timer has been loaded the ones that expired offline may not be in memory yet
+        if any(until is None for until in self.bot.timer_window.loaded_until.values()):
+            return
+        try:
+            self.bot.helpers.redis.set(HEARTBEAT_KEY, self.caught_up_to(time.time()))
+        except redis.RedisError as err:
+            self.stats["heartbeat_errors"] += 1
+            self.bot.log.warning(f"CatchUp: Unable to save the timer heartbeat. {err}")
+
+    def start(self):
+        """Starts the heartbeat task, unless it's already running"""
+        if not self.task or self.task.done():
+            self.task = asyncio.create_task(self.run())
+        return self.task
+
+    async def run(self):
+        query_origin.set("task:catch_up")
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            self.heartbeat()
+
+    def take_late(self, timers, now):
+        """Queues the timers that are more than LATE_AFTER seconds overdue and returns the rest to run now"""
+        on_time = []
+        for timer in timers:
+            if now - timer.expires.timestamp() <= self.late_after:
+                on_time.append(timer)
+                continue
+            guild_id = timer.args[0]
+            self.pending.setdefault(guild_id, collections.deque()).append(timer)
+            if guild_id not in self.progress:
+                self.progress[guild_id] = {
+                    "total": 0,
+                    "done": 0,
+                    "skipped": 0,
+                    "failed": 0,
+                    "started": time.monotonic(),
+                    "message": None,
+                }
+            self.progress[guild_id]["total"] += 1
+            self.stats["late"] += 1
+            worker = self.workers.get(guild_id)
+            if not worker or worker.done():
+                self.workers[guild_id] = asyncio.create_task(self.worker(guild_id))
+        return on_time
+
+    async def _throttle(self):
+        """Spaces timers across all guilds to at most RATE per second"""
+        now = time.monotonic()
+        wait = self._next_slot - now
+        self._next_slot = max(now, self._next_slot) + 1 / self.rate
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def worker(self, guild_id):
+        # Created lazily so it binds to the running loop
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        async with self._slots:
+            queue = self.pending[guild_id]
+            progress = self.progress[guild_id]
+            try:
+                while queue:
+                    # Left in the queue while it runs so the heartbeat doesn't move past it
+                    timer = queue[0]
+                    await self._throttle()
+                    try:
+                        if timer.async_event:
+                            await timer.async_event(*timer.args)
+                        else:
+                            timer.event(*timer.args)
+                        progress["done"] += 1
+                        self.stats["dispatched"] += 1
+                    except ValueError:
+                        # The guild or member is gone, the event has logged it
+                        progress["skipped"] += 1
+                        self.stats["skipped"] += 1
+                    except Exception as err:
+                        progress["failed"] += 1
+                        self.stats["failed"] += 1
+                        self.bot.log.exception(
+                            f"CatchUp: Error running {timer}. {sys.exc_info()[0].__name__}: {err}"
+                        )
+                    queue.popleft()
+
+                    handled = progress["done"] + progress["skipped"] + progress["failed"]
+                    if progress["total"] >= self.report_min and (
+                        not queue or handled % self.progress_every == 0
+                    ):
+                        await self.report(guild_id, progress, finished=not queue)
+            finally:
+                del self.pending[guild_id]
+                del self.progress[guild_id]
+                del self.workers[guild_id]
+
+    async def report(self, guild_id, progress, finished):
+        """Posts or updates the catch-up progress message in the guild's mod channel"""
+        guild = self.bot.get_guild(guild_id)
+        settings = self.bot.guild_settings.get(guild_id)
+        if not guild or not settings or not settings.mod_channel:
+            return
+        mod_channel = discord.utils.get(guild.text_channels, id=settings.mod_channel)
+        if not mod_channel:
+            return
+
+        handled = progress["done"] + progress["skipped"] + progress["failed"]
+        if finished:
+            elapsed = time.monotonic() - progress["started"]
+            text = (
+                f"Caught up on {handled} mutes and reminders that expired while I was offline in {elapsed:0.0f}s. "
+                f"{progress['skipped']} skipped as the member has left, {progress['failed']} failed."
+            )
+        else:
+            text = (
+                f"Catching up on mutes and reminders that expired while I was offline: "
+                f"{handled}/{progress['total']} done."
+            )
+        try:
+            if progress["message"]:
+                await progress["message"].edit(content=text)
+            else:
+                progress["message"] = await mod_channel.send(text)
+        except discord.HTTPException as err:
+            self.bot.log.warning(
+                f"CatchUp: Unable to report progress in guild {guild_id}. {err}"
+            )
+
+    def snapshot(self):
+        return {
+            **self.stats,
+            "pending": sum(len(queue) for queue in self.pending.values()),
+            "guilds": len(self.pending),
+            "offline_since": str(self.offline_since),
+        }
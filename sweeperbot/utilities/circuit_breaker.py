@@ -0,0 +1,43 @@
+import time
+
+
+class CircuitBreaker:
+    """Stops calling a dependency for a while after it fails, e.g. Redis on the AntiSpam hot path.
+
+    Callers check allow() before each call and report the outcome with succeeded() or failed(). After a failure the
+    breaker opens and allow() returns False for cooldown seconds, so callers go straight to their fallback instead of
+    waiting on a dead or hung server for every message. Once the cooldown has passed one call is let through to try
+    again, and the breaker closes if it succeeds or opens for another cooldown if it fails."""
+
+    def __init__(self, cooldown=30.0, clock=time.monotonic):
+        self.cooldown = cooldown
+        self.clock = clock
+        # When the breaker closes again, None while it's closed
+        self.open_until = None
+        self.stats = {"opened": 0, "skipped": 0}
+
+    def allow(self):
+        if self.open_until is None:
+            return True
+        now = self.clock()
+        if now < self.open_until:
+            self.stats["skipped"] += 1
+            return False
+        # Let this call through to try again, any others wait for its outcome or another cooldown
+        self.open_until = now + self.cooldown
+        return True
+
+    def succeeded(self):
+        self.open_until = None
+
+    def failed(self):
+        if self.open_until is None:
+            self.stats["opened"] += 1
+        self.open_until = self.clock() + self.cooldown
+
+    @property
+    def is_open(self):
+        return self.open_until is not None
+
+    def snapshot(self):
+        return {"open": self.is_open, **self.stats}
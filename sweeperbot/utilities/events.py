@@ -65,25 +65,15 @@ class Events(commands.Cog):
                     self.bot.log.error(
                         f"Error adding on join role to user {member} ({member.iod}). {sys.exc_info()[0].__name__}: {err}"
                     )
-            # Log new user to the database
-            # First check if they exist in our DB already
-            dbuser = (
-                session.query(models.User)
-                .filter(models.User.discord_id == member.id)
-                .first()
-            )
-            # If they don't exist in the database
-            if not dbuser:
-                # Add them to the database
-                dbuser = models.User(discord_id=member.id)
-                session.add(dbuser)
+            # Log new user to the database, creating their record if they don't exist yet
+            db_user_id = await self.bot.helpers.db_get_user_id(member.id)
             # Also add an initial alias for them
             # While this will cause some duplicate records as they join multiple servers the bot is in without an alias
             # change, this will be preferred so we always know their name, instead if they join when bot knows them as
             # one name, then they leave the servers the bot watches, changes them, and rejoins we don't know their new
             # name, thus making it harder to pull reports for spam abuse based on name
             # TO DO - Find the latest entry by a user with that user ID and if the name matches, skip it
-            new_alias = models.Alias(name=f"{member}", user=dbuser)
+            new_alias = models.Alias(name=f"{member}", user_id=db_user_id)
             # Add the new_alias to the session to log to the database
             session.add(new_alias)
             try:
@@ -277,66 +267,13 @@ class Events(commands.Cog):
                 and msg.channel.id == self.bot.constants.prod_bot_media_spam
             ):
                 return
-            session = self.bot.helpers.get_db_session()
-            try:
-                # Check the configured requests channel
-                settings = self.bot.guild_settings.get(msg.guild.id)
-                request_channel = settings.request_channel
-                #if (
-                #    request_channel == msg.guild.id
-                #    and not msg.content.startswith(settings.bot_prefix)
-                #):
-
-                # Check if there is a user in the database already
-                db_user = (
-                    session.query(models.User)
-                    .filter(models.User.discord_id == msg.author.id)
-                    .first()
-                )
-                # If no DB record for the user then create one
-                if not db_user:
-                    db_user = models.User(discord_id=msg.author.id)
-                    session.add(db_user)
-                # Check if there is a guild in the database already
-                db_guild = (
-                    session.query(models.Server)
-                    .filter(models.Server.discord_id == msg.guild.id)
-                    .first()
-                )
-                if not db_guild:
-                    db_guild = await self.bot.helpers.db_add_new_guild(
-                        session, msg.guild.id, msg.guild
-                    )
-
-                message_details = {
-                    "message_id": msg.id,
-                    "message_body": msg.content,
-                    "channel_id": msg.channel.id,
-                    "channel_name": msg.channel.name,
-                }
-                new_message = models.Message(
-                    user=db_user, server=db_guild, **message_details
-                )
-                session.add(new_message)
-                session.commit()
-            except IntegrityError as err:
-                # We don't need to log when there is a duplicate message in the database as it won't be helpful.
-                # self.bot.log.debug(
-                #     f"Duplicate database record: '/{msg.guild.id}/{msg.channel.id}/{msg.id}' to database. {sys.exc_info()[0].__name__}: {err}"
-                # )
-                session.rollback()
-            except DBAPIError as err:
-                self.bot.log.exception(
-                    f"Generic Error logging message '/{msg.guild.id}/{msg.channel.id}/{msg.id}' to database. {sys.exc_info()[0].__name__}: {err}"
-                )
-                session.rollback()
-            finally:
-                session.close()
+            # Queue the message to be written to the database in bulk
+            await self.bot.message_buffer.add(msg)
 
             # Disabling future code.. cause I'm not branching
-            # Perform AntiSpam checks
-            self.bot.log.debug(f"About to start AntiSpam Checks for Msg ID: {msg.id}")
-            await self.bot.antispam.antispam_process_message(msg)
+            # Queue the AntiSpam checks, they're run by the AntiSpam workers
+            self.bot.log.debug(f"Queueing AntiSpam Checks for Msg ID: {msg.id}")
+            await self.bot.antispam.queue.put(msg)
 
     @commands.Cog.listener()
     async def on_message_delete(self, message):
@@ -431,10 +368,10 @@ class Events(commands.Cog):
 
             # If there is no guild settings, create them
             if not guild_settings:
-                self.bot.helpers.db_add_new_guild_settings(session, guild)
+                await self.bot.helpers.db_add_new_guild_settings(session, guild)
 
             # Update local cache with new guild settings
-            await self.bot.helpers.get_one_guild_settings(session, newguild.id)
+            await self.bot.guild_settings_cache.refresh(newguild.id)
 
             self.bot.log.info(f"Joined new guild: {newguild.name} ({newguild.id})")
 
@@ -516,9 +453,9 @@ class Events(commands.Cog):
                 )
                 # If there is no guild settings, create them
                 if not guild_settings:
-                    self.bot.helpers.db_add_new_guild_settings(session, guild)
+                    await self.bot.helpers.db_add_new_guild_settings(session, guild)
                 # Update local cache with new guild settings
-                await self.bot.helpers.get_one_guild_settings(session, guild_after.id)
+                await self.bot.guild_settings_cache.refresh(guild_after.id)
                 # Now we're done processing new guild and updating the settings, return
                 return
             else:
@@ -1445,13 +1382,13 @@ class Events(commands.Cog):
             # Log to the database
             session = self.bot.helpers.get_db_session()
             try:
-                # Get the DB profile for the guild
-                db_guild = await self.bot.helpers.db_get_guild(session, member.guild.id)
-                # Get the DB profile for the user
-                db_user = await self.bot.helpers.db_get_user(session, member.id)
+                # Get the DB ID for the guild
+                db_guild_id = await self.bot.helpers.db_get_guild_id(member.guild.id)
+                # Get the DB ID for the user
+                db_user_id = await self.bot.helpers.db_get_user_id(member.id)
                 db_voice = models.VoiceLog(
-                    user=db_user,
-                    server=db_guild,
+                    user_id=db_user_id,
+                    server_id=db_guild_id,
                     event_type=reason,
                     # Old Channel
                     vc_old_name=voice_state_before.channel.name
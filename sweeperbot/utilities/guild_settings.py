@@ -0,0 +1,97 @@
+import sys
+import time
+
+from sqlalchemy import select
+
+from sweeperbot.db import models
+
+# Every ServerSetting column is copied onto the snapshot
+SETTING_FIELDS = tuple(column.key for column in models.ServerSetting.__table__.columns)
+
+
+class GuildSettings:
+    """A read only snapshot of a guild's ServerSetting row, plus the guild's discord_id.
+
+    Snapshots aren't tied to a database session, so they can be shared freely. To change a setting write it to the
+    database and refresh the guild in the GuildSettingsCache."""
+
+    __slots__ = ("discord_id",) + SETTING_FIELDS
+
+    def __init__(self, discord_id, **values):
+        object.__setattr__(self, "discord_id", discord_id)
+        for field in SETTING_FIELDS:
+            value = values.get(field)
+            # Array columns are stored as tuples so they can't be changed in place either
+            if isinstance(value, list):
+                value = tuple(value)
+            object.__setattr__(self, field, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(
+            f"{self.__class__.__name__} is read only, update the database and refresh the cache instead"
+        )
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{self.__class__.__name__} is read only")
+
+    def __repr__(self):
+        return f"<GuildSettings discord_id={self.discord_id} id={self.id}>"
+
+
+class GuildSettingsCache:
+    """Keeps bot.guild_settings, a dict of guild discord_id to GuildSettings, in sync with the database.
+
+    Everything is loaded with a single JOIN of ServerSetting and Server. After that, guilds are refreshed one at a time
+    whenever a command writes a change, rather than reloading everything."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.stats = {
+            "full_loads": 0,
+            "refreshes": 0,
+            "last_load_rows": 0,
+            "last_load_ms": 0.0,
+        }
+
+    def _query(self, session, guild_ids=None):
+        """Returns a GuildSettings for every guild, or only those in guild_ids"""
+        statement = select(
+            *models.ServerSetting.__table__.columns,
+            models.Server.discord_id.label("discord_id"),
+        ).join(models.Server, models.ServerSetting.server_id == models.Server.id)
+        if guild_ids is not None:
+            statement = statement.where(models.Server.discord_id.in_(guild_ids))
+        return [
+            GuildSettings(**row._mapping) for row in session.execute(statement)
+        ]
+
+    async def load_all(self):
+        """Loads the settings of every guild, updating bot.guild_settings in place"""
+        try:
+            self.bot.log.info(f"Getting all guild settings")
+            started = time.perf_counter()
+            snapshots = await self.bot.helpers.run_db(self._query)
+
+            all_settings = {settings.discord_id: settings for settings in snapshots}
+            for guild_id in set(self.bot.guild_settings) - set(all_settings):
+                del self.bot.guild_settings[guild_id]
+            self.bot.guild_settings.update(all_settings)
+
+            self.stats["full_loads"] += 1
+            self.stats["last_load_rows"] = len(all_settings)
+            self.stats["last_load_ms"] = (time.perf_counter() - started) * 1000
+            self.bot.log.info(f"Done getting all guild settings")
+        except Exception as err:
+            self.bot.log.exception(
+                f"Error getting all guild settings. {sys.exc_info()[0].__name__}: {err}"
+            )
+
+    async def refresh(self, guild_id):
+        """Reloads the settings of one guild from the database and returns them"""
+        snapshots = await self.bot.helpers.run_db(self._query, [guild_id])
+        self.stats["refreshes"] += 1
+        if not snapshots:
+            self.bot.guild_settings.pop(guild_id, None)
+            return None
+        self.bot.guild_settings[guild_id] = snapshots[0]
+        return snapshots[0]
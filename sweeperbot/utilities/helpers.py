@@ -1,13 +1,15 @@
 import asyncio
+import configparser
 import datetime
 import re
 import sys
 
 import discord
 import redis
+import redis.asyncio
 from discord.ext import commands
 from sentry_sdk import configure_scope
-from sqlalchemy import desc
+from sqlalchemy import desc, select
 from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import aliased
 from sqlalchemy.sql import func
@@ -15,6 +17,7 @@ from sqlalchemy.sql.expression import literal_column
 
 from sweeperbot.cogs.utils.timer import Timer
 from sweeperbot.db import models
+from sweeperbot.utilities.circuit_breaker import CircuitBreaker
 
 
 class Helpers:
@@ -23,13 +26,38 @@ class Helpers:
         redis_host = self.bot.botconfig.get("Redis", "HOST")
         redis_password = self.bot.botconfig.get("Redis", "PASSWORD")
         redis_database = self.bot.botconfig.get("Redis", "DATABASE")
+        # Redis is called from the event loop, so a hung server mustn't block it for long
+        try:
+            redis_timeout = float(self.bot.botconfig.get("Redis", "SOCKET_TIMEOUT"))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            redis_timeout = 0.5
         self.redis = redis.Redis(
             host=redis_host,
             port=6379,
             db=redis_database,
             decode_responses=True,
             password=redis_password,
+            socket_timeout=redis_timeout,
+            socket_connect_timeout=redis_timeout,
+        )
+        # The same Redis for the AntiSpam components that call it for every message, awaited so the loop keeps running
+        self.async_redis = redis.asyncio.Redis(
+            host=redis_host,
+            port=6379,
+            db=redis_database,
+            decode_responses=True,
+            password=redis_password,
+            socket_timeout=redis_timeout,
+            socket_connect_timeout=redis_timeout,
         )
+        # Shared by the AntiSpam components that call Redis for every message, so they skip it while it's down
+        try:
+            breaker_cooldown = float(
+                self.bot.botconfig.get("Redis", "BREAKER_COOLDOWN")
+            )
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            breaker_cooldown = 30.0
+        self.redis_breaker = CircuitBreaker(breaker_cooldown)
 
     async def get_member_or_user(self, input_str: str, guild: discord.Guild = None):
         # Let's clean the input first (could be an ID or a mention)
@@ -339,34 +367,25 @@ class Helpers:
             self.bot.log.exception(f"Error getting session. Error: {err}")
             return None
 
-    def get_all_guild_settings(self):
-        session = self.get_db_session()
-        try:
-            self.bot.log.info(f"Getting all guild settings")
-            # Get all guild settings where the bot is in that guild
-            guild_settings = session.query(models.ServerSetting).filter().all()
+    async def run_db(self, fn, *args, db_config="Database"):
+        """Runs fn(session, *args) on the database thread pool and returns its result.
 
-            all_settings = {}
-            # TO DO - This could probably be combined with above query using a join
-            if guild_settings:
-                for guild in guild_settings:
-                    guild_id = (
-                        session.query(models.Server)
-                        .filter(models.Server.id == guild.server_id)
-                        .first()
-                    ).discord_id
-
-                    all_settings[guild_id] = guild
-
-            self.bot.guild_settings = all_settings
-            self.bot.log.info(f"Done getting all guild settings")
-        except Exception as err:
-            self.bot.log.exception(
-                f"Error getting all guild settings. {sys.exc_info()[0].__name__}: {err}"
-            )
-            session.rollback()
-        finally:
-            session.close()
+        The session is committed if fn returns, rolled back if it raises, and closed either way, so callers don't
+        need their own try/except/finally around it. Any exception from fn is re-raised to the caller."""
+
+        def call():
+            session = self.bot.database.get_session(db_config)
+            try:
+                result = fn(session, *args)
+                session.commit()
+                return result
+            except Exception:
+                session.rollback()
+                raise
+            finally:
+                session.close()
+
+        return await self.bot.database.executor.run(call)
 
     def db_get_cooldown_settings(self):
         session = self.get_db_session()
@@ -464,6 +483,7 @@ class Helpers:
                 session.add(db_user)
                 session.commit()
                 self.bot.log.debug(f"Added new user to DB: {discord_id}")
+            self.bot.identity_cache.put(models.User, discord_id, db_user.id)
             return db_user
         except Exception as err:
             self.bot.log.exception(
@@ -484,12 +504,39 @@ class Helpers:
                     f"No guild in DB found for {discord_id} - creating a new record"
                 )
                 db_guild = await self.bot.helpers.db_add_new_guild(session, discord_id)
+            self.bot.identity_cache.put(models.Server, discord_id, db_guild.id)
             return db_guild
         except Exception as err:
             self.bot.log.exception(
                 f"Error getting / adding guild to database: '{discord_id}'. {sys.exc_info()[0].__name__}: {err}"
             )
 
+    async def db_get_user_id(self, discord_id):
+        """Returns the database ID for the user, served from the identity cache when possible.
+
+        A miss creates the user if needed, on the database thread pool. Errors are raised to the caller."""
+        db_user_id = self.bot.identity_cache.cached(models.User, discord_id)
+        if db_user_id is None:
+            db_user_id = await self.run_db(
+                lambda session: self.bot.identity_cache.user_id(
+                    discord_id, session=session
+                )
+            )
+        return db_user_id
+
+    async def db_get_guild_id(self, discord_id, guild=None):
+        """Returns the database ID for the guild, served from the identity cache when possible.
+
+        A miss creates the guild if needed, on the database thread pool. Errors are raised to the caller."""
+        db_guild_id = self.bot.identity_cache.cached(models.Server, discord_id)
+        if db_guild_id is None:
+            db_guild_id = await self.run_db(
+                lambda session: self.bot.identity_cache.server_id(
+                    discord_id, guild.name if guild else None, session=session
+                )
+            )
+        return db_guild_id
+
     async def get_action_history(self, session, user, guild):
         try:
             # Creates an alias to the User table specifically to be used for the user.
@@ -683,13 +730,15 @@ class Helpers:
             raise
 
     async def db_process_admin_relationship(self, member, session, server_admin):
-        # Get the DB profile for the guild
-        db_guild = await self.bot.helpers.db_get_guild(session, member.guild.id)
-        # Get the DB profile for the user
-        db_user = await self.bot.helpers.db_get_user(session, member.id)
+        # Get the DB ID for the guild
+        db_guild_id = await self.bot.helpers.db_get_guild_id(member.guild.id)
+        # Get the DB ID for the user
+        db_user_id = await self.bot.helpers.db_get_user_id(member.id)
         # If server_admin is true, then we need to add a relationship
         if server_admin:
-            db_serveradminrels = models.ServerAdminRels(user=db_user, server=db_guild)
+            db_serveradminrels = models.ServerAdminRels(
+                user_id=db_user_id, server_id=db_guild_id
+            )
             session.add(db_serveradminrels)
             self.bot.log.debug(
                 f"Server Admin Relationship Added to database: Guild: {member.guild.id}, User: {member.id}"
@@ -697,21 +746,23 @@ class Helpers:
         # Otherwise if it's false we need to remove the relationship
         else:
             session.query(models.ServerAdminRels).filter(
-                models.ServerAdminRels.server_id == db_guild.id,
-                models.ServerAdminRels.user_id == db_user.id,
+                models.ServerAdminRels.server_id == db_guild_id,
+                models.ServerAdminRels.user_id == db_user_id,
             ).delete(synchronize_session=False)
             self.bot.log.debug(
                 f"Removed admin relationship for: Guild: {member.guild.id}, User: {member.id}"
             )
 
     async def db_process_mod_relationship(self, member, session, server_mod):
-        # Get the DB profile for the guild
-        db_guild = await self.bot.helpers.db_get_guild(session, member.guild.id)
-        # Get the DB profile for the user
-        db_user = await self.bot.helpers.db_get_user(session, member.id)
+        # Get the DB ID for the guild
+        db_guild_id = await self.bot.helpers.db_get_guild_id(member.guild.id)
+        # Get the DB ID for the user
+        db_user_id = await self.bot.helpers.db_get_user_id(member.id)
         # If server_mod is true, then we need to add a relationship
         if server_mod:
-            db_serverrels = models.ServerModRels(user=db_user, server=db_guild)
+            db_serverrels = models.ServerModRels(
+                user_id=db_user_id, server_id=db_guild_id
+            )
             session.add(db_serverrels)
             self.bot.log.debug(
                 f"Server Mod Relationship Added to database: Guild: {member.guild.id}, User: {member.id}"
@@ -719,27 +770,28 @@ class Helpers:
         # Otherwise if it's false we need to remove the relationship
         else:
             session.query(models.ServerModRels).filter(
-                models.ServerModRels.server_id == db_guild.id,
-                models.ServerModRels.user_id == db_user.id,
+                models.ServerModRels.server_id == db_guild_id,
+                models.ServerModRels.user_id == db_user_id,
             ).delete(synchronize_session=False)
             self.bot.log.debug(
                 f"Removed mod relationship for: Guild: {member.guild.id}, User: {member.id}"
             )
 
     async def check_if_blacklisted(self, user_id: int, guild_id: int):
-        session = self.bot.helpers.get_db_session()
         try:
             # Get the DB ID for the user
-            db_user = await self.bot.helpers.db_get_user(session, user_id)
+            db_user_id = await self.bot.helpers.db_get_user_id(user_id)
             # Get the DB ID for the guild
-            db_guild = await self.bot.helpers.db_get_guild(session, guild_id)
+            db_guild_id = await self.bot.helpers.db_get_guild_id(guild_id)
             # Check if user is blacklisted
-            user_status = (
-                session.query(models.Blacklist)
-                .filter(models.Blacklist.server_id == db_guild.id)
-                .filter(models.Blacklist.user_id == db_user.id)
-                .first()
-            )
+            async with self.bot.database.session() as session:
+                result = await session.execute(
+                    select(models.Blacklist.user_id, models.Blacklist.blacklisted)
+                    .where(models.Blacklist.server_id == db_guild_id)
+                    .where(models.Blacklist.user_id == db_user_id)
+                    .limit(1)
+                )
+                user_status = result.first()
 
             self.bot.log.debug(
                 f"Blacklist for DiscoID: {user_id}: DBID: {user_status.user_id if user_status else None} | BLStatus: {user_status.blacklisted if user_status else None}"
@@ -755,7 +807,6 @@ class Helpers:
             self.bot.log.exception(
                 f"Error processing database query for getting blacklist info. {sys.exc_info()[0].__name__}: {err}"
             )
-            session.rollback()
             self.bot.log.debug(f"Blacklist for {user_id} - using default: Allowed")
             return False
         except Exception as err:
@@ -764,70 +815,58 @@ class Helpers:
             )
             self.bot.log.debug(f"Blacklist for {user_id} - using default: Allowed")
             return False
-        finally:
-            session.close()
 
     async def load_reminders(self):
-        session = self.bot.helpers.get_db_session()
-        try:
-            reminders = (
-                session.query(
-                    func.coalesce(
-                        models.Reminder.updated, models.Reminder.created
-                    ).label("created"),
-                    models.Reminder.id,
-                    models.Reminder.creator_user_id,
-                    models.User,
-                    models.Server,
-                    models.Reminder.expires,
-                    models.Reminder.text,
-                )
-                .join(models.Server, models.Server.id == models.Reminder.server_id)
-                .join(models.User, models.User.id == models.Reminder.remind_user_id)
-                .filter(
-                    models.Reminder.expires
-                    > datetime.datetime.now(datetime.timezone.utc)
-                )
-                .all()
-            )
-
-            counter = 0
-            temp_guild_list = [tmp_guild.id for tmp_guild in self.bot.guilds]
-            for item in reminders:
-                # Filter out reminders where the bot isn't in them
-                if item.Server.discord_id in temp_guild_list:
-                    counter += 1
-                    # Add timer to send the reminder
-                    timer = Timer.temporary(
-                        item.Server.discord_id,
-                        item.User.discord_id,
-                        item.creator_user_id,
-                        item.text,
-                        event=self._remind,
-                        expires=item.expires,
-                        created=item.created,
-                    )
-                    timer.start(self.bot.loop)
-
-            # Log number of reminders loaded
-            self.bot.log.info(f"Loaded {counter} reminders")
-
-        except DBAPIError as err:
-            self.bot.log.exception(
-                f"Error processing database query loading reminders. {sys.exc_info()[0].__name__}: {err}"
-            )
-            session.rollback()
-        except Exception as err:
-            self.bot.log.exception(
-                f"Error loading reminders. {sys.exc_info()[0].__name__}: {err}"
-            )
-        finally:
-            session.close()
+        # Only reminders expiring within the timer window are loaded, see TimerWindow
+        self.bot.timer_window.register(
+            "reminders", self.db_get_reminders, self.arm_reminder
+        )
+        counter = await self.bot.timer_window.refill("reminders")
+        # Log number of reminders loaded
+        self.bot.log.info(f"Loaded {counter} reminders")
+
+    @staticmethod
+    def db_get_reminders(session, after, until):
+        """Gets the reminders expiring in (after, until], with only the columns their timers need"""
+        return (
+            session.query(
+                func.coalesce(models.Reminder.updated, models.Reminder.created).label(
+                    "created"
+                ),
+                models.Reminder.id,
+                models.Reminder.creator_user_id,
+                models.Server.discord_id.label("guild_id"),
+                models.User.discord_id.label("user_id"),
+                models.Reminder.expires,
+                models.Reminder.text,
+            )
+            .join(models.Server, models.Server.id == models.Reminder.server_id)
+            .join(models.User, models.User.id == models.Reminder.remind_user_id)
+            .filter(models.Reminder.expires > after)
+            .filter(models.Reminder.expires <= until)
+            .all()
+        )
 
-    def _remind(
-        self, guild_id: int, remind_user_id: int, creator_user_id: int, remind_text: str
-    ):
+    def arm_reminder(self, item):
+        # Filter out reminders where the bot isn't in them
+        if not self.bot.get_guild(item.guild_id):
+            return
+        # Add timer to send the reminder
+        timer = Timer.temporary(
+            item.guild_id,
+            item.user_id,
+            item.creator_user_id,
+            item.text,
+            event=self._remind,
+            async_event=self.remind,
+            expires=item.expires,
+            created=item.created,
+            key=("reminder", item.id),
+        )
+        timer.start(self.bot.scheduler)
 
+    def _remind_member(self, guild_id: int, remind_user_id: int):
+        """Returns the member to remind, raising ValueError if the bot can't find them anymore"""
         try:
             guild = self.bot.get_guild(guild_id)
             if not guild:
@@ -837,10 +876,29 @@ class Helpers:
                 raise ValueError(
                     f"Bot can't find member {remind_user_id} in guild {guild} ({guild.id})"
                 )
-            creator_user = self.bot.get_user(creator_user_id)
         except ValueError:
             self.bot.log.exception(f"Can't execute reminder")
             raise
+        return member
+
+    def _remind(
+        self, guild_id: int, remind_user_id: int, creator_user_id: int, remind_text: str
+    ):
+        """Timer event for a due reminder, runs remind in a task. The member is looked up first so a ValueError still
+        reaches the Scheduler"""
+        self._remind_member(guild_id, remind_user_id)
+        self.bot.loop.create_task(
+            self.remind(guild_id, remind_user_id, creator_user_id, remind_text)
+        )
+
+    async def remind(
+        self, guild_id: int, remind_user_id: int, creator_user_id: int, remind_text: str
+    ):
+        """Sends the reminder to the member. Returns False if it couldn't be sent, and raises ValueError if the guild
+        or member is gone"""
+        member = self._remind_member(guild_id, remind_user_id)
+        guild = member.guild
+        creator_user = self.bot.get_user(creator_user_id)
 
         settings = self.bot.guild_settings.get(member.guild.id)
         has_modmail_server = settings.modmail_server_id
@@ -852,10 +910,8 @@ class Helpers:
         )
 
         try:
-            self.bot.loop.create_task(
-                member.send(
-                    f"Here is the reminder requested by **{creator_user}** from the **{guild}** server.\n\n'{remind_text}'{footer_text}"
-                )
+            await member.send(
+                f"Here is the reminder requested by **{creator_user}** from the **{guild}** server.\n\n'{remind_text}'{footer_text}"
             )
 
             self.bot.log.info(
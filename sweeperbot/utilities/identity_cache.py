@@ -0,0 +1,164 @@
+import configparser
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DBAPIError
+
+from sweeperbot.db import models
+
+
+class IdentityCache:
+    """Maps Discord snowflakes to the primary keys of their User / Server rows.
+
+    Lookups are served from a bounded LRU with a TTL per entry. Misses are resolved in one round trip with an
+    INSERT ... ON CONFLICT DO UPDATE ... RETURNING, which creates any missing rows and returns the primary key for
+    existing ones. The cache can be used from the event loop and from executor threads."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        # Set the max number of entries held per table
+        try:
+            self.max_size = int(self.bot.botconfig.get("IdentityCache", "MAX_SIZE"))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.max_size = 100000
+        # Set how long, in seconds, an entry is trusted before being looked up again
+        try:
+            self.ttl = float(self.bot.botconfig.get("IdentityCache", "TTL"))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.ttl = 3600
+
+        self._lock = threading.Lock()
+        self._entries = {models.User: OrderedDict(), models.Server: OrderedDict()}
+        self.stats = {
+            "user_hits": 0,
+            "user_misses": 0,
+            "server_hits": 0,
+            "server_misses": 0,
+            "evictions": 0,
+            "upserts": 0,
+        }
+
+    def _stat_prefix(self, model):
+        return "user" if model is models.User else "server"
+
+    def _get(self, model, discord_id, now):
+        """Returns the cached primary key or None. Caller must hold the lock."""
+        entries = self._entries[model]
+        entry = entries.get(discord_id)
+        if entry is None:
+            return None
+        pk, expires = entry
+        if expires < now:
+            del entries[discord_id]
+            return None
+        entries.move_to_end(discord_id)
+        return pk
+
+    def put(self, model, discord_id, pk):
+        """Adds a discord id to primary key mapping, evicting the least recently used entry if full"""
+        with self._lock:
+            self._put(model, discord_id, pk, time.monotonic())
+
+    def _put(self, model, discord_id, pk, now):
+        entries = self._entries[model]
+        entries[discord_id] = (pk, now + self.ttl)
+        entries.move_to_end(discord_id)
+        while len(entries) > self.max_size:
+            entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def cached(self, model, discord_id):
+        """Returns the cached primary key for the discord id, or None without touching the database"""
+        with self._lock:
+            pk = self._get(model, discord_id, time.monotonic())
+            if pk is not None:
+                self.stats[f"{self._stat_prefix(model)}_hits"] += 1
+            return pk
+
+    def invalidate(self, model, discord_id):
+        with self._lock:
+            self._entries[model].pop(discord_id, None)
+
+    def resolve_many(self, model, discord_ids, session=None):
+        """Returns a dict of discord id to primary key, creating any rows that don't exist yet.
+
+        discord_ids is a dict of discord id to a dict of extra column values used only when inserting a new row,
+        e.g. {guild.id: {"name": guild.name}}. An iterable of ids is also accepted. Misses are resolved on session if
+        one is given, which the caller then commits, otherwise on a session of its own. This blocks, so from the
+        event loop use it through Helpers.run_db."""
+        if not isinstance(discord_ids, dict):
+            discord_ids = {discord_id: {} for discord_id in discord_ids}
+        prefix = self._stat_prefix(model)
+        results = {}
+        missing = []
+        now = time.monotonic()
+        with self._lock:
+            for discord_id in discord_ids:
+                pk = self._get(model, discord_id, now)
+                if pk is None:
+                    missing.append(discord_id)
+                else:
+                    results[discord_id] = pk
+            self.stats[f"{prefix}_hits"] += len(results)
+            self.stats[f"{prefix}_misses"] += len(missing)
+
+        if not missing:
+            return results
+
+        # Sorted so concurrent batches lock rows in the same order
+        missing.sort()
+        stmt = insert(model).values(
+            [{"discord_id": discord_id, **discord_ids[discord_id]} for discord_id in missing]
+        )
+        # The no-op update makes existing rows show up in RETURNING, so one statement covers both cases
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[model.discord_id],
+            set_={"discord_id": stmt.excluded.discord_id},
+        ).returning(model.discord_id, model.id)
+
+        own_session = session is None
+        if own_session:
+            session = self.bot.helpers.get_db_session()
+        try:
+            rows = session.execute(stmt).fetchall()
+            if own_session:
+                session.commit()
+        except DBAPIError as err:
+            self.bot.log.exception(
+                f"IdentityCache: Error resolving {len(missing)} {model.__tablename__} ids. {sys.exc_info()[0].__name__}: {err}"
+            )
+            if own_session:
+                session.rollback()
+            raise
+        finally:
+            if own_session:
+                session.close()
+
+        now = time.monotonic()
+        with self._lock:
+            self.stats["upserts"] += 1
+            for discord_id, pk in rows:
+                results[discord_id] = pk
+                self._put(model, discord_id, pk, now)
+        return results
+
+    def user_id(self, discord_id, session=None):
+        """Returns the primary key of the User row for the discord id"""
+        return self.resolve_many(models.User, (discord_id,), session)[discord_id]
+
+    def server_id(self, discord_id, name=None, session=None):
+        """Returns the primary key of the Server row for the discord id"""
+        extra = {"name": name} if name else {}
+        return self.resolve_many(models.Server, {discord_id: extra}, session)[
+            discord_id
+        ]
+
+    def sizes(self):
+        with self._lock:
+            return {
+                "users_cached": len(self._entries[models.User]),
+                "servers_cached": len(self._entries[models.Server]),
+            }
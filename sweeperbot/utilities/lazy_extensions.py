@@ -0,0 +1,209 @@
+import ast
+import asyncio
+import configparser
+import importlib.util
+import sys
+import time
+
+from discord.ext import commands
+
+from sweeperbot.utilities.boot_profiler import imported_since
+
+
+def dotted_name(node):
+    """Returns the dotted name of a Name or Attribute node, e.g. "commands.Cog.listener", or None"""
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    return ".".join(reversed(parts))
+
+
+def read_manifest(path):
+    """Reads the top level commands and the listeners of an extension from its source, without importing it.
+
+    Returns (commands, listeners). Each command is a dict of name, aliases, help and hidden, and each listener is the
+    name of the event it listens to."""
+    with open(path, encoding="utf-8") as source:
+        tree = ast.parse(source.read(), path)
+
+    found_commands = []
+    listeners = []
+    for cls in tree.body:
+        if not isinstance(cls, ast.ClassDef):
+            continue
+        for func in cls.body:
+            if not isinstance(func, ast.AsyncFunctionDef):
+                continue
+            for decorator in func.decorator_list:
+                if not isinstance(decorator, ast.Call):
+                    continue
+                target = dotted_name(decorator.func)
+                kwargs = {}
+                for keyword in decorator.keywords:
+                    try:
+                        kwargs[keyword.arg] = ast.literal_eval(keyword.value)
+                    except (ValueError, TypeError, SyntaxError):
+                        # Not a literal, e.g. cls=SomeGroup
+                        continue
+                # Subcommands, e.g. @metrics.command, are registered by their group once it's loaded
+                if target in ("commands.command", "commands.group"):
+                    found_commands.append(
+                        {
+                            "name": kwargs.get("name") or func.name,
+                            "aliases": list(kwargs.get("aliases") or []),
+                            "help": ast.get_docstring(func),
+                            "hidden": bool(kwargs.get("hidden")),
+                        }
+                    )
+                elif target == "commands.Cog.listener":
+                    name = kwargs.get("name")
+                    if decorator.args and isinstance(decorator.args[0], ast.Constant):
+                        name = decorator.args[0].value
+                    listeners.append(name or func.name)
+    return found_commands, listeners
+
+
+class LazyExtensions:
+    """Loads the extensions listed in [LazyExtensions] EXTENSIONS on first use instead of at startup.
+
+    Rather than importing a lazy extension, its source is parsed for its commands and listeners. Each command gets a
+    stub with the same name, aliases and help, and each event a trigger listener. The first time a stub is invoked or
+    a trigger fires, the stubs are removed, the extension is loaded, and the command is invoked again or the event
+    passed to the cog's own listeners. How long each load took and what it imported is kept in loaded."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        try:
+            self.extensions = {
+                name.strip()
+                for name in self.bot.botconfig.get(
+                    "LazyExtensions", "EXTENSIONS"
+                ).split(",")
+                if name.strip()
+            }
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.extensions = set()
+
+        # extension: {"commands": [Command], "listeners": [(trigger, event)]}
+        self.stubs = {}
+        # extension: how it was loaded
+        self.loaded = {}
+        self._locks = {}
+
+    def is_lazy(self, name):
+        return name in self.extensions
+
+    def stub(self, name):
+        """Registers the stubs of an extension. Returns False if its source can't be read, so it should be loaded now"""
+        try:
+            spec = importlib.util.find_spec(name)
+            found_commands, listeners = read_manifest(spec.origin)
+        except Exception as err:
+            self.bot.log.warning(
+                f"LazyExtensions: Unable to read {name}, loading it now. {sys.exc_info()[0].__name__}: {err}"
+            )
+            return False
+
+        stubs = {"commands": [], "listeners": []}
+        for found in found_commands:
+            command = commands.Command(
+                self._make_stub(name),
+                name=found["name"],
+                aliases=found["aliases"],
+                help=found["help"],
+                hidden=found["hidden"],
+            )
+            self.bot.add_command(command)
+            stubs["commands"].append(command)
+        for event in sorted(set(listeners)):
+            trigger = self._make_trigger(name, event)
+            self.bot.add_listener(trigger, event)
+            stubs["listeners"].append((trigger, event))
+
+        self.stubs[name] = stubs
+        self.bot.log.debug(
+            f"LazyExtensions: Stubbed {name} with {len(stubs['commands'])} commands and {len(stubs['listeners'])} listeners"
+        )
+        return True
+
+    def _make_stub(self, name):
+        async def stub(ctx):
+            await self.load(name, f"command:{ctx.invoked_with}")
+            # Run the real command for the message that triggered the load
+            real_ctx = await self.bot.get_context(ctx.message)
+            if real_ctx.command and real_ctx.command.cog_name:
+                await self.bot.invoke(real_ctx)
+
+        return stub
+
+    def _make_trigger(self, name, event):
+        async def trigger(*args):
+            await self.load(name, f"event:{event}")
+            # The event that triggered the load went out before the cog's listeners existed, so pass it on to them
+            for cog in self.cogs(name):
+                for listener_name, listener in cog.get_listeners():
+                    if listener_name == event:
+                        await listener(*args)
+
+        return trigger
+
+    def unstub(self, name):
+        """Removes the stubs of an extension, if it has any"""
+        stubs = self.stubs.pop(name, None)
+        if not stubs:
+            return
+        for command in stubs["commands"]:
+            self.bot.remove_command(command.name)
+        for trigger, event in stubs["listeners"]:
+            self.bot.remove_listener(trigger, event)
+
+    def cogs(self, name):
+        return [cog for cog in self.bot.cogs.values() if cog.__module__ == name]
+
+    async def load(self, name, trigger):
+        """Loads a stubbed extension, once, even if several stubs trigger at the same time"""
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            if name in self.bot.extensions:
+                return
+            modules_before = set(sys.modules)
+            started = time.perf_counter()
+            self.unstub(name)
+            try:
+                self.bot.load_extension(name)
+            except Exception as err:
+                self.bot.log.exception(
+                    f"LazyExtensions: Failed to load {name} for {trigger}. {sys.exc_info()[0].__name__}: {err}"
+                )
+                # Put the stubs back so the next use tries again
+                self.stub(name)
+                raise
+            modules, imported = imported_since(modules_before)
+            self.loaded[name] = {
+                "trigger": trigger,
+                "ms": (time.perf_counter() - started) * 1000,
+                "modules": modules,
+                "imported": imported,
+            }
+            self.bot.log.info(
+                f"LazyExtensions: Loaded {name} for {trigger} in {self.loaded[name]['ms']:0.1f}ms, "
+                f"importing {modules} modules"
+            )
+
+    def snapshot(self):
+        stats = {}
+        for name in sorted(self.extensions):
+            loaded = self.loaded.get(name)
+            if loaded:
+                stats[name] = (
+                    f"{loaded['ms']:0.1f}ms {loaded['modules']} modules via {loaded['trigger']}"
+                )
+            elif name in self.stubs:
+                stats[name] = "not loaded yet"
+            else:
+                stats[name] = "loaded at startup" if name in self.bot.extensions else "not loaded"
+        return stats
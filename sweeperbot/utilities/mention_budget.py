@@ -0,0 +1,86 @@
+import configparser
+import time
+from collections import OrderedDict, deque
+
+
+def count_mentions(message):
+    """Counts the distinct users and roles a message mentions, from the raw IDs so no members need resolving"""
+    user_ids = set(message.raw_mentions)
+    user_ids.discard(message.author.id)
+    return len(user_ids) + len(set(message.raw_role_mentions))
+
+
+class UserMentions:
+    """The mentions one user sent recently, as (time, count) oldest first, and their total"""
+
+    __slots__ = ("sent", "total")
+
+    def __init__(self):
+        self.sent = deque()
+        self.total = 0
+
+
+class MentionBudget:
+    """Limits how many users and roles a user can mention, in one message and over a rolling window.
+
+    Only the most recent users are tracked, in an LRU, so memory stays bounded."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        # Max mentions in a single message
+        try:
+            self.max_per_message = int(
+                self.bot.botconfig.get("MassMentions", "MAX_PER_MESSAGE")
+            )
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.max_per_message = 8
+        # Max mentions across all of a user's messages within the window
+        try:
+            self.max_per_window = int(
+                self.bot.botconfig.get("MassMentions", "MAX_PER_WINDOW")
+            )
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.max_per_window = 15
+        try:
+            self.window = float(self.bot.botconfig.get("MassMentions", "WINDOW"))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.window = 60.0
+        try:
+            self.max_users = int(self.bot.botconfig.get("MassMentions", "MAX_USERS"))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.max_users = 10000
+
+        # (guild_id, user_id): UserMentions, least recently active first
+        self.users = OrderedDict()
+        self.stats = {"messages": 0, "mentions": 0, "over_message": 0, "over_window": 0}
+
+    def spend(self, guild_id, user_id, mentions, now=None):
+        """Spends mentions from the user's budget. Returns True if they went over it"""
+        self.stats["messages"] += 1
+        if not mentions:
+            return False
+        self.stats["mentions"] += mentions
+        if mentions > self.max_per_message:
+            self.stats["over_message"] += 1
+            return True
+        if now is None:
+            now = time.monotonic()
+
+        key = (guild_id, user_id)
+        user = self.users.get(key)
+        if user is None:
+            user = self.users[key] = UserMentions()
+            if len(self.users) > self.max_users:
+                self.users.popitem(last=False)
+        else:
+            self.users.move_to_end(key)
+        # Refund the mentions that left the window
+        cutoff = now - self.window
+        while user.sent and user.sent[0][0] <= cutoff:
+            user.total -= user.sent.popleft()[1]
+        user.sent.append((now, mentions))
+        user.total += mentions
+        if user.total > self.max_per_window:
+            self.stats["over_window"] += 1
+            return True
+        return False
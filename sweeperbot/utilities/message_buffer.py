@@ -0,0 +1,184 @@
+import asyncio
+import configparser
+import sys
+import time
+from collections import deque
+from datetime import timezone
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DBAPIError
+
+from sweeperbot.db import models
+from sweeperbot.db.instrumentation import query_origin
+
+
+class MessageBuffer:
+    """Collects guild messages in memory and writes them to the database in bulk.
+
+    Messages are flushed once FLUSH_SIZE rows are pending or every FLUSH_INTERVAL seconds, whichever comes first.
+    The write itself runs on the database thread pool so the event loop is never blocked on the database. If the database falls
+    behind and MAX_PENDING rows are waiting, producers wait on the in-flight flush and the oldest rows are dropped
+    once the buffer is still full afterwards, so memory stays bounded."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        # Set how many rows trigger a flush
+        try:
+            self.flush_size = int(self.bot.botconfig.get("MessageLog", "FLUSH_SIZE"))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.flush_size = 500
+        # Set how often, in seconds, pending rows are flushed regardless of size
+        try:
+            self.flush_interval = float(
+                self.bot.botconfig.get("MessageLog", "FLUSH_INTERVAL")
+            )
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.flush_interval = 5
+        # Set the max number of rows held in memory before applying backpressure
+        try:
+            self.max_pending = int(self.bot.botconfig.get("MessageLog", "MAX_PENDING"))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.max_pending = 20000
+
+        self.pending = deque()
+        self._flush_lock = asyncio.Lock()
+        # After a failed flush, hold off size triggered flushes until the next interval so a down database isn't hammered
+        self._retry_after = 0
+        self.stats = {
+            "queued": 0,
+            "written": 0,
+            "dropped": 0,
+            "flushes": 0,
+            "failed_flushes": 0,
+            "backpressure_waits": 0,
+            "last_flush_rows": 0,
+            "last_flush_ms": 0.0,
+        }
+
+    async def add(self, msg):
+        """Queues a guild message to be logged to the database"""
+        if len(self.pending) >= self.max_pending:
+            # The database is falling behind, wait for a flush to drain the buffer before accepting more
+            if time.monotonic() >= self._retry_after:
+                self.stats["backpressure_waits"] += 1
+                await self.flush()
+            # If the buffer is still full the flush failed, drop the oldest row to keep memory bounded
+            if len(self.pending) >= self.max_pending:
+                self.pending.popleft()
+                self.stats["dropped"] += 1
+
+        self.pending.append(
+            {
+                "user_discord_id": msg.author.id,
+                "server_discord_id": msg.guild.id,
+                "server_name": msg.guild.name,
+                "message_id": msg.id,
+                "message_body": msg.content,
+                "channel_id": msg.channel.id,
+                "channel_name": msg.channel.name,
+                "created": msg.created_at.replace(tzinfo=timezone.utc),
+            }
+        )
+        self.stats["queued"] += 1
+
+        # Start a flush in the background once enough rows are waiting, unless one is already running
+        if (
+            len(self.pending) >= self.flush_size
+            and not self._flush_lock.locked()
+            and time.monotonic() >= self._retry_after
+        ):
+            self.bot.loop.create_task(self.flush())
+
+    async def flush(self):
+        """Writes all pending rows to the database in batches of flush_size"""
+        async with self._flush_lock:
+            while self.pending:
+                batch = [
+                    self.pending.popleft()
+                    for _ in range(min(self.flush_size, len(self.pending)))
+                ]
+                started = time.perf_counter()
+                try:
+                    await self.bot.database.executor.run(self._write_rows, batch)
+                except Exception as err:
+                    self.stats["failed_flushes"] += 1
+                    self._retry_after = time.monotonic() + self.flush_interval
+                    self.bot.log.exception(
+                        f"MessageBuffer: Error writing {len(batch)} messages to database. {sys.exc_info()[0].__name__}: {err}"
+                    )
+                    # Put the rows back at the front so they are retried on the next flush, as long as there is room
+                    room = max(self.max_pending - len(self.pending), 0)
+                    self.stats["dropped"] += max(len(batch) - room, 0)
+                    self.pending.extendleft(reversed(batch[:room]))
+                    return
+                self.stats["flushes"] += 1
+                self.stats["written"] += len(batch)
+                self.stats["last_flush_rows"] = len(batch)
+                self.stats["last_flush_ms"] = (time.perf_counter() - started) * 1000
+                self.bot.log.debug(
+                    f"MessageBuffer: Flushed {len(batch)} messages in {self.stats['last_flush_ms']:0.2f}ms"
+                )
+
+    def _write_rows(self, rows):
+        """Inserts a batch of rows using a single multi-row INSERT. Runs on the database thread pool.
+
+        Missing users and servers are created in the same transaction as the messages."""
+        session = self.bot.helpers.get_db_session()
+        try:
+            user_ids = self.bot.identity_cache.resolve_many(
+                models.User,
+                {row["user_discord_id"]: {} for row in rows},
+                session=session,
+            )
+            server_ids = self.bot.identity_cache.resolve_many(
+                models.Server,
+                {
+                    row["server_discord_id"]: {"name": row["server_name"]}
+                    for row in rows
+                },
+                session=session,
+            )
+            values = [
+                {
+                    "user_id": user_ids[row["user_discord_id"]],
+                    "server_id": server_ids[row["server_discord_id"]],
+                    "message_id": row["message_id"],
+                    "message_body": row["message_body"],
+                    "channel_id": row["channel_id"],
+                    "channel_name": row["channel_name"],
+                    "created": row["created"],
+                }
+                for row in rows
+            ]
+            # Duplicate messages aren't useful to log, so let the database skip them
+            session.execute(
+                insert(models.Message)
+                .values(values)
+                .on_conflict_do_nothing(index_elements=["message_id"])
+            )
+            session.commit()
+        except DBAPIError:
+            session.rollback()
+            # Rows created for this batch were rolled back too, so their ids mustn't stay cached
+            for row in rows:
+                self.bot.identity_cache.invalidate(models.User, row["user_discord_id"])
+                self.bot.identity_cache.invalidate(
+                    models.Server, row["server_discord_id"]
+                )
+            raise
+        finally:
+            session.close()
+
+    async def run(self):
+        """Flushes pending rows on a fixed interval"""
+        query_origin.set("task:message_buffer")
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def close(self):
+        """Flushes anything left in the buffer, used when the bot is shutting down"""
+        self.bot.log.info(
+            f"MessageBuffer: Flushing {len(self.pending)} pending messages before closing"
+        )
+        await self.flush()
@@ -31,16 +31,16 @@ class ModMail(commands.Cog):
         )
         session = self.bot.helpers.get_db_session()
         try:
-            # Get guild settings based on the bot ID
+            # Get guild settings based on the bot ID, from the settings already loaded for every guild
             # Theoretically there should only be one mod mail server per bot, if there is more than one, we're fucked.
-            guild_settings = (
-                session.query(models.ServerSetting)
-                .join(models.Server)
-                .filter(
-                    models.ServerSetting.bot_id == self.bot.user.id,
-                    models.ServerSetting.modmail_server_id is not None,
-                )
-                .first()
+            guild_settings = next(
+                (
+                    settings
+                    for settings in self.bot.guild_settings.values()
+                    if settings.bot_id == self.bot.user.id
+                    and settings.modmail_server_id is not None
+                ),
+                None,
             )
             if not guild_settings:
                 return
@@ -62,12 +62,7 @@ class ModMail(commands.Cog):
                 .first()
             )
             # Get the main guild
-            guild_id = (
-                session.query(models.Server)
-                .filter(models.Server.id == guild_settings.server_id)
-                .first()
-            ).discord_id
-            self.main_guild = self.bot.get_guild(guild_id)
+            self.main_guild = self.bot.get_guild(guild_settings.discord_id)
 
             # Now that we have most stuff initialized, let's do an inventory of all mod mail channels and purge from the
             # redis cache that doesn't have a matching channel
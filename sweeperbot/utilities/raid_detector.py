@@ -0,0 +1,117 @@
+import configparser
+import re
+import time
+from collections import OrderedDict
+
+# Mentions, custom emoji and numbers are what raid scripts vary between copies of the same message
+VARIABLE_PARTS = re.compile(r"<(?:@[!&]?|#|a?:\w+:)\d+>|\d+")
+ZERO_WIDTH = dict.fromkeys(map(ord, "\u200b\u200c\u200d\u2060\ufeff\u00ad"))
+NON_WORD = re.compile(r"[\W_]+")
+
+
+def fingerprint(content, min_length=0):
+    """Returns a fingerprint of the message content that near identical copies share, or None if it's too short.
+
+    The content is lowercased, stripped of mentions, numbers, punctuation and whitespace, then hashed."""
+    normalized = VARIABLE_PARTS.sub("", content.translate(ZERO_WIDTH).lower())
+    normalized = NON_WORD.sub("", normalized)
+    if not normalized or len(normalized) < min_length:
+        return None
+    return hash(normalized)
+
+
+class Fingerprint:
+    """The distinct authors that recently sent one fingerprint in a guild"""
+
+    __slots__ = ("authors", "flagged_until", "alerted")
+
+    def __init__(self):
+        # author_id: time of their latest message, oldest first
+        self.authors = OrderedDict()
+        self.flagged_until = 0
+        self.alerted = False
+
+
+class RaidDetector:
+    """Detects raids: the same or nearly the same message sent by many different users in a short time.
+
+    Each guild keeps an LRU of recently seen fingerprints, each with the distinct authors that sent it within the
+    window. Recording a message is a dict lookup plus popping authors that left the window, and the authors kept per
+    fingerprint are capped at the threshold, so the cost per message and the memory used are both bounded."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        try:
+            self.enabled = self.bot.botconfig.getboolean("RaidDetection", "ENABLED")
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.enabled = True
+        # Number of distinct users sending the same message within the window before it's a raid
+        try:
+            self.threshold = int(self.bot.botconfig.get("RaidDetection", "THRESHOLD"))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.threshold = 5
+        try:
+            self.window = float(self.bot.botconfig.get("RaidDetection", "WINDOW"))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.window = 30.0
+        # Short messages like "hi" or "lol" are legitimately sent by many users at once, so they're ignored
+        try:
+            self.min_length = int(self.bot.botconfig.get("RaidDetection", "MIN_LENGTH"))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.min_length = 12
+        try:
+            self.max_fingerprints = int(
+                self.bot.botconfig.get("RaidDetection", "MAX_FINGERPRINTS")
+            )
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.max_fingerprints = 2000
+        # Whether messages of a detected raid are deleted, or only reported to the mod channel
+        try:
+            self.delete = self.bot.botconfig.getboolean("RaidDetection", "DELETE")
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.delete = False
+
+        # guild_id: OrderedDict of fingerprint: Fingerprint, least recently seen first
+        self.guilds = {}
+        self.stats = {"messages": 0, "skipped": 0, "raids": 0, "raid_messages": 0}
+
+    def record(self, guild_id, author_id, content, now=None):
+        """Records a message, returning its Fingerprint if it's part of a raid, otherwise None"""
+        self.stats["messages"] += 1
+        key = fingerprint(content, self.min_length)
+        if key is None:
+            self.stats["skipped"] += 1
+            return None
+        if now is None:
+            now = time.monotonic()
+
+        fingerprints = self.guilds.get(guild_id)
+        if fingerprints is None:
+            fingerprints = self.guilds[guild_id] = OrderedDict()
+        entry = fingerprints.get(key)
+        if entry is None:
+            entry = fingerprints[key] = Fingerprint()
+            if len(fingerprints) > self.max_fingerprints:
+                fingerprints.popitem(last=False)
+        else:
+            fingerprints.move_to_end(key)
+
+        authors = entry.authors
+        authors[author_id] = now
+        authors.move_to_end(author_id)
+        # Forget authors that left the window, and keep no more than is needed to reach the threshold
+        cutoff = now - self.window
+        while authors and (
+            len(authors) > self.threshold or next(iter(authors.values())) <= cutoff
+        ):
+            authors.popitem(last=False)
+
+        if len(authors) >= self.threshold or entry.flagged_until > now:
+            if entry.flagged_until <= now:
+                self.stats["raids"] += 1
+                entry.alerted = False
+            # Keep flagging copies until the raid has been quiet for a full window
+            entry.flagged_until = now + self.window
+            self.stats["raid_messages"] += 1
+            return entry
+        return None
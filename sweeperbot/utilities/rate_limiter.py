@@ -0,0 +1,125 @@
+import configparser
+import math
+import time
+from collections import OrderedDict, deque
+
+import redis
+
+# Sliding window log kept in a sorted set of message timestamps. Runs atomically in Redis so every shard and process
+# shares the same window. Returns "0" if the message is allowed, otherwise the seconds until it would be.
+SLIDING_WINDOW_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local rate = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+if redis.call('ZCARD', key) >= rate then
+    local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+    return tostring(tonumber(oldest[2]) + window - now)
+end
+redis.call('ZADD', key, now, ARGV[4])
+redis.call('PEXPIRE', key, math.ceil(window * 1000))
+return '0'
+"""
+
+
+class SlidingWindowLimiter:
+    """Limits how many messages a user can send in a guild within a sliding window, using Redis.
+
+    The window is kept in Redis so it holds across shards, processes and restarts, and every key expires with its
+    window so memory stays bounded. Users who were just limited are remembered locally until their window frees up,
+    so a user who keeps spamming doesn't cost a Redis call per message. The script runs on Helpers.async_redis, so
+    the event loop isn't held up waiting on Redis. If Redis is unavailable, a bounded local window is used instead,
+    and Helpers.redis_breaker keeps it in use for a while so a dead Redis isn't retried on every message."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        # Set the max number of users tracked locally
+        try:
+            self.max_local = int(self.bot.botconfig.get("RateLimiter", "LOCAL_MAX_KEYS"))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.max_local = 10000
+
+        self._script = None
+        # (guild_id, user_id): time the user is limited until
+        self._limited = OrderedDict()
+        # (guild_id, user_id): deque of message times, only used while Redis is unavailable
+        self._local_windows = OrderedDict()
+        self.stats = {
+            "checks": 0,
+            "limited": 0,
+            "local_hits": 0,
+            "redis_calls": 0,
+            "redis_errors": 0,
+        }
+
+    def _remember(self, entries, key, value):
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > self.max_local:
+            entries.popitem(last=False)
+
+    async def hit(self, guild_id, user_id, message_id, rate, window):
+        """Records a message and returns 0 if it's within the limit, otherwise the seconds until the user can send"""
+        self.stats["checks"] += 1
+        key = (guild_id, user_id)
+        now = time.time()
+
+        # Fast path: the user was limited recently and still is
+        limited_until = self._limited.get(key)
+        if limited_until is not None:
+            if limited_until > now:
+                self.stats["local_hits"] += 1
+                self.stats["limited"] += 1
+                return limited_until - now
+            del self._limited[key]
+
+        breaker = self.bot.helpers.redis_breaker
+        if not breaker.allow():
+            retry_after = self._local_hit(key, now, rate, window)
+        else:
+            try:
+                if self._script is None:
+                    self._script = self.bot.helpers.async_redis.register_script(
+                        SLIDING_WINDOW_SCRIPT
+                    )
+                self.stats["redis_calls"] += 1
+                retry_after = float(
+                    await self._script(
+                        keys=[f"antispam:rl:{guild_id}:{user_id}"],
+                        args=[now, float(window), int(rate), message_id],
+                    )
+                )
+                breaker.succeeded()
+            except redis.RedisError as err:
+                breaker.failed()
+                self.stats["redis_errors"] += 1
+                self.bot.log.debug(
+                    f"RateLimiter: Redis error, using the local window. {err.__class__.__name__}: {err}"
+                )
+                retry_after = self._local_hit(key, now, rate, window)
+
+        if retry_after > 0:
+            self.stats["limited"] += 1
+            self._remember(self._limited, key, now + retry_after)
+        return retry_after
+
+    def _local_hit(self, key, now, rate, window):
+        times = self._local_windows.get(key)
+        if times is None:
+            times = deque()
+        while times and times[0] <= now - window:
+            times.popleft()
+        if len(times) >= math.ceil(rate):
+            return times[0] + window - now
+        times.append(now)
+        self._remember(self._local_windows, key, times)
+        return 0.0
+
+    def snapshot(self):
+        return {
+            "limited_users": len(self._limited),
+            "local_windows": len(self._local_windows),
+            **self.stats,
+            "redis_breaker_open": self.bot.helpers.redis_breaker.is_open,
+        }
@@ -0,0 +1,154 @@
+import asyncio
+import configparser
+import heapq
+import itertools
+import sys
+import time
+
+from sweeperbot.db.instrumentation import query_origin
+
+
+class Scheduler:
+    """Runs Timer events when they expire, from a single task backed by a min-heap.
+
+    Rather than one loop.call_later handle per timer, every timer is an entry in a heap ordered by expiry, and one
+    task sleeps until the earliest is due. Due timers are dispatched in batches, yielding to the event loop between
+    batches. Cancelled timers are marked and skipped when they reach the top, so cancel and reschedule are O(log n).
+
+    The clock is a function returning the current UNIX time, so tests can use a fake one with run_due."""
+
+    def __init__(self, bot, clock=time.time):
+        self.bot = bot
+        self.clock = clock
+        # Max timers dispatched before yielding to the event loop
+        try:
+            self.batch_size = int(self.bot.botconfig.get("Scheduler", "BATCH_SIZE"))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.batch_size = 200
+        # Max seconds to sleep at once, so a changed system clock is noticed
+        try:
+            self.max_sleep = float(self.bot.botconfig.get("Scheduler", "MAX_SLEEP"))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.max_sleep = 300.0
+
+        # Entries are [when, sequence, timer], timer is set to None once cancelled
+        self._heap = []
+        # timer.id: its live heap entry
+        self._entries = {}
+        self._sequence = itertools.count()
+        self._wakeup = asyncio.Event()
+        self.task = None
+        # Called as late_handler(timers, now) with each batch of due timers, returns the ones to run right away
+        self.late_handler = None
+        self.stats = {"scheduled": 0, "cancelled": 0, "dispatched": 0, "errors": 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, timer):
+        return timer.id in self._entries
+
+    def start(self):
+        """Starts the scheduler task, unless it's already running"""
+        if not self.task or self.task.done():
+            self.task = asyncio.create_task(self.run())
+        return self.task
+
+    def snapshot(self):
+        next_due = self.next_due()
+        return {
+            **self.stats,
+            "pending": len(self._entries),
+            "heap_size": len(self._heap),
+            "next_due_in": round(next_due - self.clock(), 1) if next_due is not None else None,
+        }
+
+    def schedule(self, timer):
+        """Schedules the timer to run its event when it expires, replacing any earlier schedule of it"""
+        self.cancel(timer, count=False)
+        entry = [timer.expires.timestamp(), next(self._sequence), timer]
+        self._entries[timer.id] = entry
+        heapq.heappush(self._heap, entry)
+        self.stats["scheduled"] += 1
+        # Only wake the task if this timer is now the next one due
+        if self._heap[0] is entry:
+            self._wakeup.set()
+        return timer
+
+    def reschedule(self, timer, expires):
+        """Moves the timer to a new expiry"""
+        timer.expires = expires
+        return self.schedule(timer)
+
+    def cancel(self, timer, count=True):
+        """Stops the timer from running. Returns whether it was scheduled"""
+        entry = self._entries.pop(timer.id, None)
+        if entry is None:
+            return False
+        entry[2] = None
+        if count:
+            self.stats["cancelled"] += 1
+        # Drop cancelled entries from the top right away, the rest are skipped once they get there
+        while self._heap and self._heap[0][2] is None:
+            heapq.heappop(self._heap)
+        return True
+
+    def next_due(self):
+        """Returns the UNIX time the next timer is due, or None if there are none"""
+        while self._heap and self._heap[0][2] is None:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now=None, limit=None):
+        """Removes and returns the timers due at now, the earliest first, at most limit of them"""
+        if now is None:
+            now = self.clock()
+        due = []
+        while self._heap and (limit is None or len(due) < limit):
+            when, _, timer = self._heap[0]
+            if timer is not None and when > now:
+                break
+            heapq.heappop(self._heap)
+            if timer is not None:
+                del self._entries[timer.id]
+                due.append(timer)
+        return due
+
+    def dispatch(self, timers):
+        for timer in timers:
+            try:
+                timer.event(*timer.args)
+                self.stats["dispatched"] += 1
+            except Exception as err:
+                self.stats["errors"] += 1
+                self.bot.log.exception(
+                    f"Scheduler: Error running {timer}. {sys.exc_info()[0].__name__}: {err}"
+                )
+
+    def run_due(self, now=None):
+        """Runs every timer due at now. Returns how many ran"""
+        timers = self.pop_due(now)
+        self.dispatch(timers)
+        return len(timers)
+
+    async def run(self):
+        """Sleeps until the next timer is due and runs the due timers, forever"""
+        query_origin.set("task:scheduler")
+        while True:
+            self._wakeup.clear()
+            timers = self.pop_due(limit=self.batch_size)
+            if timers:
+                if self.late_handler:
+                    timers = self.late_handler(timers, self.clock())
+                self.dispatch(timers)
+                # Let other tasks run before the next batch
+                await asyncio.sleep(0)
+                continue
+            next_due = self.next_due()
+            timeout = self.max_sleep
+            if next_due is not None:
+                timeout = min(max(next_due - self.clock(), 0), self.max_sleep)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,83 @@
+import re
+
+NUMBERED_BACKREFERENCE = re.compile(r"\\[1-9]")
+
+
+class ServiceMatcher:
+    """Matches URLs against the regex of every enabled AntiSpamServices row with one combined, precompiled regex.
+
+    All the regexes are compiled into one alternation where each service's regex is wrapped in a named group, so one
+    scan of the URL finds the matches of every service in turn and the group name tells which service each was.
+    Services are checked in order of id, so a URL matching several services goes to the one with the lowest id,
+    the same as searching them one by one would. Matches don't overlap, so a service is only missed when its text
+    lies inside another service's match. If the regexes can't be combined, e.g. one uses a backreference or inline
+    flags, they're matched one by one as precompiled patterns instead."""
+
+    def __init__(self, services=(), log=None):
+        self.log = log
+        self.services = []
+        self.combined = None
+        self.patterns = []
+        self.build(services)
+
+    def build(self, services):
+        """Compiles the regexes of services. Services without a valid regex are skipped"""
+        self.services = []
+        self.patterns = []
+        for service in sorted(services, key=lambda service: service.id):
+            if not service.regex:
+                continue
+            try:
+                pattern = re.compile(service.regex)
+            except re.error as err:
+                if self.log:
+                    self.log.warning(
+                        f"AntiSpam: Skipping service {service.service} ({service.id}), invalid regex. {err}"
+                    )
+                continue
+            self.services.append(service)
+            self.patterns.append(pattern)
+
+        # Numbered backreferences would point at the wrong group once the regexes are wrapped in groups
+        if not self.patterns or any(
+            NUMBERED_BACKREFERENCE.search(pattern.pattern) for pattern in self.patterns
+        ):
+            self.combined = None
+            return
+        try:
+            self.combined = re.compile(
+                "|".join(
+                    f"(?P<s{index}>{pattern.pattern})"
+                    for index, pattern in enumerate(self.patterns)
+                )
+            )
+        except re.error as err:
+            if self.log:
+                self.log.warning(
+                    f"AntiSpam: Unable to combine service regexes, matching them one at a time. {err}"
+                )
+            self.combined = None
+
+    def match(self, url):
+        """Returns (service, matched text) for the first service matching url, or (None, None)"""
+        if self.combined is not None:
+            best = None
+            best_index = len(self.services)
+            # At the same position the alternation already picks the lowest service, an earlier service may still
+            # match further along the URL though
+            for result in self.combined.finditer(url):
+                index = int(result.lastgroup[1:])
+                if index < best_index:
+                    best, best_index = result, index
+                    # Nothing comes before the first service
+                    if index == 0:
+                        break
+            if best is None:
+                return None, None
+            return self.services[best_index], best.group(best.lastgroup)
+
+        for service, pattern in zip(self.services, self.patterns):
+            result = pattern.search(url)
+            if result:
+                return service, result.group(0)
+        return None, None
@@ -0,0 +1,68 @@
+import asyncio
+import sys
+
+
+class StartupPipeline:
+    """Runs the startup steps in on_ready, each as soon as the steps it depends on have finished.
+
+    Steps that don't depend on each other run concurrently. A step that fails is logged and the steps depending on it
+    are skipped. on_ready fires again after every reconnect or resume, so later runs only retry the steps that failed
+    or were skipped, and once every step is done run() does nothing."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        # name: (coroutine function, names of the steps it runs after)
+        self.steps = {}
+        # name: "done", "failed" or "skipped"
+        self.results = {}
+        self.running = False
+
+    def add(self, name, fn, after=()):
+        """Adds a step. The steps it runs after have to be added first, so there can't be a cycle"""
+        for dependency in after:
+            if dependency not in self.steps:
+                raise ValueError(f"Startup step {name} runs after unknown step {dependency}")
+        self.steps[name] = (fn, tuple(after))
+
+    async def run(self):
+        """Runs every step that isn't done yet. Returns False without doing anything if there are none, or if another
+        run is still going"""
+        pending = [name for name in self.steps if self.results.get(name) != "done"]
+        if not pending or self.running:
+            return False
+        self.running = True
+
+        tasks = {}
+
+        async def run_step(name):
+            fn, after = self.steps[name]
+            for dependency in after:
+                # Steps done by an earlier run aren't run again
+                if dependency in tasks:
+                    await asyncio.wait([tasks[dependency]])
+                if self.results[dependency] != "done":
+                    self.results[name] = "skipped"
+                    self.bot.log.warning(
+                        f"Startup: Skipped {name} as {dependency} {self.results[dependency]}"
+                    )
+                    return
+            try:
+                with self.bot.boot.phase(name, "ready"):
+                    await fn()
+                self.results[name] = "done"
+            except Exception as err:
+                self.results[name] = "failed"
+                self.bot.log.exception(
+                    f"Startup: Error running {name}. {sys.exc_info()[0].__name__}: {err}"
+                )
+
+        if self.results:
+            self.bot.log.info(f"Startup: Retrying {', '.join(pending)}")
+        try:
+            # Every task exists before any of them starts waiting on another
+            for name in pending:
+                tasks[name] = asyncio.ensure_future(run_step(name))
+            await asyncio.gather(*tasks.values())
+        finally:
+            self.running = False
+        return True
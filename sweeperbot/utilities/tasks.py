@@ -6,6 +6,7 @@ import discord
 from sqlalchemy.exc import DBAPIError
 
 from sweeperbot.db import models
+from sweeperbot.db.instrumentation import query_origin
 
 
 class Tasks:
@@ -30,9 +31,25 @@ class Tasks:
             self.load_antispam_services_from_db()
         )
         self.all_tasks.append(task_load_antispam_services)
+        # Keep the AntiSpam TLD list up to date
+        task_refresh_tld_list = asyncio.create_task(self.refresh_tld_list())
+        self.all_tasks.append(task_refresh_tld_list)
+        # Periodically flush the message log buffer
+        task_message_buffer = asyncio.create_task(self.bot.message_buffer.run())
+        self.all_tasks.append(task_message_buffer)
+        # Run mute and reminder timers
+        self.all_tasks.append(self.bot.scheduler.start())
+        # Load the timers coming due
+        self.all_tasks.append(self.bot.timer_window.start())
+        # Save how far the timers have run, for catching up after a restart
+        self.all_tasks.append(self.bot.catch_up.start())
+        # Start the AntiSpam workers
+        self.all_tasks.extend(self.bot.antispam.queue.start())
+        self.loaded = True
         self.bot.log.info(f"Loaded start_tasks")
 
     async def log_server_stats(self):
+        query_origin.set("task:log_server_stats")
         while True:
             for guild in self.bot.guilds:
                 # If the guild is unavailable such as during an outage, skip it
@@ -145,23 +162,23 @@ class Tasks:
             await asyncio.sleep(60 * 10)
 
     async def load_antispam_services_from_db(self):
+        query_origin.set("task:load_antispam_services")
         while True:
-            session = self.bot.helpers.get_db_session()
             try:
-                self.bot.antispam.antispam_services = (
-                    session.query(models.AntiSpamServices)
+                services = await self.bot.helpers.run_db(
+                    lambda session: session.query(models.AntiSpamServices)
                     .filter(models.AntiSpamServices.enabled.is_(True))
                     .all()
                 )
-                self.bot.log.info(f"Loaded AntiSpam Services from DB")
+                self.bot.antispam.set_antispam_services(services)
+                # Reload the rules too so any changes made directly in the DB are picked up
+                await self.bot.antispam.load_rules()
+                self.bot.log.info(f"Loaded AntiSpam Services and Rules from DB")
             except DBAPIError as err:
                 self.bot.log.exception(
                     f"Database Error loading AntiSpam Module. {sys.exc_info()[0].__name__}: {err}"
                 )
-                session.rollback()
             finally:
-                # Close this database session
-                session.close()
                 # Wait before looping again. Time in seconds. Currently 10 minutes
                 await asyncio.sleep(60 * 10)
 
@@ -176,3 +193,25 @@ class Tasks:
                 self.bot.log.exception(
                     f"Tasks: Not sure how this happened.. some error cancelling the task: {sys.exc_info()[0].__name__}: {err}"
                 )
+
+    async def refresh_tld_list(self):
+        """Downloads the IANA TLD list for AntiSpam if the cached copy is older than the max age"""
+        while True:
+            url_extractor = self.bot.antispam.url_extractor
+            max_age = self.bot.antispam.tld_max_age
+            try:
+                # urlextract downloads synchronously, so run it off the event loop. If it fails the current
+                # list, cached or bundled, stays in use.
+                updated = await self.bot.loop.run_in_executor(
+                    None, url_extractor.update_when_older, max_age
+                )
+                if updated:
+                    self.bot.log.debug(f"AntiSpam TLD list is up to date")
+                else:
+                    self.bot.log.warning(f"Unable to refresh the AntiSpam TLD list")
+            except Exception as err:
+                self.bot.log.exception(
+                    f"Error refreshing the AntiSpam TLD list. {sys.exc_info()[0].__name__}: {err}"
+                )
+            # Check again daily. Time in seconds
+            await asyncio.sleep(60 * 60 * 24)
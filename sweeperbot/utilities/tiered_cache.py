@@ -0,0 +1,121 @@
+import time
+from collections import OrderedDict
+
+import redis
+
+# Stored in Redis to remember that a key has no value, e.g. an invite that wasn't found
+NEGATIVE = ""
+
+
+class TieredCache:
+    """A string cache with two tiers: an in-process LRU, backed by the shared Redis in Helpers.async_redis.
+
+    Lookups try the LRU first, then Redis, and Redis hits are copied into the LRU. Every entry expires after a TTL.
+    Negative entries, meaning "looked up and not found", are cached too with their own, usually shorter, TTL. If
+    Redis is unavailable the cache carries on with just the LRU, and Helpers.redis_breaker keeps it from calling
+    Redis again for a while."""
+
+    def __init__(self, bot, namespace, max_size=50000, ttl=3600, negative_ttl=300):
+        self.bot = bot
+        self.namespace = namespace
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        # key: (value, expires). A value of None is a negative entry
+        self._entries = OrderedDict()
+        self.stats = {
+            "local_hits": 0,
+            "redis_hits": 0,
+            "misses": 0,
+            "negative_hits": 0,
+            "stores": 0,
+            "evictions": 0,
+            "redis_errors": 0,
+        }
+
+    def _redis_key(self, key):
+        return f"{self.namespace}:{key}"
+
+    def _put_local(self, key, value, ttl):
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    async def get(self, key):
+        """Returns (found, value). A found negative entry is returned as (True, None)"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.stats["local_hits"] += 1
+                if entry[0] is None:
+                    self.stats["negative_hits"] += 1
+                return True, entry[0]
+            del self._entries[key]
+
+        value = None
+        breaker = self.bot.helpers.redis_breaker
+        if breaker.allow():
+            try:
+                # Get the value and its remaining TTL in one round trip, so the local copy doesn't outlive it
+                pipe = self.bot.helpers.async_redis.pipeline(transaction=False)
+                pipe.get(self._redis_key(key))
+                pipe.ttl(self._redis_key(key))
+                value, remaining = await pipe.execute()
+                breaker.succeeded()
+            except redis.RedisError as err:
+                breaker.failed()
+                self.stats["redis_errors"] += 1
+                self.bot.log.debug(
+                    f"TieredCache: Redis error getting '{key}'. {err.__class__.__name__}: {err}"
+                )
+        if value is None:
+            self.stats["misses"] += 1
+            return False, None
+
+        self.stats["redis_hits"] += 1
+        if value == NEGATIVE:
+            self.stats["negative_hits"] += 1
+            value = None
+        if remaining and remaining > 0:
+            self._put_local(key, value, remaining)
+        return True, value
+
+    async def set(self, key, value, ttl=None):
+        await self._store(key, value, ttl or self.ttl)
+
+    async def set_negative(self, key):
+        await self._store(key, None, self.negative_ttl)
+
+    async def _store(self, key, value, ttl):
+        self.stats["stores"] += 1
+        self._put_local(key, value, ttl)
+        breaker = self.bot.helpers.redis_breaker
+        if not breaker.allow():
+            return
+        try:
+            await self.bot.helpers.async_redis.setex(
+                self._redis_key(key), int(ttl), NEGATIVE if value is None else value
+            )
+            breaker.succeeded()
+        except redis.RedisError as err:
+            breaker.failed()
+            self.stats["redis_errors"] += 1
+            self.bot.log.debug(
+                f"TieredCache: Redis error setting '{key}'. {err.__class__.__name__}: {err}"
+            )
+
+    def snapshot(self):
+        """Returns the counters along with the current size and hit rate"""
+        lookups = (
+            self.stats["local_hits"] + self.stats["redis_hits"] + self.stats["misses"]
+        )
+        hits = self.stats["local_hits"] + self.stats["redis_hits"]
+        return {
+            "size": len(self._entries),
+            **self.stats,
+            "redis_breaker_open": self.bot.helpers.redis_breaker.is_open,
+            "hit_rate": hits / lookups * 100 if lookups else 0.0,
+        }
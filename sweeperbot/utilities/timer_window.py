@@ -0,0 +1,139 @@
+import asyncio
+import configparser
+import datetime
+import sys
+
+from sweeperbot.db.instrumentation import query_origin
+
+
+class TimerWindow:
+    """Keeps only the timers due within the next HORIZON seconds in memory.
+
+    Each kind of timer, e.g. mutes or reminders, is registered with a fetch function and an arm function. fetch runs
+    on the database thread pool as fetch(session, after, until) and returns the rows expiring in (after, until]. arm
+    is called with each row to start its timer. A background task slides the window forward every REFILL_INTERVAL
+    seconds, so only rows that have come within the horizon since the last refill are loaded.
+
+    A timer created by a command should only be started if covers() says it's within the loaded window, the refill
+    picks the rest up once they're due. Timers are keyed by their row, so a row armed by both a command and a refill
+    is only scheduled once."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        try:
+            self.horizon = float(self.bot.botconfig.get("TimerWindow", "HORIZON"))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.horizon = 6 * 60 * 60.0
+        try:
+            self.refill_interval = float(
+                self.bot.botconfig.get("TimerWindow", "REFILL_INTERVAL")
+            )
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.refill_interval = 30 * 60.0
+        # The refill has to run before the end of the window is reached
+        self.refill_interval = min(self.refill_interval, self.horizon / 2)
+
+        # kind: (fetch, arm)
+        self.kinds = {}
+        # kind: the expiry up to which its rows are loaded, None until its first refill
+        self.loaded_until = {}
+        self.task = None
+        # Re-arms started by a reloaded cog, kept so they aren't garbage collected while running
+        self.rearms = set()
+        self.stats = {"refills": 0, "loaded": 0, "errors": 0}
+
+    def register(self, kind, fetch, arm):
+        """Registers a kind of timer, replacing any earlier registration.
+
+        When a cog is reloaded, the window it had already loaded is kept so covers() keeps answering for commands
+        run straight after the reload, and the rows in it are armed again through the new arm function."""
+        self.kinds[kind] = (fetch, arm)
+        loaded_until = self.loaded_until.get(kind)
+        self.loaded_until[kind] = loaded_until
+        if loaded_until is not None:
+            task = asyncio.ensure_future(self.rearm(kind))
+            self.rearms.add(task)
+            task.add_done_callback(self.rearms.discard)
+
+    def covers(self, kind, expires):
+        """Returns whether a timer of this kind expiring at expires should be started now"""
+        loaded_until = self.loaded_until.get(kind)
+        return loaded_until is not None and expires <= loaded_until
+
+    async def refill(self, kind=None):
+        """Loads the rows of one kind, or of every kind, that have come within the horizon. Returns how many"""
+        total = 0
+        for name in [kind] if kind else list(self.kinds):
+            now = datetime.datetime.now(datetime.timezone.utc)
+            loaded_until = self.loaded_until[name]
+            # The first load also picks up the ones that expired while the bot was offline
+            after = loaded_until or self.bot.catch_up.since(name, now)
+            until = now + datetime.timedelta(seconds=self.horizon)
+            if until <= after:
+                continue
+            # Move the window first so timers created while the query runs are started by their command
+            self.loaded_until[name] = until
+            loaded = await self._load(name, after, until)
+            if loaded is None:
+                # Retry the same range on the next refill
+                if self.loaded_until[name] == until:
+                    self.loaded_until[name] = loaded_until
+                continue
+            total += loaded
+        self.stats["refills"] += 1
+        self.stats["loaded"] += total
+        return total
+
+    async def rearm(self, kind):
+        """Arms the rows of a kind that are already within its loaded window again. Returns how many"""
+        until = self.loaded_until.get(kind)
+        if until is None:
+            return 0
+        now = datetime.datetime.now(datetime.timezone.utc)
+        return await self._load(kind, now, until) or 0
+
+    async def _load(self, name, after, until):
+        """Fetches and arms the rows of a kind expiring in (after, until]. Returns how many, or None on error"""
+        fetch, arm = self.kinds[name]
+        try:
+            rows = await self.bot.helpers.run_db(fetch, after, until)
+        except Exception as err:
+            self.stats["errors"] += 1
+            self.bot.log.exception(
+                f"TimerWindow: Error loading {name}. {sys.exc_info()[0].__name__}: {err}"
+            )
+            return None
+        for row in rows:
+            try:
+                arm(row)
+            except Exception as err:
+                self.stats["errors"] += 1
+                self.bot.log.exception(
+                    f"TimerWindow: Error starting {name} timer for {row}. {sys.exc_info()[0].__name__}: {err}"
+                )
+        self.bot.log.debug(
+            f"TimerWindow: Loaded {len(rows)} {name} expiring by {until}"
+        )
+        return len(rows)
+
+    def start(self):
+        """Starts the refill task, unless it's already running"""
+        if not self.task or self.task.done():
+            self.task = asyncio.create_task(self.run())
+        return self.task
+
+    async def run(self):
+        query_origin.set("task:timer_window")
+        while True:
+            await self.refill()
+            await asyncio.sleep(self.refill_interval)
+
+    def snapshot(self):
+        return {
+            **self.stats,
+            "horizon_hours": self.horizon / 3600,
+            **{
+                f"{kind}_loaded_until": str(until)
+                for kind, until in self.loaded_until.items()
+            },
+        }
@@ -0,0 +1,144 @@
+import asyncio
+import configparser
+from urllib.parse import urljoin, urlsplit
+
+import aiohttp
+
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+
+
+class URLResolver:
+    """Follows redirects with HEAD requests on bot.session to find where a URL really goes.
+
+    Redirects are followed one hop at a time so every hop is bounded by a global concurrency cap and a per-host cap, and
+    the number of hops is limited. All URLs in a message are resolved concurrently within a total deadline, and any URL
+    that can't be resolved in time resolves to the furthest URL reached. If a cache is given, final URLs are cached,
+    and URLs that couldn't be requested are cached for the shorter negative TTL."""
+
+    def __init__(self, bot, cache=None):
+        self.bot = bot
+        self.cache = cache
+        # Set the max number of requests in flight across all hosts
+        try:
+            self.max_concurrency = int(
+                self.bot.botconfig.get("URLResolver", "MAX_CONCURRENCY")
+            )
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.max_concurrency = 50
+        # Set the max number of requests in flight to a single host
+        try:
+            self.per_host = int(self.bot.botconfig.get("URLResolver", "PER_HOST"))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.per_host = 4
+        # Set the max number of redirects followed for a URL
+        try:
+            self.max_redirects = int(
+                self.bot.botconfig.get("URLResolver", "MAX_REDIRECTS")
+            )
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.max_redirects = 10
+        # Set how long, in seconds, resolving all the URLs of a message may take
+        try:
+            self.deadline = float(self.bot.botconfig.get("URLResolver", "DEADLINE"))
+        except (configparser.NoSectionError, configparser.NoOptionError):
+            self.deadline = 10
+
+        self._global_slots = None
+        # host: [semaphore, number of users], removed once unused so the dict doesn't grow forever
+        self._host_slots = {}
+        self.stats = {
+            "urls": 0,
+            "requests": 0,
+            "redirects": 0,
+            "hop_limit_hits": 0,
+            "errors": 0,
+            "deadline_hits": 0,
+        }
+
+    async def _head(self, url):
+        """Sends one HEAD request without following redirects, within the global and per-host caps"""
+        if self._global_slots is None:
+            self._global_slots = asyncio.Semaphore(self.max_concurrency)
+        host = urlsplit(url).hostname or ""
+        slot = self._host_slots.setdefault(host, [asyncio.Semaphore(self.per_host), 0])
+        slot[1] += 1
+        try:
+            async with self._global_slots, slot[0]:
+                self.stats["requests"] += 1
+                async with self.bot.session.head(
+                    url,
+                    allow_redirects=False,
+                    timeout=aiohttp.ClientTimeout(total=self.deadline),
+                ) as res:
+                    return res.status, res.headers.get("Location")
+        finally:
+            slot[1] -= 1
+            if not slot[1]:
+                del self._host_slots[host]
+
+    async def resolve(self, url, progress=None):
+        """Returns the URL that url finally redirects to.
+
+        progress, if given, is a list whose first item is kept up to date with the furthest URL reached."""
+        if self.cache is not None:
+            found, final_url = await self.cache.get(url)
+            if found:
+                return final_url
+
+        final_url, ok = await self._follow(url, progress)
+        if self.cache is not None:
+            # URLs that couldn't be requested are only cached briefly, so they're retried soon
+            await self.cache.set(
+                url, final_url, None if ok else self.cache.negative_ttl
+            )
+        return final_url
+
+    async def _follow(self, url, progress):
+        """Follows the redirects of url. Returns the last URL reached and whether it could be requested"""
+        for _ in range(self.max_redirects + 1):
+            if progress is not None:
+                progress[0] = url
+            try:
+                status, location = await self._head(url)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as err:
+                self.stats["errors"] += 1
+                self.bot.log.debug(
+                    f"URLResolver: {err.__class__.__name__} resolving '{url}' - using it as-is"
+                )
+                return url, False
+            if status not in REDIRECT_STATUSES or not location:
+                return url, True
+            self.stats["redirects"] += 1
+            url = urljoin(url, location)
+
+        self.stats["hop_limit_hits"] += 1
+        self.bot.log.debug(
+            f"URLResolver: Too many redirects resolving '{url}' - using the last one reached"
+        )
+        return url, True
+
+    async def resolve_all(self, urls):
+        """Resolves urls concurrently and returns the final URLs in the same order"""
+        if not urls:
+            return []
+        self.stats["urls"] += len(urls)
+        progress = [[url] for url in urls]
+        tasks = [
+            asyncio.ensure_future(self.resolve(url, reached))
+            for url, reached in zip(urls, progress)
+        ]
+        done, pending = await asyncio.wait(tasks, timeout=self.deadline)
+        if pending:
+            self.stats["deadline_hits"] += 1
+            self.bot.log.debug(
+                f"URLResolver: {len(pending)} of {len(urls)} URLs not resolved within {self.deadline}s"
+            )
+            for task in pending:
+                task.cancel()
+        return [
+            task.result() if task in done and not task.exception() else reached[0]
+            for task, reached in zip(tasks, progress)
+        ]
+
+    def snapshot(self):
+        return {"hosts_in_flight": len(self._host_slots), **self.stats}
@@ -0,0 +1,180 @@
+import asyncio
+import sys
+from collections import deque
+
+# Lowercased text is mapped through this in one pass: zero-width characters are dropped and common leetspeak is
+# turned back into letters, so "Fr33 n1tr0" is matched the same as "free nitro"
+NORMALIZE_TABLE = str.maketrans(
+    {
+        **dict.fromkeys("\u200b\u200c\u200d\u2060\ufeff\u00ad"),
+        "0": "o",
+        "1": "i",
+        "3": "e",
+        "4": "a",
+        "5": "s",
+        "7": "t",
+        "8": "b",
+        "@": "a",
+        "$": "s",
+        "+": "t",
+    }
+)
+
+
+def normalize(text):
+    return text.lower().translate(NORMALIZE_TABLE)
+
+
+def terms_from_data(wordfilter_data):
+    """Gets the terms from ServerSetting.wordfilter_data, either a list of terms or {"words": [terms]}"""
+    if isinstance(wordfilter_data, dict):
+        wordfilter_data = wordfilter_data.get("words")
+    if not isinstance(wordfilter_data, (list, tuple)):
+        return []
+    return [term for term in wordfilter_data if isinstance(term, str)]
+
+
+class WordFilter:
+    """Matches a message against every term of a word list at once with an Aho-Corasick automaton.
+
+    Matching is one pass over the normalized message, however long the list is. Terms only match whole words, unless
+    they start or end with a * which lets that side run into other letters, e.g. "spam*" matches "spammer"."""
+
+    __slots__ = ("size", "_goto", "_fail", "_out")
+
+    def __init__(self, terms=()):
+        # Each node has its transitions, its fail link, and the terms that end at it as (term, left, right) where
+        # left and right are whether that side of the term must be at a word boundary
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        self.size = 0
+        seen = set()
+        for term in terms:
+            left = not term.startswith("*")
+            right = not term.endswith("*")
+            term = normalize(term.strip("*").strip())
+            if not term or (term, left, right) in seen:
+                continue
+            seen.add((term, left, right))
+            self.size += 1
+            node = 0
+            for char in term:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                node = next_node
+            self._out[node] += ((term, left, right),)
+
+        # Breadth first, point each node at the longest suffix of it that's also in the trie, and add the terms
+        # ending at that suffix to its own
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, next_node in self._goto[node].items():
+                queue.append(next_node)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[next_node] = fail
+                self._out[next_node] += self._out[fail]
+
+    def find(self, text):
+        """Returns the first term found in the text, or None"""
+        if not self.size:
+            return None
+        text = normalize(text)
+        goto, fail, out = self._goto, self._fail, self._out
+        last = len(text) - 1
+        node = 0
+        for end, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for term, left, right in out[node]:
+                start = end - len(term) + 1
+                if left and start > 0 and text[start - 1].isalnum():
+                    continue
+                if right and end < last and text[end + 1].isalnum():
+                    continue
+                return term
+        return None
+
+
+class WordFilters:
+    """Keeps a compiled WordFilter for each guild with the word filter enabled.
+
+    A guild's filter is rebuilt in a thread whenever its list of terms changes, so even a large list doesn't block
+    the event loop. Until the rebuild finishes the previous filter keeps being used."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        # guild_id: (the wordfilter_data last seen, the terms the filter was built from, WordFilter)
+        self.filters = {}
+        self._builds = {}
+        self.stats = {"checks": 0, "matches": 0, "builds": 0, "build_errors": 0}
+
+    def get(self, settings):
+        """Returns the guild's WordFilter, starting a rebuild if its word list changed"""
+        built = self.filters.get(settings.discord_id)
+        wordfilter_data = settings.wordfilter_data
+        # The same snapshot as last time, the usual case, is spotted without looking at the terms
+        if built is not None and built[0] is not wordfilter_data:
+            # A settings snapshot is replaced when any of the guild's settings change, so compare the terms themselves
+            terms = tuple(terms_from_data(wordfilter_data))
+            if terms == built[1]:
+                built = self.filters[settings.discord_id] = (
+                    wordfilter_data,
+                    terms,
+                    built[2],
+                )
+        if built is None or built[0] is not wordfilter_data:
+            if settings.discord_id not in self._builds:
+                self._builds[settings.discord_id] = asyncio.create_task(
+                    self.build(settings.discord_id, wordfilter_data)
+                )
+        return built[2] if built else None
+
+    async def build(self, guild_id, wordfilter_data):
+        terms = tuple(terms_from_data(wordfilter_data))
+        try:
+            loop = asyncio.get_running_loop()
+            word_filter = await loop.run_in_executor(None, WordFilter, terms)
+            self.filters[guild_id] = (wordfilter_data, terms, word_filter)
+            self.stats["builds"] += 1
+            self.bot.log.debug(
+                f"WordFilter: Built {word_filter.size} terms for guild {guild_id}"
+            )
+        except Exception as err:
+            self.stats["build_errors"] += 1
+            # Don't retry on every message, only once the list changes again
+            self.filters[guild_id] = (wordfilter_data, terms, WordFilter())
+            self.bot.log.exception(
+                f"WordFilter: Error building the word filter for guild {guild_id}. {sys.exc_info()[0].__name__}: {err}"
+            )
+        finally:
+            self._builds.pop(guild_id, None)
+
+    def find(self, settings, text):
+        """Returns the first term of the guild's word filter found in the text, or None"""
+        self.stats["checks"] += 1
+        word_filter = self.get(settings)
+        if not word_filter:
+            return None
+        term = word_filter.find(text)
+        if term:
+            self.stats["matches"] += 1
+        return term
+
+    def snapshot(self):
+        return {
+            "guilds": len(self.filters),
+            "terms": sum(word_filter.size for _, _, word_filter in self.filters.values()),
+            "building": len(self._builds),
+            **self.stats,
+        }
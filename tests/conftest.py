@@ -0,0 +1,25 @@
+import configparser
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+
+@pytest.fixture
+def make_bot():
+    """Returns a function making a stand-in for the bot, with a logger and a botconfig.
+
+    make_bot(section, config, **attributes) fills the config section from a dict, values being converted to strings
+    like they'd be read from botconfig.ini, and sets any other attributes the code under test uses, e.g. helpers."""
+
+    def make(section=None, config=None, **attributes):
+        botconfig = configparser.ConfigParser()
+        if section:
+            botconfig.read_dict(
+                {section: {key: str(value) for key, value in (config or {}).items()}}
+            )
+        return SimpleNamespace(
+            log=logging.getLogger("test"), botconfig=botconfig, **attributes
+        )
+
+    return make
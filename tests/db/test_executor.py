@@ -0,0 +1,43 @@
+"""Tests for db/executor.py"""
+import asyncio
+import threading
+import time
+
+import pytest
+from sweeperbot.db.executor import DatabaseExecutor
+
+
+def test_run_returns_result_on_db_thread():
+    """The callable runs on one of the executor's threads and its result is returned"""
+    executor = DatabaseExecutor(max_workers=2, max_queue=2)
+    thread_name = asyncio.run(executor.run(lambda: threading.current_thread().name))
+    assert thread_name.startswith("db")
+    assert executor.snapshot()["calls"] == 1
+    executor.shutdown()
+
+
+def test_run_reraises_and_counts_errors():
+    executor = DatabaseExecutor(max_workers=1, max_queue=1)
+    with pytest.raises(ZeroDivisionError):
+        asyncio.run(executor.run(lambda: 1 / 0))
+    stats = executor.snapshot()
+    assert stats["errors"] == 1
+    assert stats["active"] == 0
+    executor.shutdown()
+
+
+def test_queue_is_bounded():
+    """Callers beyond max_workers + max_queue wait before submitting, and wait time is recorded"""
+    executor = DatabaseExecutor(max_workers=1, max_queue=1)
+
+    async def run_all():
+        await asyncio.gather(*[executor.run(time.sleep, 0.02) for _ in range(4)])
+
+    asyncio.run(run_all())
+    stats = executor.snapshot()
+    assert stats["calls"] == 4
+    assert stats["max_queue_depth"] <= 2
+    assert stats["slot_waits"] >= 1
+    assert stats["wait_ms_max"] > 0
+    assert stats["queue_depth"] == 0
+    executor.shutdown()
@@ -0,0 +1,85 @@
+"""Tests for db/instrumentation.py"""
+import asyncio
+
+from sqlalchemy import create_engine, text
+from sweeperbot.db import instrumentation
+from sweeperbot.db.executor import DatabaseExecutor
+from sweeperbot.db.instrumentation import QueryStats, query_origin
+
+
+def make_engine(query_stats):
+    engine = create_engine("sqlite://")
+    query_stats.attach(engine)
+    return engine
+
+
+def test_queries_are_recorded_per_origin():
+    query_stats = QueryStats(slow_query_ms=10000)
+    engine = make_engine(query_stats)
+    token = query_origin.set("cmd:mute")
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+    finally:
+        query_origin.reset(token)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 3"))
+
+    top = dict(query_stats.top(key="calls"))
+    assert top["cmd:mute"]["calls"] == 2
+    assert top["unknown"]["calls"] == 1
+    assert top["cmd:mute"]["slow"] == 0
+
+
+def test_slow_queries_are_counted_and_logged(caplog):
+    query_stats = QueryStats(slow_query_ms=0)
+    engine = make_engine(query_stats)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    origin, stats = query_stats.top(1)[0]
+    assert stats["slow"] == 1
+    assert "Slow query" in caplog.text
+
+
+def test_origin_follows_calls_onto_the_executor():
+    """The database executor copies the caller's context so queries keep their origin"""
+    query_stats = QueryStats(slow_query_ms=10000)
+    engine = make_engine(query_stats)
+    executor = DatabaseExecutor(max_workers=1, max_queue=1)
+
+    def query():
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+    async def run():
+        query_origin.set("event:on_message")
+        await executor.run(query)
+
+    asyncio.run(run())
+    assert [origin for origin, _ in query_stats.top()] == ["event:on_message"]
+    executor.shutdown()
+
+
+def test_failed_explain_leaves_the_transaction_usable():
+    query_stats = QueryStats(slow_query_ms=10000)
+    engine = make_engine(query_stats)
+    with engine.connect() as conn:
+        conn.execute(text("CREATE TABLE mutes (id INTEGER)"))
+        with conn.begin():
+            conn.execute(text("INSERT INTO mutes VALUES (1)"))
+            cursor = conn.connection.cursor()
+            assert query_stats._explain(cursor, "SELECT * FROM missing", ()) is None
+            assert query_stats._explain(cursor, "SELECT * FROM mutes", ())
+            # The caller's transaction carries on with its own work intact
+            conn.execute(text("INSERT INTO mutes VALUES (2)"))
+        assert conn.execute(text("SELECT count(*) FROM mutes")).scalar() == 2
+
+
+def test_explained_statements_are_bounded(monkeypatch):
+    monkeypatch.setattr(instrumentation, "MAX_EXPLAINED", 10)
+    query_stats = QueryStats()
+    for number in range(100):
+        assert query_stats._should_explain(f"SELECT {number}")
+    assert len(query_stats._last_explained) == 10
+    assert not query_stats._should_explain("SELECT 99")
@@ -0,0 +1,117 @@
+"""Tests for db/manager.py"""
+import asyncio
+import configparser
+import logging
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from sweeperbot.db import models
+from sweeperbot.db.manager import DatabaseManager
+from sweeperbot.utilities.helpers import Helpers
+
+
+def make_manager():
+    """A manager whose sessions use an in memory SQLite database instead of PostgreSQL"""
+    database = DatabaseManager(configparser.ConfigParser())
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    database.ENGINE["Database"] = engine
+    database.sessionmaker_dict["Database"] = sessionmaker(
+        bind=engine, expire_on_commit=False
+    )
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE notes (text VARCHAR)"))
+    return database
+
+
+def count_notes(database):
+    with database.ENGINE["Database"].connect() as conn:
+        return conn.execute(text("SELECT count(*) FROM notes")).scalar()
+
+
+def test_session_commits_on_success():
+    database = make_manager()
+
+    async def run():
+        async with database.session() as session:
+            await session.execute(text("INSERT INTO notes VALUES ('kept')"))
+            result = await session.execute(text("SELECT text FROM notes"))
+            assert result.scalar() == "kept"
+
+    asyncio.run(run())
+    assert count_notes(database) == 1
+    assert database.executor.snapshot()["calls"] >= 3
+    database.close_engine()
+
+
+def test_session_rolls_back_and_closes_on_error():
+    database = make_manager()
+    sessions = []
+
+    async def run():
+        async with database.session() as session:
+            sessions.append(session)
+            await session.execute(text("INSERT INTO notes VALUES ('lost')"))
+            raise ValueError("command failed")
+
+    with pytest.raises(ValueError):
+        asyncio.run(run())
+    assert count_notes(database) == 0
+    # Closing the session released its connection and transaction
+    assert not sessions[0].sync_session.in_transaction()
+    database.close_engine()
+
+
+def test_close_engine_disposes_every_engine():
+    database = make_manager()
+    database.ENGINE["TestDatabase"] = create_engine("sqlite://")
+    disposed = []
+    for name, engine in database.ENGINE.items():
+        event.listen(
+            engine, "engine_disposed", lambda engine, name=name: disposed.append(name)
+        )
+    database.close_engine()
+    assert sorted(disposed) == ["Database", "TestDatabase"]
+    with pytest.raises(RuntimeError):
+        asyncio.run(database.executor.run(lambda: None))
+
+
+def test_check_if_blacklisted_reads_through_the_session():
+    database = make_manager()
+    models.Blacklist.__table__.create(database.ENGINE["Database"])
+    with database.ENGINE["Database"].begin() as conn:
+        conn.execute(
+            models.Blacklist.__table__.insert(),
+            [
+                {"server_id": 1, "user_id": 10, "blacklisted": True},
+                {"server_id": 1, "user_id": 11, "blacklisted": False},
+            ],
+        )
+
+    async def db_get_user_id(discord_id):
+        return discord_id // 100
+
+    async def db_get_guild_id(discord_id):
+        return discord_id // 100
+
+    bot = SimpleNamespace(database=database, log=logging.getLogger("test"))
+    bot.helpers = SimpleNamespace(
+        db_get_user_id=db_get_user_id, db_get_guild_id=db_get_guild_id
+    )
+    helpers = SimpleNamespace(bot=bot)
+
+    async def run():
+        return [
+            await Helpers.check_if_blacklisted(helpers, user_id, 100)
+            for user_id in (1000, 1100, 1200)
+        ]
+
+    # Blacklisted, explicitly allowed, and with no row at all
+    assert asyncio.run(run()) == [True, False, False]
+    database.close_engine()
@@ -0,0 +1,100 @@
+"""Tests for utilities/actions.py"""
+import asyncio
+import logging
+from types import SimpleNamespace
+
+import pytest
+from sweeperbot.utilities.actions import ActionDispatcher
+
+
+class FakeMuteCog:
+    def __init__(self):
+        self.mutes = []
+        self.release = asyncio.Event()
+
+    async def mute_member(self, guild, member, mute_time, reason, moderator):
+        self.mutes.append((guild.id, member.id, reason))
+        await self.release.wait()
+        if reason == "fail":
+            raise ValueError("Mute role is not yet configured")
+        return True, None, None
+
+
+class FakeGuild:
+    def __init__(self, guild_id):
+        self.id = guild_id
+        self.me = SimpleNamespace(id=1)
+        self.banned = []
+
+    async def ban(self, user, reason, delete_message_days):
+        self.banned.append(user.id)
+
+
+def make_bot(mute_cog):
+    return SimpleNamespace(log=logging.getLogger("test"), get_cog=lambda name: mute_cog)
+
+
+def test_concurrent_mutes_coalesce():
+    async def run():
+        mute_cog = FakeMuteCog()
+        actions = ActionDispatcher(make_bot(mute_cog))
+        guild, member = FakeGuild(1), SimpleNamespace(id=100)
+
+        futures = [actions.mute(guild, member, None, f"spam {i}") for i in range(5)]
+        other = actions.mute(FakeGuild(2), member, None, "spam")
+        assert len({id(future) for future in futures}) == 1
+        assert actions.pending(1, 100) == "mute"
+
+        mute_cog.release.set()
+        results = await asyncio.gather(*futures, other)
+        assert results[0] == (True, None, None)
+        assert mute_cog.mutes == [(1, 100, "spam 0"), (2, 100, "spam")]
+        assert actions.stats["coalesced"] == 4
+        assert actions.pending(1, 100) is None and not actions.in_flight
+
+    asyncio.run(run())
+
+
+def test_failed_action_is_cleared():
+    async def run():
+        mute_cog = FakeMuteCog()
+        mute_cog.release.set()
+        actions = ActionDispatcher(make_bot(mute_cog))
+        guild, member = FakeGuild(1), SimpleNamespace(id=100)
+
+        with pytest.raises(ValueError):
+            await actions.mute(guild, member, None, "fail")
+        assert not actions.in_flight and actions.stats["failed"] == 1
+        # The next trigger starts a new action
+        assert await actions.mute(guild, member, None, "spam") == (True, None, None)
+
+    asyncio.run(run())
+
+
+def test_more_severe_action_waits_for_pending_one(monkeypatch):
+    logged = []
+
+    async def user_action(bot, channel, member, action, *args):
+        logged.append(action)
+
+    monkeypatch.setattr("sweeperbot.utilities.actions.log.user_action", user_action)
+
+    async def run():
+        mute_cog = FakeMuteCog()
+        actions = ActionDispatcher(make_bot(mute_cog))
+        guild, member = FakeGuild(1), SimpleNamespace(id=100)
+
+        mute = actions.mute(guild, member, None, "spam")
+        ban = actions.ban(guild, member, "raid")
+        assert ban is not mute and actions.pending(1, 100) == "ban"
+        # A mute during the ban is absorbed by it
+        assert actions.mute(guild, member, None, "spam") is ban
+        await asyncio.sleep(0)
+        assert guild.banned == []
+
+        mute_cog.release.set()
+        await ban
+        assert guild.banned == [100] and logged == ["Ban"]
+        assert actions.stats["escalated"] == 1 and not actions.in_flight
+
+    asyncio.run(run())
@@ -0,0 +1,87 @@
+"""Tests for utilities/antispam.py"""
+import asyncio
+import logging
+from types import SimpleNamespace
+
+import discord
+import parsedatetime as pdt
+import pytest
+from sweeperbot.utilities.antispam import URL_HINT, AntiSpam
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "join discord.gg/abc",
+        "https://example.com",
+        "http://localhost:8000",
+        "see EXAMPLE.COM",
+        "x.中国",
+        "1.2.3.4",
+    ],
+)
+def test_prefilter_passes_messages_that_may_have_urls(message):
+    assert URL_HINT.search(message)
+
+
+@pytest.mark.parametrize(
+    "message", ["hello there", "ok... so", "it costs 4.99", "<@!123> :smile: gg"]
+)
+def test_prefilter_skips_messages_without_urls(message):
+    assert not URL_HINT.search(message)
+
+
+class FakeResponse:
+    status = 404
+    reason = "Not Found"
+
+
+class FakeMessage:
+    """A message that a mod has already deleted, in a channel the bot can't send to"""
+
+    def __init__(self, mod_channel):
+        self.id = 3
+        self.author = SimpleNamespace(id=2, mention="<@2>")
+        self.guild = SimpleNamespace(id=1, me=None, text_channels=[mod_channel])
+        self.channel = SimpleNamespace(id=4, send=self.forbidden)
+        self.jump_url = "https://discord.com/channels/1/4/3"
+        self.content = "spam"
+
+    async def delete(self):
+        raise discord.NotFound(FakeResponse(), "Unknown Message")
+
+    async def forbidden(self, content):
+        raise discord.Forbidden(FakeResponse(), "Missing Permissions")
+
+
+def test_mute_goes_ahead_if_the_message_is_gone_and_the_channel_locked():
+    async def run():
+        alerts = []
+
+        async def send_alert(content):
+            alerts.append(content)
+
+        mod_channel = SimpleNamespace(id=5, send=send_alert)
+        mutes = []
+
+        async def mute(*args):
+            mutes.append(args)
+
+        antispam = SimpleNamespace(
+            bot=SimpleNamespace(
+                log=logging.getLogger("test"),
+                actions=SimpleNamespace(
+                    pending=lambda guild_id, user_id: False,
+                    mute=lambda *args: asyncio.ensure_future(mute(*args)),
+                ),
+            ),
+            calendar=pdt.Calendar(version=pdt.VERSION_CONTEXT_STYLE),
+        )
+        settings = SimpleNamespace(antispam_mute_time="20m", mod_channel=5)
+        await AntiSpam.antispam_mute(
+            antispam, FakeMessage(mod_channel), settings, "spam", "warning", "Alert"
+        )
+        assert len(mutes) == 1
+        assert alerts and alerts[0].startswith("Alert")
+
+    asyncio.run(run())
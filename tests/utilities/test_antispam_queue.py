@@ -0,0 +1,91 @@
+"""Tests for utilities/antispam_queue.py"""
+import asyncio
+from types import SimpleNamespace
+
+from sweeperbot.utilities.antispam_queue import AntiSpamQueue
+
+
+def make_message(message_id, guild_id):
+    return SimpleNamespace(id=message_id, guild=SimpleNamespace(id=guild_id))
+
+
+def test_guilds_take_turns(make_bot):
+    async def run():
+        queue = AntiSpamQueue(make_bot("AntiSpamQueue"), None)
+        # A raid in guild 1 queued before a single message in guilds 2 and 3
+        for message_id in range(5):
+            await queue.put(make_message(message_id, 1))
+        await queue.put(make_message(10, 2))
+        await queue.put(make_message(20, 3))
+
+        order = []
+        while True:
+            item = queue.get_nowait()
+            if item is None:
+                break
+            order.append(item[1].id)
+        assert order == [0, 10, 20, 1, 2, 3, 4]
+        assert queue.size == 0 and not queue.guilds
+
+    asyncio.run(run())
+
+
+def test_drop_oldest_drops_from_the_busiest_guild(make_bot):
+    async def run():
+        queue = AntiSpamQueue(make_bot("AntiSpamQueue", {"MAX_SIZE": 3}), None)
+        await queue.put(make_message(1, 1))
+        await queue.put(make_message(2, 2))
+        await queue.put(make_message(3, 2))
+        await queue.put(make_message(4, 1))
+
+        assert queue.size == 3
+        assert queue.stats["dropped"] == 1
+        assert [message.id for _, message in queue.guilds[2]] == [3]
+
+    asyncio.run(run())
+
+
+def test_degrade_runs_cheap_checks_right_away(make_bot):
+    processed = []
+
+    async def process(message, cheap_only=False):
+        processed.append((message.id, cheap_only))
+
+    async def run():
+        queue = AntiSpamQueue(
+            make_bot("AntiSpamQueue", {"MAX_SIZE": 1, "OVERFLOW": "degrade"}), process
+        )
+        await queue.put(make_message(1, 1))
+        await queue.put(make_message(2, 1))
+        assert processed == [(2, True)]
+        assert queue.stats["degraded"] == 1
+
+    asyncio.run(run())
+
+
+def test_workers_process_everything(make_bot):
+    processed = []
+
+    async def process(message, cheap_only=False):
+        await asyncio.sleep(0)
+        if message.id == 3:
+            raise ValueError("bad message")
+        processed.append(message.id)
+
+    async def run():
+        queue = AntiSpamQueue(make_bot("AntiSpamQueue", {"WORKERS": 3}), process)
+        workers = queue.start()
+        # Starting again doesn't add more workers
+        assert queue.start() == workers and len(workers) == 3
+        for message_id in range(10):
+            await queue.put(make_message(message_id, message_id % 2))
+        for _ in range(20):
+            await asyncio.sleep(0)
+        for worker in workers:
+            worker.cancel()
+
+        assert sorted(processed) == [0, 1, 2, 4, 5, 6, 7, 8, 9]
+        assert queue.stats["processed"] == 9 and queue.stats["errors"] == 1
+        assert queue.snapshot()["depth"] == 0
+
+    asyncio.run(run())
@@ -0,0 +1,99 @@
+"""Tests for utilities/antispam_rules.py"""
+import random
+
+from sqlalchemy.dialects import postgresql
+from sweeperbot.utilities.antispam_rules import CompiledRule, ServiceRules, load_guild_rules
+
+
+def reference_evaluate(rows, channel_id, author_id, regex_match, spam_guild_id):
+    """The rule chain AntiSpam ran against the database rows before rules were compiled"""
+    allowed = True
+    for row in sorted(rows, key=lambda row: row["rule_id"]):
+        rule_id = row["rule_id"]
+        service_match_text = row["service_match_text"]
+        service_match_ids = row["service_match_ids"]
+        channel_ids = row["channel_ids"]
+        user_ids = row["user_ids"]
+        guild_match = bool(
+            spam_guild_id and service_match_ids and spam_guild_id in service_match_ids
+        )
+        text_match = bool(service_match_text and regex_match in service_match_text)
+        if rule_id == 1:
+            allowed = False
+        elif rule_id == 2:
+            allowed = True
+        elif rule_id == 3:
+            if channel_ids and channel_id in channel_ids:
+                allowed = False
+        elif rule_id == 4:
+            if channel_ids and channel_id in channel_ids:
+                allowed = True
+            elif channel_ids and channel_id not in channel_ids:
+                allowed = False
+            elif channel_ids is None:
+                allowed = True
+        elif rule_id == 5:
+            if (text_match or guild_match) and (channel_ids and channel_id in channel_ids):
+                allowed = True
+            else:
+                allowed = False
+        elif rule_id == 6:
+            if (text_match or guild_match) and (channel_ids and channel_id in channel_ids):
+                allowed = False
+        elif rule_id == 7:
+            if (
+                text_match
+                or (service_match_ids and regex_match in service_match_ids)
+                or guild_match
+            ):
+                if user_ids:
+                    if author_id in user_ids:
+                        allowed = True
+                else:
+                    allowed = True
+        elif rule_id == 8:
+            if text_match or guild_match:
+                allowed = False
+    return allowed
+
+
+def test_rule_chain_matches_reference():
+    rng = random.Random(1)
+
+    def some(values):
+        return rng.choice([None, [], rng.sample(values, rng.randint(1, len(values)))])
+
+    for _ in range(500):
+        rows = [
+            {
+                "rule_id": rng.randint(1, 8),
+                "service_match_text": some(["abc", "xyz"]),
+                "service_match_ids": some([10, 20]),
+                "channel_ids": some([1, 2, 3]),
+                "user_ids": some([100, 200]),
+            }
+            for _ in range(rng.randint(1, 4))
+        ]
+        service_rules = ServiceRules([CompiledRule(**row) for row in rows])
+        for channel_id in (1, 2, 3, 4):
+            for author_id in (100, 300):
+                for regex_match, spam_guild_id in (("abc", None), ("def", 20), ("q", 30)):
+                    assert service_rules.evaluate(
+                        channel_id, author_id, regex_match, spam_guild_id
+                    ) == reference_evaluate(
+                        rows, channel_id, author_id, regex_match, spam_guild_id
+                    ), rows
+
+
+def test_rules_are_loaded_with_one_query():
+    executed = []
+
+    class FakeSession:
+        def execute(self, statement):
+            executed.append(statement)
+            return []
+
+    assert load_guild_rules(FakeSession(), [123]) == {123: {}}
+    assert len(executed) == 1
+    sql = str(executed[0].compile(dialect=postgresql.dialect()))
+    assert "JOIN server ON antispamserversettings.server_id = server.id" in sql
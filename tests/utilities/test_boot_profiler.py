@@ -0,0 +1,61 @@
+"""Tests for utilities/boot_profiler.py"""
+import asyncio
+import logging
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, text
+from sweeperbot.db.instrumentation import QueryStats, query_origin
+from sweeperbot.utilities.boot_profiler import BootProfiler
+
+
+def make_profiler():
+    query_stats = QueryStats(slow_query_ms=10000)
+    engine = create_engine("sqlite://")
+    query_stats.attach(engine)
+    bot = SimpleNamespace(
+        log=logging.getLogger("test"),
+        database=SimpleNamespace(query_stats=query_stats),
+    )
+    return BootProfiler(bot), engine
+
+
+def test_phases_count_their_own_queries():
+    async def run():
+        profiler, engine = make_profiler()
+
+        async def load(name, queries):
+            with profiler.phase(name, "ready"):
+                await asyncio.sleep(0)
+                with engine.connect() as conn:
+                    for _ in range(queries):
+                        conn.execute(text("SELECT 1"))
+
+        # Phases running at the same time still only count their own queries
+        await asyncio.gather(load("guild_settings", 3), load("reminders", 1))
+        with profiler.phase("cogs.modtools.mute", "extension"):
+            pass
+        with pytest.raises(ValueError):
+            with profiler.phase("cogs.misc.broken", "extension"):
+                raise ValueError("bad cog")
+        assert query_origin.get() == "unknown"
+
+        assert profiler.ready() and not profiler.ready()
+        report = profiler.report()
+        queries = {record["name"]: record["queries"] for record in report["phases"]}
+        assert queries == {
+            "guild_settings": 3,
+            "reminders": 1,
+            "cogs.modtools.mute": 0,
+            "cogs.misc.broken": 0,
+        }
+        assert report["groups"]["extension"]["failed"] == 1
+        assert report["groups"]["ready"]["queries"] == 4
+        assert profiler.lines()[0].startswith("ready in")
+
+        # Phases after the first on_ready aren't kept
+        with profiler.phase("guild_settings", "ready"):
+            pass
+        assert len(profiler.report()["phases"]) == 4
+
+    asyncio.run(run())
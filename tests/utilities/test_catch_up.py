@@ -0,0 +1,145 @@
+"""Tests for utilities/catch_up.py"""
+import asyncio
+import configparser
+import datetime
+import logging
+import time
+from types import SimpleNamespace
+
+import discord
+import redis
+from sweeperbot.cogs.utils.timer import Timer
+from sweeperbot.utilities.catch_up import HEARTBEAT_KEY, CatchUp
+
+
+class FakeRedis:
+    def __init__(self, values=None):
+        self.values = values or {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value):
+        self.values[key] = value
+
+
+class BrokenRedis:
+    def get(self, key):
+        raise redis.ConnectionError("redis is down")
+
+
+class FakeChannel:
+    def __init__(self):
+        self.id = 500
+        self.sent = []
+
+    async def send(self, text):
+        self.sent.append(text)
+        return SimpleNamespace(edit=self.edit)
+
+    async def edit(self, content):
+        self.sent.append(content)
+
+
+def make_catch_up(fake_redis, channel=None):
+    botconfig = configparser.ConfigParser()
+    botconfig.read_dict(
+        {"CatchUp": {"RATE": "1000", "CONCURRENCY": "1", "REPORT_MIN": "3"}}
+    )
+    guild = SimpleNamespace(id=1, text_channels=[channel] if channel else [])
+    bot = SimpleNamespace(
+        botconfig=botconfig,
+        log=logging.getLogger("test"),
+        helpers=SimpleNamespace(redis=fake_redis),
+        get_guild=lambda guild_id: guild if guild_id == 1 else None,
+        guild_settings={1: SimpleNamespace(mod_channel=500)},
+        scheduler=SimpleNamespace(next_due=lambda: None),
+        timer_window=SimpleNamespace(loaded_until={"mutes": "loaded"}),
+    )
+    return CatchUp(bot)
+
+
+def make_timer(ran, guild_id, name, seconds_ago):
+    def event(guild_id, name):
+        if name == "gone":
+            raise ValueError("Bot can't find member")
+        ran.append((guild_id, name))
+
+    return Timer.temporary(
+        guild_id,
+        name,
+        event=event,
+        expires=datetime.datetime.now(datetime.timezone.utc)
+        - datetime.timedelta(seconds=seconds_ago),
+        created=datetime.datetime.now(datetime.timezone.utc),
+    )
+
+
+def test_first_load_starts_from_the_heartbeat():
+    saved = int(time.time()) - 3600
+    catch_up = make_catch_up(FakeRedis({HEARTBEAT_KEY: str(saved)}))
+    now = datetime.datetime.now(datetime.timezone.utc)
+    assert catch_up.since("mutes", now).timestamp() == saved
+    # Only the first load of each kind looks back
+    assert catch_up.since("mutes", now) == now
+
+    catch_up = make_catch_up(FakeRedis({HEARTBEAT_KEY: str(saved - 86400 * 30)}))
+    assert catch_up.since("mutes", now) > now - datetime.timedelta(days=8)
+    assert make_catch_up(BrokenRedis()).since("mutes", now) == now
+
+
+def test_late_timers_run_per_guild_and_report_progress():
+    async def run():
+        channel = FakeChannel()
+        catch_up = make_catch_up(FakeRedis(), channel)
+        ran = []
+        timers = [
+            make_timer(ran, 1, "a", 600),
+            make_timer(ran, 2, "b", 500),
+            make_timer(ran, 1, "gone", 400),
+            make_timer(ran, 1, "c", 300),
+            make_timer(ran, 1, "on time", 5),
+        ]
+        on_time = catch_up.take_late(timers, time.time())
+        assert [timer.args[1] for timer in on_time] == ["on time"]
+        assert catch_up.caught_up_to(time.time()) == timers[0].expires.timestamp()
+
+        await asyncio.gather(*catch_up.workers.values())
+        assert ran == [(1, "a"), (1, "c"), (2, "b")]
+        assert catch_up.stats["skipped"] == 1 and catch_up.stats["dispatched"] == 3
+        assert not catch_up.pending and not catch_up.workers
+        # Guild 1 had enough late timers for a report, guild 2 didn't
+        assert len(channel.sent) == 1 and channel.sent[0].startswith("Caught up on 3")
+
+        catch_up.heartbeat()
+        assert float(catch_up.bot.helpers.redis.values[HEARTBEAT_KEY]) > time.time() - 5
+
+    asyncio.run(run())
+
+
+def test_async_events_are_awaited_one_at_a_time():
+    async def run():
+        catch_up = make_catch_up(FakeRedis())
+        running = []
+        ran = []
+
+        async def unmute(guild_id, name):
+            running.append(name)
+            # The next timer of the guild doesn't start until this one has finished
+            assert len(running) == 1
+            await asyncio.sleep(0.01)
+            running.remove(name)
+            if name == "forbidden":
+                raise discord.Forbidden(SimpleNamespace(status=403, reason=""), "")
+            ran.append(name)
+
+        timers = [make_timer([], 1, name, 600) for name in ("a", "forbidden", "b")]
+        for timer in timers:
+            timer.async_event = unmute
+        catch_up.take_late(timers, time.time())
+        await asyncio.gather(*catch_up.workers.values())
+        assert ran == ["a", "b"]
+        # The error from the awaited event reached the counts
+        assert catch_up.stats["failed"] == 1 and catch_up.stats["dispatched"] == 2
+
+    asyncio.run(run())
@@ -0,0 +1,33 @@
+"""Tests for utilities/guild_settings.py"""
+import pytest
+from sqlalchemy.dialects import postgresql
+from sweeperbot.utilities.guild_settings import GuildSettings, GuildSettingsCache
+
+
+def test_snapshot_is_read_only():
+    settings = GuildSettings(discord_id=123, id=1, bot_prefix=["!", "?"], mod_channel=5)
+    assert settings.discord_id == 123
+    assert settings.mod_channel == 5
+    assert settings.bot_prefix == ("!", "?")
+    # Unset columns default to None
+    assert settings.muted_role is None
+    with pytest.raises(AttributeError):
+        settings.mod_channel = 6
+    with pytest.raises(AttributeError):
+        settings.not_a_column = 1
+
+
+def test_settings_are_loaded_with_one_join():
+    executed = []
+
+    class FakeSession:
+        def execute(self, statement):
+            executed.append(statement)
+            return []
+
+    cache = GuildSettingsCache(bot=None)
+    assert cache._query(FakeSession(), [123]) == []
+    assert len(executed) == 1
+    sql = str(executed[0].compile(dialect=postgresql.dialect()))
+    assert "JOIN server ON serversetting.server_id = server.id" in sql
+    assert "server.discord_id IN" in sql
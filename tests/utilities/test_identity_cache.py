@@ -0,0 +1,39 @@
+"""Tests for utilities/identity_cache.py"""
+import configparser
+import logging
+from types import SimpleNamespace
+
+from sweeperbot.db import models
+from sweeperbot.utilities.identity_cache import IdentityCache
+
+
+class FakeSession:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    def execute(self, stmt):
+        self.calls.append("execute")
+        return SimpleNamespace(fetchall=lambda: self.rows)
+
+    def commit(self):
+        self.calls.append("commit")
+
+    def close(self):
+        self.calls.append("close")
+
+
+def test_misses_resolve_on_the_callers_session():
+    bot = SimpleNamespace(
+        botconfig=configparser.ConfigParser(), log=logging.getLogger("test")
+    )
+    cache = IdentityCache(bot)
+    assert cache.cached(models.User, 1234) is None
+
+    session = FakeSession([(1234, 7)])
+    assert cache.user_id(1234, session=session) == 7
+    # The caller's session is left for the caller to commit and close
+    assert session.calls == ["execute"]
+
+    assert cache.cached(models.User, 1234) == 7
+    assert cache.stats["user_hits"] == 1 and cache.stats["user_misses"] == 1
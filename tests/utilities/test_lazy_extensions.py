@@ -0,0 +1,92 @@
+"""Tests for utilities/lazy_extensions.py"""
+import asyncio
+import configparser
+import logging
+import sys
+import textwrap
+
+from discord.ext import commands
+from sweeperbot.utilities.lazy_extensions import LazyExtensions, read_manifest
+
+EXTENSION = '''
+import json
+
+from discord.ext import commands
+
+EVENTS = []
+
+
+class Verify(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.command(aliases=["v"])
+    @commands.guild_only()
+    async def verify(self, ctx):
+        """Verifies your account."""
+
+    @commands.group(name="club", hidden=True)
+    async def club_group(self, ctx):
+        pass
+
+    @club_group.command()
+    async def join(self, ctx):
+        pass
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member):
+        EVENTS.append(member)
+
+
+def setup(bot):
+    bot.add_cog(Verify(bot))
+'''
+
+
+def write_extension(tmp_path, monkeypatch):
+    (tmp_path / "lazy_verify.py").write_text(textwrap.dedent(EXTENSION))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    sys.modules.pop("lazy_verify", None)
+    return str(tmp_path / "lazy_verify.py")
+
+
+def test_manifest_lists_top_level_commands_and_listeners(tmp_path, monkeypatch):
+    found_commands, listeners = read_manifest(write_extension(tmp_path, monkeypatch))
+    assert found_commands == [
+        {
+            "name": "verify",
+            "aliases": ["v"],
+            "help": "Verifies your account.",
+            "hidden": False,
+        },
+        {"name": "club", "aliases": [], "help": None, "hidden": True},
+    ]
+    assert listeners == ["on_member_join"]
+
+
+def test_extension_loads_on_first_use(tmp_path, monkeypatch):
+    write_extension(tmp_path, monkeypatch)
+
+    async def run():
+        bot = commands.Bot(command_prefix="!")
+        bot.log = logging.getLogger("test")
+        bot.botconfig = configparser.ConfigParser()
+        bot.botconfig.read_dict({"LazyExtensions": {"EXTENSIONS": "lazy_verify, other"}})
+        lazy = LazyExtensions(bot)
+
+        assert lazy.is_lazy("lazy_verify") and not lazy.is_lazy("cogs.admin")
+        assert lazy.stub("lazy_verify")
+        assert "lazy_verify" not in sys.modules
+        assert bot.get_command("v").help == "Verifies your account."
+        assert bot.get_command("club").hidden
+
+        # The event that triggers the load reaches the cog's own listener
+        trigger, event = lazy.stubs["lazy_verify"]["listeners"][0]
+        await asyncio.gather(trigger("member"), trigger("member 2"))
+        assert sys.modules["lazy_verify"].EVENTS == ["member", "member 2"]
+        assert not lazy.stubs and lazy.loaded["lazy_verify"]["trigger"] == "event:on_member_join"
+        assert bot.get_command("verify").cog_name == "Verify"
+        assert bot.get_command("club join") is not None
+        assert lazy.snapshot()["other"] == "not loaded"
+
+    asyncio.run(run())
@@ -0,0 +1,42 @@
+"""Tests for utilities/mention_budget.py"""
+from types import SimpleNamespace
+
+from sweeperbot.utilities.mention_budget import MentionBudget, count_mentions
+
+
+def test_counts_distinct_mentions_from_raw_ids():
+    message = SimpleNamespace(
+        author=SimpleNamespace(id=1),
+        raw_mentions=[1, 2, 3, 3, 4],
+        raw_role_mentions=[10, 10, 11],
+    )
+    assert count_mentions(message) == 5
+
+
+def test_one_message_over_the_limit(make_bot):
+    budget = MentionBudget(make_bot("MassMentions", {"MAX_PER_MESSAGE": 5}))
+
+    assert not budget.spend(1, 100, 5, now=0)
+    assert budget.spend(1, 101, 6, now=0)
+
+
+def test_rolling_budget(make_bot):
+    budget = MentionBudget(
+        make_bot("MassMentions", {"MAX_PER_WINDOW": 10, "WINDOW": 60})
+    )
+
+    assert not budget.spend(1, 100, 4, now=0)
+    assert not budget.spend(1, 100, 4, now=30)
+    assert budget.spend(1, 100, 4, now=40)
+    # Other guilds have their own budget
+    assert not budget.spend(2, 100, 4, now=40)
+    # The first message left the window, so its mentions are refunded
+    assert not budget.spend(1, 100, 1, now=61)
+
+
+def test_memory_is_bounded(make_bot):
+    budget = MentionBudget(make_bot("MassMentions", {"MAX_USERS": 10}))
+
+    for user_id in range(100):
+        budget.spend(1, user_id, 1, now=0)
+    assert len(budget.users) == 10
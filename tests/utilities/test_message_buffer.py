@@ -0,0 +1,154 @@
+"""Tests for utilities/message_buffer.py"""
+import asyncio
+import datetime
+from types import SimpleNamespace
+
+from sweeperbot.utilities.message_buffer import MessageBuffer
+
+
+class FakeExecutor:
+    """Records the batches it's asked to write instead of running them, optionally failing or sleeping first"""
+
+    def __init__(self, fail=False, delay=0):
+        self.batches = []
+        self.fail = fail
+        self.delay = delay
+
+    async def run(self, fn, rows):
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("database is down")
+        self.batches.append([row["message_id"] for row in rows])
+
+
+def make_buffer(make_bot, executor, **options):
+    bot = make_bot(
+        "MessageLog",
+        options,
+        loop=asyncio.get_running_loop(),
+        database=SimpleNamespace(executor=executor),
+    )
+    return MessageBuffer(bot)
+
+
+def make_message(message_id):
+    return SimpleNamespace(
+        id=message_id,
+        author=SimpleNamespace(id=1),
+        guild=SimpleNamespace(id=2, name="guild"),
+        channel=SimpleNamespace(id=3, name="general"),
+        content="hello",
+        created_at=datetime.datetime(2020, 1, 1),
+    )
+
+
+def test_flushes_in_batches_once_enough_are_pending(make_bot):
+    async def run():
+        executor = FakeExecutor()
+        buffer = make_buffer(make_bot, executor, FLUSH_SIZE=3)
+        for message_id in range(2):
+            await buffer.add(make_message(message_id))
+        await asyncio.sleep(0)
+        assert executor.batches == []
+
+        # The third message starts a flush in the background
+        await buffer.add(make_message(2))
+        await asyncio.sleep(0.01)
+        assert executor.batches == [[0, 1, 2]]
+
+        # A flush writes everything pending, flush_size rows at a time
+        for message_id in range(3, 8):
+            await buffer.add(make_message(message_id))
+        await buffer.flush()
+        assert executor.batches == [[0, 1, 2], [3, 4, 5], [6, 7]]
+        assert buffer.stats["written"] == 8 and not buffer.pending
+
+    asyncio.run(run())
+
+
+def test_full_buffer_waits_for_a_flush(make_bot):
+    async def run():
+        executor = FakeExecutor(delay=0.01)
+        buffer = make_buffer(make_bot, executor, FLUSH_SIZE=100, MAX_PENDING=3)
+        for message_id in range(4):
+            await buffer.add(make_message(message_id))
+        # The 4th message waited for the first three to be written rather than dropping any
+        assert executor.batches == [[0, 1, 2]]
+        assert [row["message_id"] for row in buffer.pending] == [3]
+        assert buffer.stats["backpressure_waits"] == 1
+        assert buffer.stats["dropped"] == 0
+
+    asyncio.run(run())
+
+
+def test_oldest_rows_are_dropped_while_the_database_is_down(make_bot):
+    async def run():
+        executor = FakeExecutor(fail=True)
+        buffer = make_buffer(make_bot, executor, FLUSH_SIZE=100, MAX_PENDING=3)
+        for message_id in range(6):
+            await buffer.add(make_message(message_id))
+        # Only one flush was tried, the rest of the time the oldest row made room
+        assert buffer.stats["failed_flushes"] == 1
+        assert buffer.stats["backpressure_waits"] == 1
+        assert [row["message_id"] for row in buffer.pending] == [3, 4, 5]
+        assert buffer.stats["dropped"] == 3
+
+    asyncio.run(run())
+
+
+def test_close_writes_what_is_left(make_bot):
+    """Bot.close calls this before closing the database"""
+
+    async def run():
+        executor = FakeExecutor(fail=True)
+        buffer = make_buffer(make_bot, executor, FLUSH_SIZE=100)
+        for message_id in range(3):
+            await buffer.add(make_message(message_id))
+        # A failed flush keeps its rows to retry
+        await buffer.flush()
+        assert len(buffer.pending) == 3
+
+        executor.fail = False
+        await buffer.close()
+        assert executor.batches == [[0, 1, 2]]
+        assert not buffer.pending
+
+    asyncio.run(run())
+
+
+def test_write_rows_uses_one_transaction(make_bot):
+    class FakeSession:
+        def __init__(self):
+            self.calls = []
+
+        def execute(self, statement):
+            self.calls.append("execute")
+
+        def commit(self):
+            self.calls.append("commit")
+
+        def close(self):
+            self.calls.append("close")
+
+    class FakeIdentityCache:
+        def __init__(self):
+            self.sessions = []
+
+        def resolve_many(self, model, discord_ids, session=None):
+            self.sessions.append(session)
+            return {discord_id: discord_id * 10 for discord_id in discord_ids}
+
+    session = FakeSession()
+    identity_cache = FakeIdentityCache()
+    bot = make_bot(
+        helpers=SimpleNamespace(get_db_session=lambda: session),
+        identity_cache=identity_cache,
+    )
+    buffer = MessageBuffer(bot)
+    for message_id in range(3):
+        asyncio.run(buffer.add(make_message(message_id)))
+
+    buffer._write_rows(list(buffer.pending))
+    # Users and servers were resolved on the flush's session and committed with the messages
+    assert identity_cache.sessions == [session, session]
+    assert session.calls == ["execute", "commit", "close"]
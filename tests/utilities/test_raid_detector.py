@@ -0,0 +1,51 @@
+"""Tests for utilities/raid_detector.py"""
+from sweeperbot.utilities.raid_detector import RaidDetector, fingerprint
+
+RAID_TEXT = "Free nitro for everyone, claim it here now"
+
+
+def test_near_identical_messages_share_a_fingerprint():
+    assert fingerprint("Free NITRO for everyone!! <@1234> 123") == fingerprint(
+        "free ni\u200btro for everyone <@!5678> 9"
+    )
+    assert fingerprint("free nitro for everyone") != fingerprint("free nitro for no one")
+    assert fingerprint("lol", min_length=12) is None
+
+
+def test_raid_is_flagged_after_threshold_distinct_authors(make_bot):
+    detector = RaidDetector(make_bot("RaidDetection", {"THRESHOLD": 3, "WINDOW": 10}))
+
+    # The same author repeating themselves isn't a raid
+    for now in range(5):
+        assert detector.record(1, 100, RAID_TEXT, now=now) is None
+    assert detector.record(1, 101, RAID_TEXT, now=5) is None
+    raid = detector.record(1, 102, RAID_TEXT + "!!", now=6)
+    assert raid is not None and not raid.alerted
+    # Copies keep being flagged while the raid continues, even from new authors
+    assert detector.record(1, 103, RAID_TEXT, now=7) is raid
+    # Other guilds aren't affected
+    assert detector.record(2, 104, RAID_TEXT, now=7) is None
+    assert detector.stats["raids"] == 1
+
+
+def test_authors_outside_the_window_dont_count(make_bot):
+    detector = RaidDetector(make_bot("RaidDetection", {"THRESHOLD": 3, "WINDOW": 10}))
+
+    assert detector.record(1, 100, RAID_TEXT, now=0) is None
+    assert detector.record(1, 101, RAID_TEXT, now=5) is None
+    assert detector.record(1, 102, RAID_TEXT, now=11) is None
+    assert detector.record(1, 103, RAID_TEXT, now=12) is not None
+    # Once quiet for a full window the raid is over
+    assert detector.record(1, 104, RAID_TEXT, now=30) is None
+
+
+def test_memory_is_bounded(make_bot):
+    detector = RaidDetector(
+        make_bot("RaidDetection", {"THRESHOLD": 3, "MAX_FINGERPRINTS": 50})
+    )
+
+    for i in range(1000):
+        detector.record(1, i, f"message number {'x' * i}", now=0)
+        detector.record(1, i, RAID_TEXT, now=0)
+    assert len(detector.guilds[1]) <= 50
+    assert all(len(entry.authors) <= 3 for entry in detector.guilds[1].values())
@@ -0,0 +1,121 @@
+"""Tests for utilities/rate_limiter.py"""
+from types import SimpleNamespace
+
+import asyncio
+
+import redis
+from sweeperbot.utilities import rate_limiter
+from sweeperbot.utilities.circuit_breaker import CircuitBreaker
+from sweeperbot.utilities.rate_limiter import SlidingWindowLimiter
+
+
+class FakeRedis:
+    """Runs the sliding window script in Python against a dict of sorted sets"""
+
+    def __init__(self, broken=False):
+        self.windows = {}
+        self.broken = broken
+        self.calls = 0
+
+    def register_script(self, script):
+        client = self
+
+        async def run(keys, args):
+            client.calls += 1
+            if client.broken:
+                raise redis.ConnectionError("down")
+            now, window, rate, member = float(args[0]), args[1], args[2], args[3]
+            entries = [e for e in client.windows.get(keys[0], []) if e[0] > now - window]
+            client.windows[keys[0]] = entries
+            if len(entries) >= rate:
+                return str(entries[0][0] + window - now)
+            entries.append((now, member))
+            return "0"
+
+        return run
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+def make_limiter(make_bot, client, clock, **config):
+    helpers = SimpleNamespace(
+        async_redis=client, redis_breaker=CircuitBreaker(30, clock.time)
+    )
+    return SlidingWindowLimiter(make_bot("RateLimiter", config, helpers=helpers))
+
+
+def hit(limiter, *args):
+    return asyncio.run(limiter.hit(*args))
+
+
+def test_window_slides(monkeypatch, make_bot):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", clock)
+    client = FakeRedis()
+    limiter = make_limiter(make_bot, client, clock)
+
+    for message_id in range(3):
+        assert hit(limiter, 1, 10, message_id, 3, 5) == 0
+        clock.now += 1
+    # The 4th message in 5 seconds is limited until the 1st leaves the window
+    assert hit(limiter, 1, 10, 3, 3, 5) == 2
+    # Other users and guilds have their own windows
+    assert hit(limiter, 1, 11, 4, 3, 5) == 0
+    assert hit(limiter, 2, 10, 5, 3, 5) == 0
+    clock.now += 2
+    assert hit(limiter, 1, 10, 6, 3, 5) == 0
+
+
+def test_limited_users_skip_redis(monkeypatch, make_bot):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", clock)
+    client = FakeRedis()
+    limiter = make_limiter(make_bot, client, clock)
+
+    hit(limiter, 1, 10, 1, 1, 10)
+    assert hit(limiter, 1, 10, 2, 1, 10) == 10
+    calls = client.calls
+    clock.now += 4
+    assert hit(limiter, 1, 10, 3, 1, 10) == 6
+    assert client.calls == calls
+    assert limiter.stats["local_hits"] == 1
+
+
+def test_falls_back_to_local_window(monkeypatch, make_bot):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", clock)
+    client = FakeRedis(broken=True)
+    limiter = make_limiter(make_bot, client, clock)
+
+    assert hit(limiter, 1, 10, 1, 2, 5) == 0
+    assert hit(limiter, 1, 10, 2, 2, 5) == 0
+    assert hit(limiter, 1, 10, 3, 2, 5) == 5
+    # After the first error Redis isn't called again until the breaker's cooldown has passed
+    assert limiter.stats["redis_errors"] == 1 and client.calls == 1
+    assert limiter.snapshot()["redis_breaker_open"]
+    clock.now += 5
+    assert hit(limiter, 1, 10, 4, 2, 5) == 0
+
+    client.broken = False
+    clock.now += 30
+    assert hit(limiter, 1, 10, 5, 2, 5) == 0
+    assert client.calls == 2 and not limiter.snapshot()["redis_breaker_open"]
+
+
+def test_local_state_is_bounded(monkeypatch, make_bot):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", clock)
+    limiter = make_limiter(make_bot, FakeRedis(broken=True), clock, LOCAL_MAX_KEYS=10)
+
+    for user_id in range(100):
+        hit(limiter, 1, user_id, user_id, 1, 60)
+        hit(limiter, 1, user_id, user_id, 1, 60)
+    stats = limiter.snapshot()
+    assert stats["local_windows"] == 10
+    assert stats["limited_users"] == 10
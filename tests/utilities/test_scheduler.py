@@ -0,0 +1,118 @@
+"""Tests for utilities/scheduler.py"""
+import asyncio
+import configparser
+import datetime
+import logging
+from types import SimpleNamespace
+
+from sweeperbot.cogs.utils.timer import Timer
+from sweeperbot.utilities.scheduler import Scheduler
+
+START = datetime.datetime(2021, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = START.timestamp()
+
+    def __call__(self):
+        return self.now
+
+
+def make_scheduler(batch_size=200):
+    botconfig = configparser.ConfigParser()
+    botconfig.read_dict({"Scheduler": {"BATCH_SIZE": str(batch_size)}})
+    bot = SimpleNamespace(botconfig=botconfig, log=logging.getLogger("test"))
+    clock = FakeClock()
+    return Scheduler(bot, clock=clock), clock
+
+
+def make_timer(ran, name, seconds):
+    return Timer.temporary(
+        name,
+        event=ran.append,
+        expires=START + datetime.timedelta(seconds=seconds),
+        created=START,
+    )
+
+
+def test_runs_due_timers_in_expiry_order():
+    scheduler, clock = make_scheduler()
+    ran = []
+    for name, seconds in (("c", 30), ("a", 10), ("b", 20), ("d", 86400 * 30)):
+        make_timer(ran, name, seconds).start(scheduler)
+
+    assert scheduler.run_due() == 0
+    clock.now += 25
+    assert scheduler.run_due() == 2
+    assert ran == ["a", "b"]
+    clock.now += 86400 * 30
+    scheduler.run_due()
+    assert ran == ["a", "b", "c", "d"] and len(scheduler) == 0
+
+
+def test_cancel_and_reschedule():
+    scheduler, clock = make_scheduler()
+    ran = []
+    first, second = make_timer(ran, "first", 10), make_timer(ran, "second", 20)
+    first.start(scheduler)
+    second.start(scheduler)
+
+    first.stop()
+    # Stopping twice, or a timer that already ran, is harmless
+    first.stop()
+    scheduler.reschedule(second, START + datetime.timedelta(seconds=60))
+    assert scheduler.next_due() == START.timestamp() + 60
+
+    clock.now += 30
+    assert scheduler.run_due() == 0
+    clock.now += 30
+    scheduler.run_due()
+    assert ran == ["second"]
+    assert scheduler.stats["cancelled"] == 1 and scheduler.stats["dispatched"] == 1
+
+
+def test_failing_event_does_not_stop_the_batch():
+    scheduler, clock = make_scheduler()
+    ran = []
+
+    def fail(name):
+        raise ValueError(name)
+
+    Timer.temporary("bad", event=fail, expires=START, created=START).start(scheduler)
+    make_timer(ran, "good", 0).start(scheduler)
+    scheduler.run_due()
+    assert ran == ["good"] and scheduler.stats["errors"] == 1
+
+
+def test_run_dispatches_in_batches_and_wakes_for_earlier_timers():
+    async def run():
+        scheduler, clock = make_scheduler(batch_size=10)
+        ran = []
+        for i in range(25):
+            make_timer(ran, i, 0).start(scheduler)
+        make_timer(ran, "later", 3600).start(scheduler)
+        batches = []
+        original_pop_due = scheduler.pop_due
+
+        def pop_due(now=None, limit=None):
+            due = original_pop_due(now, limit)
+            if due:
+                batches.append(len(due))
+            return due
+
+        scheduler.pop_due = pop_due
+        task = scheduler.start()
+        assert scheduler.start() is task
+        for _ in range(5):
+            await asyncio.sleep(0)
+        assert batches == [10, 10, 5] and ran == list(range(25))
+
+        # A timer due sooner than the one being waited on wakes the task
+        make_timer(ran, "now", 0).start(scheduler)
+        for _ in range(5):
+            await asyncio.sleep(0)
+        assert ran[-1] == "now" and len(scheduler) == 1
+        task.cancel()
+
+    asyncio.run(run())
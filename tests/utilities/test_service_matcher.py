@@ -0,0 +1,50 @@
+"""Tests for utilities/service_matcher.py"""
+from types import SimpleNamespace
+
+from sweeperbot.utilities.service_matcher import ServiceMatcher
+
+
+def make_services(*regexes):
+    return [
+        SimpleNamespace(id=index, service=f"svc{index}", regex=regex)
+        for index, regex in enumerate(regexes, start=1)
+    ]
+
+
+def test_combined_match_returns_service_and_text():
+    services = make_services(r"discord\.gg/\w+", r"twitch\.tv/(\w+)", None, "([bad")
+    matcher = ServiceMatcher(services)
+    assert matcher.combined is not None
+    # Services without a regex or with an invalid one are skipped
+    assert [service.id for service in matcher.services] == [1, 2]
+    service, text = matcher.match("https://www.twitch.tv/someone")
+    assert service.id == 2
+    assert text == "twitch.tv/someone"
+    assert matcher.match("https://example.com") == (None, None)
+
+
+def test_falls_back_to_separate_patterns_when_they_cant_be_combined():
+    # Backreferences and inline flags mean the regexes can't be joined into one pattern
+    for services in (
+        make_services(r"(a)\1", r"patreon\.com/\w+"),
+        make_services("zzz", r"(?i)PATREON\.com/\w+"),
+    ):
+        matcher = ServiceMatcher(services)
+        assert matcher.combined is None
+        service, text = matcher.match("https://patreon.com/x")
+        assert service.id == 2
+        assert text == "patreon.com/x"
+    assert ServiceMatcher(make_services(r"(a)\1")).match("xaa")[1] == "aa"
+
+
+def test_first_service_wins_wherever_it_matches():
+    services = make_services(r"discord\.gg/\w+", r"bit\.ly/\w+")
+    url = "https://bit.ly/abc?next=discord.gg/xyz"
+    # Combined, and one at a time because of the backreference
+    for matcher in (
+        ServiceMatcher(services),
+        ServiceMatcher(services + make_services(r"(a)\1")),
+    ):
+        service, text = matcher.match(url)
+        assert service.id == 1
+        assert text == "discord.gg/xyz"
@@ -0,0 +1,98 @@
+"""Tests for utilities/startup.py"""
+import asyncio
+import logging
+from types import SimpleNamespace
+
+import pytest
+from sweeperbot.utilities.boot_profiler import BootProfiler
+from sweeperbot.utilities.startup import StartupPipeline
+
+
+def make_pipeline():
+    bot = SimpleNamespace(log=logging.getLogger("test"), database=None)
+    bot.boot = BootProfiler(bot)
+    return StartupPipeline(bot)
+
+
+def test_steps_run_concurrently_after_their_dependencies():
+    async def run():
+        pipeline = make_pipeline()
+        events = []
+        settings_loaded = asyncio.Event()
+
+        async def guild_settings():
+            events.append("settings start")
+            await asyncio.sleep(0.01)
+            settings_loaded.set()
+            events.append("settings done")
+
+        async def reminders():
+            # Doesn't wait for the settings
+            events.append("reminders")
+
+        async def tasks():
+            assert settings_loaded.is_set()
+            events.append("tasks")
+
+        pipeline.add("guild_settings", guild_settings)
+        pipeline.add("reminders", reminders)
+        pipeline.add("tasks", tasks, after=["guild_settings"])
+        assert await pipeline.run()
+        assert events == ["settings start", "reminders", "settings done", "tasks"]
+        assert set(pipeline.results.values()) == {"done"}
+        assert [record["name"] for record in pipeline.bot.boot.phases] == [
+            "reminders",
+            "guild_settings",
+            "tasks",
+        ]
+
+        # A reconnect doesn't run anything again
+        assert not await pipeline.run()
+        assert events.count("tasks") == 1
+
+    asyncio.run(run())
+
+
+def test_failed_step_skips_its_dependents():
+    async def run():
+        pipeline = make_pipeline()
+        ran = []
+
+        database_down = True
+
+        async def guild_settings():
+            if database_down:
+                raise ConnectionError("database is down")
+            ran.append("guild_settings")
+
+        async def owner_info():
+            ran.append("owner_info")
+
+        async def modmail():
+            ran.append("modmail")
+
+        pipeline.add("guild_settings", guild_settings)
+        pipeline.add("owner_info", owner_info)
+        pipeline.add("modmail", modmail, after=["guild_settings"])
+        await pipeline.run()
+        assert ran == ["owner_info"]
+        assert pipeline.results == {
+            "guild_settings": "failed",
+            "owner_info": "done",
+            "modmail": "skipped",
+        }
+
+        # The next on_ready retries the failed and skipped steps, but not the ones that are done
+        database_down = False
+        assert await pipeline.run()
+        assert ran == ["owner_info", "guild_settings", "modmail"]
+        assert set(pipeline.results.values()) == {"done"}
+        assert not await pipeline.run()
+
+    asyncio.run(run())
+
+
+def test_dependencies_must_be_added_first():
+    pipeline = make_pipeline()
+    with pytest.raises(ValueError):
+        pipeline.add("tasks", None, after=["guild_settings"])
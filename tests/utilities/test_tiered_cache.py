@@ -0,0 +1,94 @@
+"""Tests for utilities/tiered_cache.py"""
+import asyncio
+from types import SimpleNamespace
+
+import redis
+from sweeperbot.utilities.circuit_breaker import CircuitBreaker
+from sweeperbot.utilities.tiered_cache import TieredCache
+
+
+class FakeRedis:
+    """Just enough of a redis client for the cache: setex, and a pipeline of get and ttl"""
+
+    def __init__(self, broken=False):
+        self.data = {}
+        self.broken = broken
+
+    async def setex(self, key, ttl, value):
+        if self.broken:
+            raise redis.ConnectionError("down")
+        self.data[key] = (value, ttl)
+
+    def pipeline(self, transaction=True):
+        client = self
+
+        class Pipeline:
+            def __init__(self):
+                self.keys = []
+
+            def get(self, key):
+                self.keys.append(key)
+
+            def ttl(self, key):
+                pass
+
+            async def execute(self):
+                if client.broken:
+                    raise redis.ConnectionError("down")
+                value, ttl = client.data.get(self.keys[0], (None, -2))
+                return [value, ttl]
+
+        return Pipeline()
+
+
+def make_cache(make_bot, client, **options):
+    helpers = SimpleNamespace(async_redis=client, redis_breaker=CircuitBreaker(30))
+    return TieredCache(make_bot(helpers=helpers), "test", **options)
+
+
+def test_values_are_shared_through_redis(make_bot):
+    async def run():
+        client = FakeRedis()
+        first = make_cache(make_bot, client, ttl=60)
+        second = make_cache(make_bot, client, ttl=60)
+        assert await first.get("a") == (False, None)
+        await first.set("a", "1")
+        assert await first.get("a") == (True, "1")
+        assert await second.get("a") == (True, "1")
+        assert await second.get("a") == (True, "1")
+        assert first.stats["local_hits"] == 1
+        assert second.stats["redis_hits"] == 1
+        assert second.stats["local_hits"] == 1
+        assert client.data["test:a"] == ("1", 60)
+
+    asyncio.run(run())
+
+
+def test_negative_entries_use_the_shorter_ttl(make_bot):
+    async def run():
+        client = FakeRedis()
+        cache = make_cache(make_bot, client, ttl=60, negative_ttl=5)
+        await cache.set_negative("gone")
+        assert await cache.get("gone") == (True, None)
+        assert client.data["test:gone"] == ("", 5)
+        assert await make_cache(make_bot, client).get("gone") == (True, None)
+        assert cache.stats["negative_hits"] == 1
+
+    asyncio.run(run())
+
+
+def test_lru_evicts_and_works_without_redis(make_bot):
+    async def run():
+        cache = make_cache(make_bot, FakeRedis(broken=True), max_size=2)
+        for key in ("a", "b", "c"):
+            await cache.set(key, key)
+        assert await cache.get("a") == (False, None)
+        assert await cache.get("c") == (True, "c")
+        return cache.snapshot()
+
+    stats = asyncio.run(run())
+    assert stats["evictions"] == 1
+    assert stats["size"] == 2
+    # Redis isn't called again while the breaker is open
+    assert stats["redis_errors"] == 1
+    assert stats["redis_breaker_open"]
@@ -0,0 +1,116 @@
+"""Tests for utilities/timer_window.py"""
+import asyncio
+import configparser
+import datetime
+import logging
+from types import SimpleNamespace
+
+from sweeperbot.utilities.timer_window import TimerWindow
+
+
+class FakeHelpers:
+    def __init__(self):
+        self.fail = False
+
+    async def run_db(self, fn, *args):
+        if self.fail:
+            raise ConnectionError("database is down")
+        return fn(None, *args)
+
+
+def make_window():
+    botconfig = configparser.ConfigParser()
+    botconfig.read_dict({"TimerWindow": {"HORIZON": "3600"}})
+    bot = SimpleNamespace(
+        botconfig=botconfig,
+        log=logging.getLogger("test"),
+        helpers=FakeHelpers(),
+        catch_up=SimpleNamespace(since=lambda kind, now: now),
+    )
+    return TimerWindow(bot)
+
+
+def in_hours(hours):
+    return datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(
+        hours=hours
+    )
+
+
+def test_refill_loads_only_rows_within_the_horizon():
+    async def run():
+        window = make_window()
+        rows = [
+            SimpleNamespace(id=1, expires=in_hours(0.5)),
+            SimpleNamespace(id=2, expires=in_hours(5)),
+            SimpleNamespace(id=3, expires=in_hours(-1)),
+        ]
+        queries, armed = [], []
+
+        def fetch(session, after, until):
+            queries.append((after, until))
+            return [row for row in rows if after < row.expires <= until]
+
+        window.register("mutes", fetch, lambda row: armed.append(row.id))
+        assert not window.covers("mutes", in_hours(0.5))
+        assert await window.refill() == 1
+        assert armed == [1]
+        assert window.covers("mutes", in_hours(0.5))
+        assert not window.covers("mutes", in_hours(5))
+
+        # The next refill only asks for what's come within the horizon since
+        await window.refill()
+        assert queries[1][0] == queries[0][1]
+        assert armed == [1] and window.stats["loaded"] == 1
+        assert window.refill_interval == 1800
+
+    asyncio.run(run())
+
+
+def test_failed_refill_retries_the_same_range():
+    async def run():
+        window = make_window()
+        armed = []
+        row = SimpleNamespace(id=1, expires=in_hours(0.5))
+
+        def fetch(session, after, until):
+            return [row] if after < row.expires <= until else []
+
+        def arm(item):
+            armed.append(item.id)
+            raise ValueError("guild is gone")
+
+        window.register("reminders", fetch, arm)
+        window.bot.helpers.fail = True
+        assert await window.refill() == 0
+        assert window.loaded_until["reminders"] is None
+
+        window.bot.helpers.fail = False
+        assert await window.refill() == 1
+        # An error starting one timer is logged, not raised
+        assert armed == [1] and window.stats["errors"] == 2
+
+    asyncio.run(run())
+
+
+def test_reloaded_kind_keeps_its_window():
+    async def run():
+        window = make_window()
+        rows = [SimpleNamespace(id=1, expires=in_hours(0.5))]
+        old_armed, new_armed = [], []
+
+        def fetch(session, after, until):
+            return [row for row in rows if after < row.expires <= until]
+
+        window.register("mutes", fetch, lambda row: old_armed.append(row.id))
+        await window.refill()
+        assert old_armed == [1]
+
+        # Reloading the cog registers the kind again
+        window.register("mutes", fetch, lambda row: new_armed.append(row.id))
+        # A 20 minute mute issued straight after the reload is still started by its command
+        assert window.covers("mutes", in_hours(20 / 60))
+        await asyncio.gather(*window.rearms)
+        # The rows already loaded are armed through the reloaded cog
+        assert new_armed == [1] and old_armed == [1]
+
+    asyncio.run(run())
@@ -0,0 +1,106 @@
+"""Tests for utilities/url_resolver.py"""
+import asyncio
+from types import SimpleNamespace
+
+import redis
+
+from sweeperbot.utilities.circuit_breaker import CircuitBreaker
+from sweeperbot.utilities.tiered_cache import TieredCache
+from sweeperbot.utilities.url_resolver import URLResolver
+
+
+class FakeResponse:
+    def __init__(self, status, location=None):
+        self.status = status
+        self.headers = {"Location": location} if location else {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    """Answers HEAD requests from a dict of url: (status, location), optionally sleeping first"""
+
+    def __init__(self, routes, delay=0):
+        self.routes = routes
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def head(self, url, **kwargs):
+        session = self
+
+        class Request:
+            async def __aenter__(self):
+                session.in_flight += 1
+                session.max_in_flight = max(session.max_in_flight, session.in_flight)
+                await asyncio.sleep(session.delay)
+                session.in_flight -= 1
+                return FakeResponse(*session.routes.get(url, (200,)))
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return Request()
+
+
+def test_redirects_are_followed_to_the_final_url(make_bot):
+    session = FakeSession(
+        {
+            "http://short.ly/a": (301, "https://middle.example/b"),
+            "https://middle.example/b": (302, "/c"),
+        }
+    )
+    resolver = URLResolver(make_bot(session=session))
+    result = asyncio.run(resolver.resolve_all(["http://short.ly/a", "http://plain.com"]))
+    assert result == ["https://middle.example/c", "http://plain.com"]
+    assert resolver.stats["redirects"] == 2
+
+
+def test_hop_limit_stops_redirect_loops(make_bot):
+    session = FakeSession({"http://loop.com/": (302, "http://loop.com/")})
+    resolver = URLResolver(
+        make_bot("URLResolver", {"MAX_REDIRECTS": 3}, session=session)
+    )
+    assert asyncio.run(resolver.resolve("http://loop.com/")) == "http://loop.com/"
+    assert resolver.stats["requests"] == 4
+    assert resolver.stats["hop_limit_hits"] == 1
+
+
+def test_per_host_cap_and_deadline(make_bot):
+    session = FakeSession({}, delay=0.05)
+    resolver = URLResolver(
+        make_bot("URLResolver", {"PER_HOST": 2, "DEADLINE": 0.12}, session=session)
+    )
+    urls = [f"http://same.host/{i}" for i in range(6)]
+    result = asyncio.run(resolver.resolve_all(urls))
+    # Unresolved URLs fall back to the original
+    assert result == urls
+    assert session.max_in_flight == 2
+    assert resolver.stats["deadline_hits"] == 1
+    assert resolver.snapshot()["hosts_in_flight"] == 0
+
+
+class DownRedis:
+    async def setex(self, *args):
+        raise redis.ConnectionError("down")
+
+    def pipeline(self, *args, **kwargs):
+        raise redis.ConnectionError("down")
+
+
+def test_resolved_urls_are_cached(make_bot):
+    session = FakeSession({"http://short.ly/a": (301, "https://final.example/")})
+    helpers = SimpleNamespace(
+        async_redis=DownRedis(), redis_breaker=CircuitBreaker(30)
+    )
+    bot = make_bot(session=session, helpers=helpers)
+    cache = TieredCache(bot, "test")
+    resolver = URLResolver(bot, cache)
+    assert asyncio.run(resolver.resolve("http://short.ly/a")) == "https://final.example/"
+    assert asyncio.run(resolver.resolve("http://short.ly/a")) == "https://final.example/"
+    assert resolver.stats["requests"] == 2
+    assert cache.stats["local_hits"] == 1
@@ -0,0 +1,65 @@
+"""Tests for utilities/word_filter.py"""
+import asyncio
+import logging
+from types import SimpleNamespace
+
+from sweeperbot.utilities.word_filter import WordFilter, WordFilters, terms_from_data
+
+
+def test_matches_whole_words_with_normalization():
+    word_filter = WordFilter(["free nitro", "scam", "he", "hers"])
+
+    assert word_filter.find("get FR33 N1TR0 here") == "free nitro"
+    assert word_filter.find("total s\u200bcam!") == "scam"
+    assert word_filter.find("this is a scammer") is None
+    assert word_filter.find("ushers") is None
+    assert word_filter.find("is it hers?") == "hers"
+    assert word_filter.find("nothing to see") is None
+
+
+def test_wildcards_allow_partial_words():
+    word_filter = WordFilter(["scam*", "*coin"])
+
+    assert word_filter.find("this is a scammer") == "scam"
+    assert word_filter.find("buy shitcoin now") == "coin"
+    assert word_filter.find("coins") is None
+
+
+def test_overlapping_terms_use_fail_links():
+    word_filter = WordFilter(["abcd", "bc"])
+
+    assert word_filter.find("abce bc") == "bc"
+    assert WordFilter([]).find("anything") is None
+
+
+def test_terms_from_data():
+    assert terms_from_data(["a", 1, "b"]) == ["a", "b"]
+    assert terms_from_data({"words": ("a",)}) == ["a"]
+    assert terms_from_data(None) == []
+
+
+def test_filters_are_rebuilt_when_the_list_changes():
+    word_filters = WordFilters(SimpleNamespace(log=logging.getLogger("test")))
+
+    async def run():
+        settings = SimpleNamespace(discord_id=1, wordfilter_data=("spam",))
+        # The first message starts the build, later ones use the built filter
+        assert word_filters.find(settings, "spam") is None
+        await asyncio.gather(*word_filters._builds.values())
+        assert word_filters.find(settings, "spam") == "spam"
+
+        # A new settings snapshot with a new list replaces the filter
+        settings = SimpleNamespace(discord_id=1, wordfilter_data=("eggs",))
+        assert word_filters.find(settings, "spam") == "spam"
+        await asyncio.gather(*word_filters._builds.values())
+        assert word_filters.find(settings, "spam") is None
+        assert word_filters.find(settings, "eggs") == "eggs"
+        assert word_filters.stats["builds"] == 2
+
+        # A new snapshot after another setting changed, with the same list, keeps the filter
+        settings = SimpleNamespace(discord_id=1, wordfilter_data=["eggs"])
+        assert word_filters.find(settings, "eggs") == "eggs"
+        stats = word_filters.snapshot()
+        assert stats["building"] == 0 and stats["builds"] == 2
+
+    asyncio.run(run())